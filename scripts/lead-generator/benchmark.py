@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the lead generation pipeline.
+
+Runs the real search, scrape, enrich and store stages against the fake
+clients in fake_clients.py, which inject latency, errors and 429s, and
+reports throughput, stage and call latency percentiles and peak memory.
+No network access or API keys are needed.
+
+    python benchmark.py --counts 10,100,1000
+    python benchmark.py --counts 100 --output results.json
+    python benchmark.py --counts 100 --baseline results.json --tolerance 0.2
+    python benchmark.py --counts 200 --jobs 4 --interactive --fake jigsawstack_scrape.max_concurrency=4
+    python benchmark.py --counts 200 --fake openai.outage=3 --fake openai.outage_after=1
+    python benchmark.py --counts 50 --fake jigsawstack_search.outage=1000 --breaker-max-wait 2 --expect-abort
+    python benchmark.py --startup
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+import lead_generator
+from cache import configure_cache
+from dedup import DedupIndex
+from fake_clients import DEFAULT_PROFILES, DEFAULT_RETRY_AFTER, make_fake_clients
+from lead_profile import configure_lead_profile
+from metrics import Metrics, job_metrics
+from rate_limiter import DEFAULT_RATE_LIMITS, configure_rate_limits
+from resilience import ProviderUnavailableError, configure_resilience
+from scheduler import INTERACTIVE_MAX_COUNT, PRIORITY_BATCH, PRIORITY_INTERACTIVE, configure_scheduler, job_schedule
+from snippets import SnippetFilter
+
+# Rate limits high enough that the fakes, not the token buckets, set the pace
+BENCHMARK_RATE_LIMIT = '1000:1000'
+# Seconds after the batch jobs start that the --interactive job is started
+INTERACTIVE_DELAY = 1.0
+# Stage counts of a job summary
+SUMMARY_STAGES = ('found', 'scraped', 'enriched', 'stored')
+FAKE_SETTINGS = ('latency', 'error_rate', 'rate_limit_rate', 'retry_after', 'max_concurrency', 'outage', 'outage_after')
+# Libraries the API clients and lead scoring import on first use, timed by --startup after lead_generator
+DEFERRED_MODULES = ('httpx', 'openai', 'supabase', 'numpy')
+# Fresh interpreters started per --startup measurement; the median run is reported
+STARTUP_RUNS = 5
+# Slowest imports of lead_generator listed by --startup
+STARTUP_TOP_IMPORTS = 8
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_profile_overrides(values):
+    """Parse 'provider.setting=value' overrides for the fake providers"""
+    profiles = {}
+    for value in values:
+        name, _, number = value.partition('=')
+        provider, _, setting = name.partition('.')
+        if not number or setting not in FAKE_SETTINGS:
+            raise ValueError(f"Invalid fake setting '{value}', expected provider.setting=value")
+        profiles.setdefault(provider, {})[setting] = float(number)
+    return profiles
+
+
+def run_job(clients, job_id, count, mode, concurrency, urls_per_query, metrics, priority, summaries, seconds,
+            snippet_filter=True):
+    """Generate count leads as one job, recording its stage summary and run time
+
+    A job stopped by a provider outage is recorded with its error and no leads.
+    """
+    started = time.monotonic()
+    try:
+        summary = generate_leads(
+            clients, count, mode, concurrency, urls_per_query, metrics, job_id, priority, snippet_filter
+        )
+    except ProviderUnavailableError as e:
+        summary = dict.fromkeys(SUMMARY_STAGES, 0)
+        summary['error'] = str(e)
+    summaries[job_id] = summary
+    seconds[job_id] = round(time.monotonic() - started, 3)
+
+
+def generate_leads(clients, count, mode, concurrency, urls_per_query, metrics, job_id, priority, snippet_filter):
+    """Run the stages of one job and return its stage summary"""
+    jigsawstack_client, openai_client, supabase_client = clients
+    with job_metrics(metrics), job_schedule(job_id, priority):
+        search_params = lead_generator.analyze_existing_leads(supabase_client, openai_client)
+        search_queries = lead_generator.SearchQueryFeed(
+            openai_client, search_params, count,
+            expected_yield=min(lead_generator.INITIAL_QUERY_YIELD, urls_per_query)
+        )
+        candidate_filter = SnippetFilter(search_params) if snippet_filter else None
+        if mode == 'serial':
+            summary = lead_generator.run_serial_stages(
+                jigsawstack_client, openai_client, supabase_client, search_queries,
+                dedup_index=DedupIndex(), limit=count, urls_per_query=urls_per_query, snippet_filter=candidate_filter
+            )
+        else:
+            summary = lead_generator.run_pipelined_stages(
+                jigsawstack_client, openai_client, supabase_client, search_queries, concurrency,
+                dedup_index=DedupIndex(), limit=count, urls_per_query=urls_per_query, snippet_filter=candidate_filter
+            )
+    return summary
+
+
+def run_benchmark(count, mode, concurrency, profiles, seed, urls_per_query=lead_generator.DEFAULT_URLS_PER_QUERY,
+                  jobs=1, interactive=False, snippet_filter=True):
+    """Generate count leads per job with fake clients and return the measurements"""
+    # Stored leads are not kept by the fake database, so peak memory is that of the pipeline
+    clients, providers = make_fake_clients(profiles, seed, discard_tables=('leads',))
+    metrics = Metrics()
+    summaries = {}
+    seconds = {}
+
+    tracemalloc.start()
+    started = time.monotonic()
+    if jobs == 1 and not interactive:
+        run_job(
+            clients, 'job-1', count, mode, concurrency, urls_per_query, metrics, PRIORITY_BATCH, summaries, seconds,
+            snippet_filter
+        )
+    else:
+        # Jobs run side by side and share the providers' concurrency and rate budgets
+        threads = [
+            threading.Thread(target=run_job, args=(
+                clients, f'job-{i + 1}', count, mode, concurrency, urls_per_query, metrics, PRIORITY_BATCH,
+                summaries, seconds, snippet_filter
+            ))
+            for i in range(jobs)
+        ]
+        for thread in threads:
+            thread.start()
+        if interactive:
+            time.sleep(INTERACTIVE_DELAY)
+            run_job(
+                clients, 'interactive', INTERACTIVE_MAX_COUNT, mode, concurrency, urls_per_query, metrics,
+                PRIORITY_INTERACTIVE, summaries, seconds, snippet_filter
+            )
+        for thread in threads:
+            thread.join()
+    summary = {
+        stage: sum(job_summary[stage] for job_id, job_summary in summaries.items() if job_id != 'interactive')
+        for stage in SUMMARY_STAGES
+    }
+    elapsed = time.monotonic() - started
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    report = metrics.summary()
+    return {
+        'mode': mode,
+        'count': count,
+        'jobs': jobs,
+        'job_seconds': seconds,
+        # Jobs stopped by a provider outage, with their error
+        'aborted_jobs': {
+            job_id: job_summary['error'] for job_id, job_summary in summaries.items() if 'error' in job_summary
+        },
+        'seconds': round(elapsed, 3),
+        'leads_per_second': round(summary['stored'] / elapsed, 3) if elapsed else 0.0,
+        'summary': summary,
+        'peak_memory_mb': round(peak_bytes / (1024 * 1024), 2),
+        'stage_latency': {
+            stage: {'p50_seconds': latency['p50_seconds'], 'p99_seconds': latency['p99_seconds']}
+            for stage, latency in report['stage_latency'].items()
+        },
+        'call_latency': {
+            call: {'p50_seconds': latency['p50_seconds'], 'p99_seconds': latency['p99_seconds']}
+            for call, latency in report['calls'].items()
+        },
+        'retries': report['retries'],
+        'error_retries': report['error_retries'],
+        'circuit_wait_seconds': report['circuit_wait_seconds'],
+        'rate_limit_wait_seconds': report['rate_limit_wait_seconds'],
+        'queue_wait_seconds': report['queue_wait_seconds'],
+        'backoff_wait_seconds': report['backoff_wait_seconds'],
+        'local_classifications': report['local_classifications'],
+        'llm_classifications_avoided': report['llm_classifications_avoided'],
+        'snippet_decisions': report['snippet_decisions'],
+        'scrapes_avoided': report['scrapes_avoided'],
+        'tokens': sum(usage['prompt'] + usage['completion'] for usage in report['tokens'].values()),
+        'fake_calls': {name: provider.stats() for name, provider in providers.items()}
+    }
+
+
+def print_result(result):
+    jobs = f" x {result['jobs']} jobs" if result['jobs'] > 1 else ''
+    print(f"\n{result['mode']} x {result['count']}{jobs}: {result['summary']['stored']} leads stored "
+          f"in {result['seconds']:.2f}s ({result['leads_per_second']:.2f} leads/s), "
+          f"peak memory {result['peak_memory_mb']:.2f} MB")
+    print(f"  Stage counts: {json.dumps(result['summary'])}")
+    for stage, latency in result['stage_latency'].items():
+        print(f"  Stage {stage:<10} p50 {latency['p50_seconds'] * 1000:8.1f} ms   "
+              f"p99 {latency['p99_seconds'] * 1000:8.1f} ms")
+    for call, latency in result['call_latency'].items():
+        print(f"  Call  {call:<30} p50 {latency['p50_seconds'] * 1000:8.1f} ms   "
+              f"p99 {latency['p99_seconds'] * 1000:8.1f} ms")
+    print(f"  Search calls: {result['fake_calls']['jigsawstack_search']['calls']}, "
+          f"scrape calls: {result['fake_calls']['jigsawstack_scrape']['calls']}")
+    if result['aborted_jobs']:
+        print(f"  Aborted jobs: {json.dumps(result['aborted_jobs'])}")
+    if len(result['job_seconds']) > 1:
+        print(f"  Job run times: {json.dumps(result['job_seconds'])}")
+    print(f"  Most calls in flight: {json.dumps({name: calls['max_in_flight'] for name, calls in result['fake_calls'].items()})}")
+    print(f"  Retries after 429: {json.dumps(result['retries'])}")
+    print(f"  Retries after errors: {json.dumps(result['error_retries'])}, "
+          f"waiting for open circuits: {json.dumps(result['circuit_wait_seconds'])}")
+    print(f"  Waiting for rate limit tokens: {json.dumps(result['rate_limit_wait_seconds'])}, "
+          f"provider slots: {json.dumps(result['queue_wait_seconds'])}, "
+          f"retry backoffs: {json.dumps(result['backoff_wait_seconds'])}")
+    print(f"  AI readiness settled locally: {result['llm_classifications_avoided']} "
+          f"({json.dumps(result['local_classifications'])})")
+    print(f"  Scrapes avoided by search snippets: {result['scrapes_avoided']} "
+          f"({json.dumps(result['snippet_decisions'])})")
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Return messages for runs whose throughput fell below the baseline by more than tolerance"""
+    previous = {(run['mode'], run['count'], run.get('jobs', 1)): run for run in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result['mode'], result['count'], result['jobs']))
+        if not before or not before['leads_per_second']:
+            continue
+        change = result['leads_per_second'] / before['leads_per_second'] - 1
+        print(f"{result['mode']} x {result['count']}: {result['leads_per_second']:.2f} leads/s "
+              f"vs baseline {before['leads_per_second']:.2f} ({change:+.1%})")
+        if change < -tolerance:
+            regressions.append(f"{result['mode']} x {result['count']} throughput dropped {-change:.1%}")
+    return regressions
+
+
+def parse_importtime(report):
+    """Return (module, depth, cumulative ms) for each line of a -X importtime report, in report order"""
+    imports = []
+    for line in report.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), depth, int(cumulative) / 1000))
+    return imports
+
+
+def time_imports(modules):
+    """Import modules one after another in a fresh interpreter and return each one's import time and children
+
+    A module's time excludes whatever the modules before it already imported,
+    so the time of a deferred library is what the first stage using it pays.
+    """
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', '; '.join(f'import {module}' for module in modules)],
+        cwd=SCRIPT_DIR, capture_output=True, text=True, check=True
+    )
+    times = {}
+    children = {}
+    current = []
+    for name, depth, milliseconds in parse_importtime(completed.stderr):
+        # Imports are reported after the modules they import
+        if depth == 0:
+            times[name] = milliseconds
+            children[name] = current
+            current = []
+        elif depth == 1:
+            current.append((name, milliseconds))
+    return {module: times.get(module, 0.0) for module in modules}, children.get(modules[0], [])
+
+
+def run_startup_benchmark(runs=STARTUP_RUNS):
+    """Measure the import time of lead_generator and of the libraries it defers, as medians of fresh runs"""
+    modules = ('lead_generator',) + DEFERRED_MODULES
+    measurements = [time_imports(modules) for _ in range(runs)]
+    medians = {module: round(statistics.median(times[module] for times, _ in measurements), 1) for module in modules}
+    # Children of the run whose lead_generator time is the median
+    _, children = sorted(measurements, key=lambda measurement: measurement[0]['lead_generator'])[runs // 2]
+    return {
+        'runs': runs,
+        'import_ms': medians,
+        'deferred_ms': round(sum(medians[module] for module in DEFERRED_MODULES), 1),
+        'slowest_imports': [
+            {'module': name, 'ms': round(milliseconds, 1)}
+            for name, milliseconds in sorted(children, key=lambda child: -child[1])[:STARTUP_TOP_IMPORTS]
+        ]
+    }
+
+
+def print_startup_result(result):
+    print(f"\nimport lead_generator: {result['import_ms']['lead_generator']:.1f} ms "
+          f"(median of {result['runs']} fresh interpreters)")
+    for entry in result['slowest_imports']:
+        print(f"  {entry['module']:<20} {entry['ms']:8.1f} ms")
+    print(f"Imported when a stage first needs them: {result['deferred_ms']:.1f} ms")
+    for module in DEFERRED_MODULES:
+        print(f"  {module:<20} {result['import_ms'][module]:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline lead generation benchmark')
+    parser.add_argument('--counts', default='10,100,1000', help='Comma-separated lead counts (default: 10,100,1000)')
+    parser.add_argument('--mode', choices=['pipelined', 'serial', 'both'], default='pipelined',
+                        help='Stage runner to benchmark (default: pipelined)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Workers per pipeline stage (default: 4)')
+    parser.add_argument('--urls-per-query', type=int, default=lead_generator.DEFAULT_URLS_PER_QUERY,
+                        help=f'LinkedIn company URLs taken from each search (default: {lead_generator.DEFAULT_URLS_PER_QUERY})')
+    parser.add_argument('--jobs', type=int, default=1, help='Jobs of --counts leads each run at the same time (default: 1)')
+    parser.add_argument('--interactive', action='store_true',
+                        help=f'Also start a small interactive job of {INTERACTIVE_MAX_COUNT} leads while the others run')
+    parser.add_argument('--provider-concurrency', action='append', default=[], metavar='PROVIDER=N',
+                        help='Override the calls in flight per provider across all jobs')
+    parser.add_argument('--fake', action='append', default=[], metavar='PROVIDER.SETTING=VALUE',
+                        help='Override a fake provider setting, e.g. openai.latency=0.2 or jigsawstack_scrape.rate_limit_rate=0.1 '
+                             f"(providers: {', '.join(sorted(DEFAULT_PROFILES))}; "
+                             f"settings: {', '.join(FAKE_SETTINGS)}; retry_after defaults to {DEFAULT_RETRY_AFTER})")
+    parser.add_argument('--no-snippet-filter', action='store_true',
+                        help='Scrape every new company instead of filtering candidates by their search snippets')
+    parser.add_argument('--breaker-max-wait', type=float,
+                        help='Seconds a call waits for an open circuit before its job is aborted (default: 300)')
+    parser.add_argument('--expect-abort', action='store_true',
+                        help='Exit with code 1 unless every job is aborted by a provider outage, e.g. with --fake ...outage')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for latencies and errors (default: 0)')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', help='Compare throughput with results from an earlier --output file')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed throughput drop against the baseline before failing (default: 0.2)')
+    parser.add_argument('--startup', action='store_true',
+                        help='Measure the import time of lead_generator with -X importtime instead of running jobs')
+    parser.add_argument('--verbose', action='store_true', help='Show the lead generator log')
+    args = parser.parse_args()
+
+    lead_generator.configure_logging(log_file=None)
+    logging.getLogger('lead_generation').setLevel(logging.INFO if args.verbose else logging.CRITICAL)
+
+    if args.startup:
+        print("Running startup benchmark...")
+        result = run_startup_benchmark()
+        print_startup_result(result)
+        if args.output:
+            with open(args.output, 'w') as output_file:
+                json.dump(result, output_file, indent=2)
+            print(f"Results written to {args.output}")
+        return 0
+
+    try:
+        counts = [int(count) for count in args.counts.split(',') if count.strip()]
+        profiles = parse_profile_overrides(args.fake)
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return 1
+    modes = ['pipelined', 'serial'] if args.mode == 'both' else [args.mode]
+
+    configure_cache(enabled=False)
+    configure_lead_profile(':memory:')
+    configure_rate_limits([f"{provider}={BENCHMARK_RATE_LIMIT}" for provider in DEFAULT_RATE_LIMITS])
+    configure_scheduler(args.provider_concurrency)
+    if args.breaker_max_wait is not None:
+        configure_resilience(breaker_max_wait=args.breaker_max_wait)
+
+    print("Running offline lead generation benchmark...")
+    print(f"Fake providers: {json.dumps(dict(DEFAULT_PROFILES, **profiles))}")
+    results = []
+    for mode in modes:
+        for count in counts:
+            result = run_benchmark(
+                count, mode, args.concurrency, profiles, args.seed, args.urls_per_query, args.jobs, args.interactive,
+                not args.no_snippet_filter
+            )
+            print_result(result)
+            results.append(result)
+
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        max_rss_mb = max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+        print(f"\nProcess peak RSS: {max_rss_mb:.1f} MB")
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.expect_abort:
+        completed = [
+            f"{result['mode']} x {result['count']}" for result in results
+            if len(result['aborted_jobs']) < len(result['job_seconds'])
+        ]
+        if completed:
+            print(f"Jobs finished despite the expected provider outage: {', '.join(completed)}")
+            return 1
+        print("Every job was aborted by the provider outage")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare_with_baseline(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            for regression in regressions:
+                print(f"REGRESSION: {regression}")
+            return 1
+        print("No throughput regressions against the baseline")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
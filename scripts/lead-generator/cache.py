@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Local Content Cache
+SQLite-backed cache for expensive API results such as JigsawStack search
+and ai_scrape responses and OpenAI chat completions. Entries expire after a
+per-namespace TTL and the least recently used entries are evicted once the
+cache exceeds its size cap.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from types import SimpleNamespace
+
+logger = logging.getLogger('lead_generation')
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'lead_cache.sqlite3')
+
+# Seconds an entry stays fresh, per namespace
+DEFAULT_TTLS = {
+    'search': 24 * 3600,
+    'scrape': 7 * 24 * 3600,
+    'llm': 7 * 24 * 3600
+}
+# Fallback TTL for namespaces without an explicit entry
+DEFAULT_TTL = 24 * 3600
+# Total size of cached values before least recently used entries are evicted
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+# Eviction trims the cache down to this fraction of the size cap
+EVICTION_TARGET = 0.9
+# Number of writes between size checks
+EVICTION_CHECK_INTERVAL = 50
+
+
+def make_cache_key(*parts):
+    """Build a stable cache key from JSON-serializable parts"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ContentCache:
+    """SQLite key/value cache with TTL expiry and LRU eviction"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES, ttls=None, read=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        # With read disabled the cache only records fresh results (used to refresh it)
+        self.read = read
+        self.hits = {}
+        self.misses = {}
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_cache_entries_accessed_at ON cache_entries(accessed_at)'
+        )
+        self._conn.commit()
+
+    def get(self, namespace, key):
+        """Return the cached value, or None if it is missing or expired"""
+        if not self.read:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, created_at FROM cache_entries WHERE namespace = ? AND key = ?',
+                (namespace, key)
+            ).fetchone()
+            if row is None:
+                self._count(self.misses, namespace)
+                return None
+            value, created_at = row
+            if now - created_at > self.ttls.get(namespace, DEFAULT_TTL):
+                self._conn.execute(
+                    'DELETE FROM cache_entries WHERE namespace = ? AND key = ?', (namespace, key)
+                )
+                self._conn.commit()
+                self._count(self.misses, namespace)
+                return None
+            self._conn.execute(
+                'UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?',
+                (now, namespace, key)
+            )
+            self._conn.commit()
+            self._count(self.hits, namespace)
+        return json.loads(value)
+
+    @staticmethod
+    def _count(counter, namespace):
+        counter[namespace] = counter.get(namespace, 0) + 1
+
+    def set(self, namespace, key, value):
+        """Store a JSON-serializable value"""
+        payload = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache_entries (namespace, key, value, size, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (namespace, key, payload, len(payload), now, now)
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % EVICTION_CHECK_INTERVAL == 0:
+                self._evict()
+
+    def _evict(self):
+        """Drop expired entries, then least recently used ones until under the size cap"""
+        now = time.time()
+        for namespace, ttl in self.ttls.items():
+            self._conn.execute(
+                'DELETE FROM cache_entries WHERE namespace = ? AND created_at < ?', (namespace, now - ttl)
+            )
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache_entries').fetchone()[0]
+        if total > self.max_bytes:
+            target = self.max_bytes * EVICTION_TARGET
+            evicted = 0
+            rows = self._conn.execute(
+                'SELECT namespace, key, size FROM cache_entries ORDER BY accessed_at'
+            ).fetchall()
+            for namespace, key, size in rows:
+                if total <= target:
+                    break
+                self._conn.execute(
+                    'DELETE FROM cache_entries WHERE namespace = ? AND key = ?', (namespace, key)
+                )
+                total -= size
+                evicted += 1
+            logger.info(f"Evicted {evicted} least recently used cache entries")
+        self._conn.commit()
+
+    def stats(self):
+        """Return hit and miss counters per namespace"""
+        return {
+            namespace: {'hits': self.hits.get(namespace, 0), 'misses': self.misses.get(namespace, 0)}
+            for namespace in sorted(set(self.hits) | set(self.misses))
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LLMMemo:
+    """Memoizes OpenAI chat completions keyed on a hash of the model, prompt and parameters"""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    @staticmethod
+    def make_key(params):
+        return make_cache_key(params)
+
+    def get(self, params):
+        """Return a completion-like object for a previously seen request, or None"""
+        cached = self.cache.get('llm', self.make_key(params))
+        if cached is None:
+            return None
+        # Mirror the parts of the OpenAI response object the helpers read
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=cached['content']))],
+            model=cached.get('model'),
+            usage=SimpleNamespace(prompt_tokens=0, completion_tokens=0, total_tokens=0),
+            cached=True
+        )
+
+    def put(self, params, response):
+        """Remember the content of a completion for identical future requests"""
+        content = response.choices[0].message.content
+        if content:
+            self.cache.set('llm', self.make_key(params), {
+                'content': content,
+                'model': getattr(response, 'model', params.get('model'))
+            })
+
+    def stats(self):
+        """Return hit and miss counters for memoized completions"""
+        return {'hits': self.cache.hits.get('llm', 0), 'misses': self.cache.misses.get('llm', 0)}
+
+
+_cache = None
+_llm_memo = None
+
+
+def configure_cache(path=None, enabled=True, read=True, memoize_llm=True):
+    """Open the shared content cache, or disable it when enabled is False"""
+    global _cache, _llm_memo
+    if _cache is not None:
+        _cache.close()
+        _cache = None
+        _llm_memo = None
+    if enabled:
+        path = path or os.environ.get('LEAD_CACHE_PATH') or DEFAULT_CACHE_PATH
+        _cache = ContentCache(path, read=read)
+        logger.info(f"Using content cache at {path}" + ("" if read else " (refresh mode)"))
+        if memoize_llm:
+            _llm_memo = LLMMemo(_cache)
+    return _cache
+
+
+def get_cache():
+    """Return the shared content cache, or None when caching is disabled"""
+    return _cache
+
+
+def get_llm_memo():
+    """Return the shared LLM memo, or None when memoization is disabled"""
+    return _llm_memo
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Job Checkpoints
+Append-only journal of the work a lead generation job has finished: the
+search parameters, each round of search queries, every searched query,
+scraped profile, enriched lead and stored lead. A job that crashed can be
+resumed from its journal, skipping everything that was already paid for.
+Scraped and enriched leads stay on disk; the journal only keeps the file
+offset of each one in memory and reads it back when a resumed job needs it.
+"""
+
+import json
+import os
+import threading
+import logging
+
+logger = logging.getLogger('lead_generation')
+
+DEFAULT_JOURNAL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.jobs')
+
+
+def get_journal_path(job_id, directory=None):
+    """Return the journal file path for a job"""
+    directory = directory or os.environ.get('LEAD_JOURNAL_DIR') or DEFAULT_JOURNAL_DIR
+    safe_id = ''.join(c if c.isalnum() or c in '-_' else '_' for c in str(job_id))
+    return os.path.join(directory, f"{safe_id}.jsonl")
+
+
+class JobJournal:
+    """Thread-safe checkpoint journal for one job, backed by a JSON lines file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.params = None
+        self.search_params = None
+        self._queries = {}
+        self._searches = {}
+        self._scraped = {}
+        self._enriched = {}
+        self._stored = set()
+        self._lock = threading.Lock()
+        # Byte offset where the next record will be written
+        self._end = 0
+        self._reader = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(path):
+            self._load()
+        self._file = open(path, 'ab')
+
+    def _load(self):
+        line = b''
+        with open(self.path, 'rb') as journal_file:
+            for line_number, line in enumerate(journal_file, 1):
+                offset = self._end
+                self._end += len(line)
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    # A crash can leave the last line half written
+                    logger.warning(f"Ignoring unreadable line {line_number} in job journal {self.path}")
+                    continue
+                self._apply(record, offset)
+        if line and not line.endswith(b'\n'):
+            # End the half-written line so the next record starts on a line of its own
+            with open(self.path, 'ab') as journal_file:
+                journal_file.write(b'\n')
+            self._end += 1
+        logger.info(f"Loaded job journal {self.path}: {json.dumps(self.summary())}")
+
+    def _read_lead(self, offset):
+        """Read the lead of the scraped or enriched record at a file offset"""
+        with self._lock:
+            if self._reader is None:
+                self._reader = open(self.path, 'rb')
+            self._reader.seek(offset)
+            line = self._reader.readline()
+        return json.loads(line)['lead']
+
+    def _apply(self, record, offset):
+        kind = record.get('type')
+        if kind == 'params':
+            self.params = record['params']
+            self.search_params = record['search_params']
+        elif kind == 'queries':
+            self._queries[record['round']] = record['queries']
+        elif kind == 'search':
+            self._searches[record['query']] = record['urls']
+        elif kind == 'scraped':
+            self._scraped[record['url']] = offset
+        elif kind == 'enriched':
+            self._enriched[record['url']] = offset
+        elif kind == 'stored':
+            self._stored.add(record['url'])
+
+    def _append(self, record):
+        line = (json.dumps(record, default=str) + '\n').encode('utf-8')
+        with self._lock:
+            self._apply(record, self._end)
+            self._file.write(line)
+            self._file.flush()
+            self._end += len(line)
+
+    def record_params(self, params, search_params):
+        self._append({'type': 'params', 'params': params, 'search_params': search_params})
+
+    def get_queries(self, round_number):
+        """Return the queries generated for a round, or None if the round was never started"""
+        return self._queries.get(round_number)
+
+    def record_queries(self, round_number, queries):
+        self._append({'type': 'queries', 'round': round_number, 'queries': list(queries)})
+
+    def has_search(self, query):
+        return query in self._searches
+
+    def get_search(self, query):
+        """Return the new LinkedIn URLs a searched query produced"""
+        return list(self._searches.get(query, []))
+
+    def record_search(self, query, urls):
+        self._append({'type': 'search', 'query': query, 'urls': list(urls)})
+
+    def found_urls(self):
+        """Return the LinkedIn URLs this job has already discovered"""
+        return [url for urls in self._searches.values() for url in urls]
+
+    def get_scraped(self, url):
+        offset = self._scraped.get(url)
+        return self._read_lead(offset) if offset is not None else None
+
+    def record_scraped(self, url, lead):
+        self._append({'type': 'scraped', 'url': url, 'lead': lead})
+
+    def is_enriched(self, url):
+        return url in self._enriched
+
+    def get_enriched(self, url):
+        offset = self._enriched.get(url)
+        return self._read_lead(offset) if offset is not None else None
+
+    def record_enriched(self, url, lead):
+        self._append({'type': 'enriched', 'url': url, 'lead': lead})
+
+    def is_stored(self, url):
+        return url in self._stored
+
+    def record_stored(self, url):
+        self._append({'type': 'stored', 'url': url})
+
+    def summary(self):
+        """Return how many items each stage has checkpointed"""
+        return {
+            'query_rounds': len(self._queries),
+            'searched': len(self._searches),
+            'found': len(self.found_urls()),
+            'scraped': len(self._scraped),
+            'enriched': len(self._enriched),
+            'stored': len(self._stored)
+        }
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def remove(self):
+        """Close and delete the journal once the job no longer needs it"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError as e:
+            logger.warning(f"Could not remove job journal {self.path}: {str(e)}")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Company Deduplication
+Index of LinkedIn company URLs that are already stored as leads or have
+already been discovered in the current job, so known companies are dropped
+right after URL discovery instead of being scraped, enriched and inserted
+again.
+"""
+
+import hashlib
+import re
+import threading
+import logging
+from metrics import timed
+
+logger = logging.getLogger('lead_generation')
+
+# Rows fetched per request when loading existing source URLs
+PAGE_SIZE = 1000
+
+
+def normalize_company_url(url):
+    """Normalize a LinkedIn company URL so variants of the same page compare equal"""
+    url = str(url).strip()
+    match = re.search(r'linkedin\.com/company/([^/?#]+)', url, re.IGNORECASE)
+    if match:
+        return f"https://www.linkedin.com/company/{match.group(1).lower()}"
+    return url.split('#')[0].split('?')[0].rstrip('/').lower()
+
+
+def company_url_key(url):
+    """Return a 64-bit hash of the normalized URL, a fraction of the size of the URL string"""
+    digest = hashlib.blake2b(normalize_company_url(url).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class DedupIndex:
+    """Thread-safe set of hashed, normalized company URLs"""
+
+    def __init__(self, urls=()):
+        self._urls = {company_url_key(url) for url in urls if url}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._urls)
+
+    def __contains__(self, url):
+        return company_url_key(url) in self._urls
+
+    def add(self, url):
+        """Record a URL, returning True if it was not known before"""
+        key = company_url_key(url)
+        with self._lock:
+            if key in self._urls:
+                return False
+            self._urls.add(key)
+            return True
+
+    def discard(self, url):
+        """Forget a URL, e.g. one that belongs to the job being resumed"""
+        with self._lock:
+            self._urls.discard(company_url_key(url))
+
+
+def load_dedup_index(supabase_client):
+    """Build a dedup index from the source_url of every stored lead"""
+    logger.info("Loading existing lead source URLs for deduplication...")
+    index = DedupIndex()
+    start = 0
+    while True:
+        with timed('supabase', 'load_source_urls'):
+            response = supabase_client.table('leads') \
+                .select('source_url') \
+                .not_.is_('source_url', 'null') \
+                .order('id') \
+                .range(start, start + PAGE_SIZE - 1) \
+                .execute()
+        rows = response.data or []
+        for row in rows:
+            if row.get('source_url'):
+                index.add(row['source_url'])
+        if len(rows) < PAGE_SIZE:
+            break
+        start += PAGE_SIZE
+
+    logger.info(f"Loaded {len(index)} known company URLs")
+    return index
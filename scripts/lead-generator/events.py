@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Job Event Stream
+Machine-readable progress and results for callers such as server.js. Each
+event is one JSON object per line (NDJSON) written to stdout or to another
+file descriptor, separate from the human-readable log on stderr.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import logging
+
+logger = logging.getLogger('lead_generation')
+
+# Supported values of --events
+EVENT_FORMATS = ('none', 'ndjson')
+
+
+class EventStream:
+    """Writes events as JSON lines, one complete line per event"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def emit(self, event, **data):
+        record = {'event': event, 'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+        record.update(data)
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+
+_events = None
+
+
+def configure_events(event_format='none', fd=None):
+    """Enable the event stream on stdout, or on the given file descriptor"""
+    global _events
+    if event_format == 'ndjson':
+        stream = os.fdopen(fd, 'w', buffering=1) if fd is not None else sys.stdout
+        _events = EventStream(stream)
+    else:
+        _events = None
+    return _events
+
+
+def emit_event(event, **data):
+    """Write an event if the event stream is enabled"""
+    global _events
+    if _events is None:
+        return
+    try:
+        _events.emit(event, **data)
+    except (OSError, ValueError) as e:
+        # The reader went away; keep the job running but stop writing events
+        logger.warning(f"Disabling event stream after write error: {str(e)}")
+        _events = None
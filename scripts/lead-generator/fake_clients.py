@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Fake API Clients
+Local stand-ins for the JigsawStack, OpenAI and Supabase clients used by the
+lead generator. They answer with plausible data shaped like the real
+responses, and inject configurable latency, errors and 429 responses, so the
+pipeline can be benchmarked without network access.
+"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from readiness import AI_READINESS_CATEGORIES
+
+# Default behaviour per fake provider
+DEFAULT_PROFILES = {
+    'jigsawstack_search': {'latency': 0.02, 'error_rate': 0.01, 'rate_limit_rate': 0.02},
+    'jigsawstack_scrape': {'latency': 0.05, 'error_rate': 0.01, 'rate_limit_rate': 0.02},
+    'openai': {'latency': 0.03, 'error_rate': 0.01, 'rate_limit_rate': 0.02},
+    'supabase': {'latency': 0.01, 'error_rate': 0.0, 'rate_limit_rate': 0.0}
+}
+# LinkedIn company pages in each fake search result page
+COMPANIES_PER_SEARCH = 4
+# Seconds suggested in the Retry-After header of fake 429 responses
+DEFAULT_RETRY_AFTER = 0.05
+
+INDUSTRIES = ['Software Development', 'Financial Services', 'Logistics', 'Healthcare', 'Retail', 'Manufacturing']
+COMPANY_SIZES = ['2-10 employees', '11-50 employees', '51-200 employees', '201-500 employees']
+ABOUT_SENTENCES = [
+    'We build cloud software for small businesses across Southeast Asia.',
+    'Our team uses machine learning to automate document processing.',
+    'A family-run distributor serving retailers in Singapore since 1998.',
+    'We help clinics digitise patient records and appointment booking.',
+    'Our data science team develops custom AI models for logistics planning.',
+    'We provide accounting and payroll services to local SMEs.'
+]
+
+
+class FakeAPIError(Exception):
+    """Error shaped like the API client exceptions the rate limiter inspects"""
+
+    def __init__(self, status_code, message, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        headers = {'retry-after': str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(status_code=status_code, headers=headers)
+
+
+class FakeProvider:
+    """Injects latency, errors and 429s for one provider, and counts calls"""
+
+    def __init__(self, name, latency=0.0, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after=DEFAULT_RETRY_AFTER, max_concurrency=0, outage=0.0, outage_after=0.0, seed=None):
+        self.name = name
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        # Calls beyond this many in flight are answered with 429, like an overloaded API (0 = no limit)
+        self.max_concurrency = int(max_concurrency)
+        # Every call fails with 503 for outage seconds, starting outage_after seconds after the first call
+        self.outage = outage
+        self.outage_after = outage_after
+        self._first_call = None
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def call(self):
+        """Simulate one request: wait, then maybe fail"""
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            overloaded = 0 < self.max_concurrency < self.in_flight
+            # Exponentially distributed latency around the configured mean
+            delay = self._random.expovariate(1.0 / self.latency) if self.latency > 0 else 0.0
+            roll = self._random.random()
+            now = time.monotonic()
+            if self._first_call is None:
+                self._first_call = now
+            down = self.outage > 0 and 0 <= now - self._first_call - self.outage_after < self.outage
+        try:
+            if delay:
+                time.sleep(delay)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        if down:
+            with self._lock:
+                self.errors += 1
+            raise FakeAPIError(503, f"{self.name}: service unavailable")
+        if overloaded or roll < self.rate_limit_rate:
+            with self._lock:
+                self.rate_limited += 1
+            raise FakeAPIError(429, f"{self.name}: rate limited", self.retry_after)
+        if roll < self.rate_limit_rate + self.error_rate:
+            with self._lock:
+                self.errors += 1
+            raise FakeAPIError(500, f"{self.name}: internal error")
+
+    def stats(self):
+        return {
+            'calls': self.calls, 'errors': self.errors, 'rate_limited': self.rate_limited,
+            'max_in_flight': self.max_in_flight
+        }
+
+
+def _digest(text):
+    return hashlib.sha1(str(text).encode('utf-8')).hexdigest()
+
+
+class FakeResponse:
+    """requests.Response stand-in returned by the JigsawStack SDK"""
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class FakeJigsawStackWeb:
+    def __init__(self, search_provider, scrape_provider):
+        self.search_provider = search_provider
+        self.scrape_provider = scrape_provider
+
+    def search(self, params):
+        self.search_provider.call()
+        digest = _digest(params['query'])
+        slugs = [f"company-{digest[:10]}-{i}" for i in range(COMPANIES_PER_SEARCH)]
+        results = [{
+            'title': f"{params['query']} - Business Directory",
+            'url': f"https://www.example-directory.sg/{slugs[0]}",
+            'snippet': 'Directory listing of Singapore companies.'
+        }]
+        for i, slug in enumerate(slugs):
+            url = f"https://sg.linkedin.com/company/{slug}"
+            results.append({
+                'title': f"{slug.replace('-', ' ').title()} | LinkedIn",
+                'url': url,
+                'snippet': self._company_snippet(url)
+            })
+            if i == 0:
+                # Sub-pages of a company already in the results should not count as another company
+                results.append({
+                    'title': f"Jobs at {slug.replace('-', ' ').title()} | LinkedIn",
+                    'url': f"https://sg.linkedin.com/company/{slug}/jobs",
+                    'snippet': 'Open roles in Singapore.'
+                })
+        return FakeResponse({'success': True, 'results': results})
+
+    def _company_snippet(self, url):
+        """Snippet of a company result, stating as much as LinkedIn results do for a third of companies each"""
+        seed = int(_digest(url)[:8], 16)
+        if seed % 3 == 2:
+            return 'Singapore-based company. See who you know at this company.'
+        details = f"Industry: {INDUSTRIES[seed % len(INDUSTRIES)]} · Company size: {COMPANY_SIZES[seed % len(COMPANY_SIZES)]}"
+        if seed % 3 == 1:
+            return f"Singapore | {details}"
+        about = ' '.join(ABOUT_SENTENCES[(seed + i) % len(ABOUT_SENTENCES)] for i in range(2))
+        return (f"{about} | {details} · Headquarters: Singapore · "
+                f"Website: https://www.{url.rstrip('/').split('/')[-1]}.com.sg")
+
+    def ai_scrape(self, params):
+        self.scrape_provider.call()
+        seed = int(_digest(params['url'])[:8], 16)
+        about = ' '.join(ABOUT_SENTENCES[(seed + i) % len(ABOUT_SENTENCES)] for i in range(seed % 4))
+        return FakeResponse({
+            'success': True,
+            'context': {
+                'Company size': [COMPANY_SIZES[seed % len(COMPANY_SIZES)]],
+                'Industry': [INDUSTRIES[seed % len(INDUSTRIES)]],
+                'Website': [f"https://www.{params['url'].rstrip('/').split('/')[-1]}.com.sg"],
+                'About': [about] if about else []
+            }
+        })
+
+
+class FakeJigsawStack:
+    """Stand-in for jigsawstack.JigsawStack"""
+
+    def __init__(self, search_provider, scrape_provider):
+        self.web = FakeJigsawStackWeb(search_provider, scrape_provider)
+
+
+class FakeChatCompletions:
+    def __init__(self, provider):
+        self.provider = provider
+        self._query_counter = 0
+        self._lock = threading.Lock()
+
+    def create(self, model=None, messages=None, **params):
+        self.provider.call()
+        prompt = messages[-1]['content']
+        content = self._answer(prompt)
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(
+                prompt_tokens=len(prompt) // 4 + 1,
+                completion_tokens=len(content) // 4 + 1,
+                total_tokens=(len(prompt) + len(content)) // 4 + 2
+            )
+        )
+
+    def _category(self, text):
+        return AI_READINESS_CATEGORIES[int(_digest(text)[:8], 16) % len(AI_READINESS_CATEGORIES)]
+
+    def _answer(self, prompt):
+        """Answer in the format each lead generator prompt asks for"""
+        if 'search queries' in prompt:
+            count = int(re.search(r'Generate (\d+) search queries', prompt).group(1))
+            with self._lock:
+                start = self._query_counter
+                self._query_counter += count
+            return json.dumps([f"Singapore SME company {start + i}" for i in range(count)])
+        if 'Return a JSON array with one object per company' in prompt:
+            indexes = [int(index) for index in re.findall(r'^\s*\[(\d+)\] Industry', prompt, re.MULTILINE)]
+            return json.dumps([{'index': index, 'ai_readiness': self._category(f"{prompt}{index}")} for index in indexes])
+        if '"is_sme"' in prompt:
+            needs_about = 'set "about" to null' not in prompt
+            return json.dumps({
+                'about': 'A Singapore company serving SMEs across Southeast Asia with digital services.'
+                if needs_about else None,
+                'ai_readiness': self._category(prompt),
+                'is_sme': '201-500' not in prompt
+            })
+        if 'Return only one of these categories' in prompt:
+            return self._category(prompt)
+        if 'Analyze this summary of all' in prompt:
+            return json.dumps({
+                'industries': INDUSTRIES[:3],
+                'company_sizes': ['10-50', '50-200'],
+                'keywords': ['SME', 'Singapore', 'digital']
+            })
+        return 'A Singapore company serving SMEs across Southeast Asia with digital services.'
+
+
+class FakeOpenAI:
+    """Stand-in for openai.OpenAI"""
+
+    def __init__(self, provider):
+        self.chat = SimpleNamespace(completions=FakeChatCompletions(provider))
+
+
+class FakeQuery:
+    """Chainable PostgREST query builder over in-memory tables"""
+
+    def __init__(self, database, table):
+        self.database = database
+        self.table = table
+        self.operation = 'select'
+        self.payload = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.filters = []
+        self.negate = False
+        self.start = 0
+        self.end = None
+
+    def select(self, *columns, **kwargs):
+        self.operation = 'select'
+        return self
+
+    def insert(self, payload, **kwargs):
+        self.operation = 'insert'
+        self.payload = payload
+        return self
+
+    def upsert(self, payload, on_conflict=None, ignore_duplicates=False, **kwargs):
+        self.operation = 'upsert'
+        self.payload = payload
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, payload, **kwargs):
+        self.operation = 'update'
+        self.payload = payload
+        return self
+
+    @property
+    def not_(self):
+        self.negate = True
+        return self
+
+    def _filter(self, check):
+        negate, self.negate = self.negate, False
+        self.filters.append((lambda row: not check(row)) if negate else check)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(lambda row: row.get(column) == value)
+
+    def gt(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) > value)
+
+    def gte(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) >= value)
+
+    def in_(self, column, values):
+        values = set(values)
+        return self._filter(lambda row: row.get(column) in values)
+
+    def is_(self, column, value):
+        return self._filter(lambda row: row.get(column) is None if value == 'null' else row.get(column) == value)
+
+    def order(self, column, desc=False, **kwargs):
+        return self
+
+    def limit(self, count):
+        self.end = self.start + count - 1
+        return self
+
+    def range(self, start, end):
+        self.start, self.end = start, end
+        return self
+
+    def execute(self):
+        return self.database.execute(self)
+
+
+class FakeSupabase:
+    """Stand-in for the supabase client with in-memory tables"""
+
+    # Primary keys used to resolve upserts when on_conflict is not given
+    PRIMARY_KEYS = {'leads': 'id', 'lead_generation_jobs': 'job_id', 'search_query_stats': 'query_key'}
+
+    def __init__(self, provider, discard_tables=()):
+        self.provider = provider
+        self.tables = {}
+        # Rows written to these tables are acknowledged but not kept, so that long
+        # benchmarks measure the memory of the pipeline rather than of the fake database
+        self.discard_tables = set(discard_tables)
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def execute(self, query):
+        self.provider.call()
+        with self._lock:
+            rows = self.tables.setdefault(query.table, [])
+            matching = [row for row in rows if all(check(row) for check in query.filters)]
+            if query.operation == 'select':
+                end = len(matching) if query.end is None else query.end + 1
+                data = [dict(row) for row in matching[query.start:end]]
+            elif query.operation == 'update':
+                for row in matching:
+                    row.update(query.payload)
+                data = [dict(row) for row in matching]
+            else:
+                payload = query.payload if isinstance(query.payload, list) else [query.payload]
+                key = query.on_conflict or self.PRIMARY_KEYS.get(query.table, 'id')
+                written = [
+                    self._write(rows, dict(row), key, query.operation == 'upsert', query.ignore_duplicates)
+                    for row in payload
+                ]
+                # Rows skipped by ignore_duplicates are not returned, as with ON CONFLICT DO NOTHING
+                data = [dict(row) for row in written if row is not None]
+                if query.table in self.discard_tables:
+                    rows.clear()
+        return SimpleNamespace(data=data, error=None, count=None)
+
+    def _write(self, rows, row, key, upsert, ignore_duplicates=False):
+        if upsert and row.get(key) is not None:
+            for existing in rows:
+                if existing.get(key) == row[key]:
+                    if ignore_duplicates:
+                        return None
+                    existing.update(row)
+                    return existing
+        if 'id' not in row:
+            row['id'] = self._next_id
+            self._next_id += 1
+        rows.append(row)
+        return row
+
+
+def make_fake_clients(profiles=None, seed=0, discard_tables=()):
+    """Create fake JigsawStack, OpenAI and Supabase clients and their providers"""
+    settings = {name: dict(profile) for name, profile in DEFAULT_PROFILES.items()}
+    for name, overrides in (profiles or {}).items():
+        settings.setdefault(name, {}).update(overrides)
+    providers = {
+        name: FakeProvider(name, seed=seed + i, **profile)
+        for i, (name, profile) in enumerate(sorted(settings.items()))
+    }
+    clients = (
+        FakeJigsawStack(providers['jigsawstack_search'], providers['jigsawstack_scrape']),
+        FakeOpenAI(providers['openai']),
+        FakeSupabase(providers['supabase'], discard_tables)
+    )
+    return clients, providers
@@ -7,117 +7,193 @@ focusing on Singapore-based companies.
 
 import argparse
 import json
+import math
 import os
 import sys
 import time
 import logging
 import uuid
 import re
-from jigsawstack import JigsawStack
-import openai
-from supabase import create_client
+import threading
 from dotenv import load_dotenv
+from cache import configure_cache, get_cache, get_llm_memo, make_cache_key
+from checkpoint import JobJournal, get_journal_path
+from dedup import load_dedup_index, normalize_company_url
+from events import EVENT_FORMATS, configure_events, emit_event
+from lead_profile import configure_lead_profile, refresh_lead_profile
+from lead_record import LeadRecord
+from lead_scoring import DEFAULT_RESCORE_CHUNK_SIZE, rescore_leads, score_leads
+from metrics import (
+    Metrics, get_job_metrics, get_process_metrics, job_metrics, record_cache_hit, record_local_classification,
+    record_stage, record_stage_item, record_tokens, timed, write_prometheus_file
+)
+from pipeline import Pipeline, Stage
+from progress import DEFAULT_PROGRESS_INTERVAL, JobProgress, job_progress, record_progress
+from query_store import QueryPerformanceStore, query_key
+from rate_limiter import configure_rate_limits, rate_limited_call
+from readiness import AI_READINESS_CATEGORIES, DEFAULT_MIN_CONFIDENCE, configure_local_classifier, get_local_classifier
+from resilience import DEFAULT_MAX_RETRIES, ProviderUnavailableError, configure_resilience
+from scheduler import configure_scheduler, job_priority, job_schedule
+from snippets import DEFAULT_MIN_SCORE as DEFAULT_SNIPPET_MIN_SCORE, SnippetFilter, company_name_from_url
+from transport import (
+    DEFAULT_CONNECT_TIMEOUT, LazyClient, PooledJigsawStack, close_http_clients, configure_transport,
+    create_openai_client, create_supabase_client
+)
+from worker import DEFAULT_INTERACTIVE_JOBS, DEFAULT_MAX_JOBS, DEFAULT_POLL_INTERVAL, JobWorker
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("lead_generation.log"),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger('lead_generation')
 
+# Log file written alongside the console log
+DEFAULT_LOG_FILE = "lead_generation.log"
+
+# Maximum number of leads classified per batch AI readiness prompt
+DEFAULT_CLASSIFY_BATCH_SIZE = 20
+# Approximate input token budget for one batch AI readiness prompt
+CLASSIFY_PROMPT_TOKEN_BUDGET = 6000
+# Allowance per lead for its index, labels and JSON answer
+CLASSIFY_TOKENS_PER_LEAD = 20
+# About text is truncated to this many characters in batch prompts
+CLASSIFY_MAX_ABOUT_CHARS = 1500
+# Seconds the pipeline waits to fill a classification batch
+CLASSIFY_BATCH_TIMEOUT = 1.0
+# Number of batch rounds before remaining leads are classified one at a time
+CLASSIFY_MAX_ATTEMPTS = 2
+
+# Rounds of query generation before giving up on reaching the lead count
+MAX_QUERY_ROUNDS = 3
+# Most recent used queries listed in the prompt when asking for more
+MAX_EXCLUDED_QUERIES = 50
+
+# Most LinkedIn company URLs taken from one search result page (1 takes only the best match)
+DEFAULT_URLS_PER_QUERY = 10
+# New companies expected per query before any query has been searched, used to size the first round
+INITIAL_QUERY_YIELD = 2.0
+# Extra queries requested per round on top of the estimate, as a fraction
+QUERY_ROUND_MARGIN = 0.25
+# Query words that say nothing about a particular company, ignored when ranking results
+RANKING_IGNORED_TERMS = {'company', 'companies', 'linkedin', 'singapore', 'sme', 'smes', 'in', 'the', 'and', 'of', 'for'}
+
+# Number of leads written per multi-row upsert
+DEFAULT_STORE_BATCH_SIZE = 50
+# Seconds the pipeline waits to fill a store batch before writing a partial one
+STORE_BATCH_TIMEOUT = 1.0
+
+def required_env(name):
+    """Return an environment variable the API clients need, raising ValueError if it is not set"""
+    value = os.environ.get(name)
+    if not value:
+        raise ValueError(f"{name} environment variable is not set")
+    logger.info(f"{name} exists: {bool(value)}")
+    return value
+
+def create_jigsawstack_client():
+    """Create the JigsawStack client from the environment"""
+    return PooledJigsawStack(required_env('JIGSAWSTACK_API_KEY'))
+
+def create_openai_api_client():
+    """Create the OpenAI client from the environment"""
+    return create_openai_client(required_env('OPENAI_API_KEY'))
+
+def create_supabase_api_client():
+    """Create the Supabase client from the environment"""
+    return create_supabase_client(required_env('SUPABASE_URL'), required_env('SUPABASE_SERVICE_KEY'))
+
 def initialize_clients():
-    """Initialize API clients for JigsawStack, OpenAI, and Supabase"""
+    """Prepare the JigsawStack, OpenAI and Supabase clients on pooled keep-alive connections
+
+    Each client, and the library behind it, is only loaded when a stage first
+    uses it, so an analysis-only job never builds the JigsawStack client. A
+    missing environment variable raises ValueError at that point.
+    """
     logger.info("Initializing API clients...")
+    return (
+        LazyClient('JigsawStack', create_jigsawstack_client),
+        LazyClient('OpenAI', create_openai_api_client),
+        LazyClient('Supabase', create_supabase_api_client)
+    )
+
+def create_chat_completion(openai_client, operation='chat', cache_if=None, **params):
+    """Create an OpenAI chat completion, serving repeated requests from the LLM memo
+
+    operation names the calling helper in the metrics. cache_if is an optional
+    predicate on the response content; responses that fail it (e.g.
+    unparseable JSON) are not memoized so a retry asks again.
+    """
+    memo = get_llm_memo()
+    if memo:
+        cached = memo.get(params)
+        if cached is not None:
+            logger.debug("Using memoized OpenAI response")
+            record_cache_hit('llm')
+            return cached
     
-    # Check environment variables
-    jigsawstack_api_key = os.environ.get('JIGSAWSTACK_API_KEY')
-    openai_api_key = os.environ.get('OPENAI_API_KEY')
-    supabase_url = os.environ.get('SUPABASE_URL')
-    supabase_key = os.environ.get('SUPABASE_SERVICE_KEY')
-    
-    if not jigsawstack_api_key:
-        raise ValueError("JIGSAWSTACK_API_KEY environment variable is not set")
-    if not openai_api_key:
-        raise ValueError("OPENAI_API_KEY environment variable is not set")
-    if not supabase_url:
-        raise ValueError("SUPABASE_URL environment variable is not set")
-    if not supabase_key:
-        raise ValueError("SUPABASE_SERVICE_KEY environment variable is not set")
-    
-    logger.info(f"JIGSAWSTACK_API_KEY exists: {bool(jigsawstack_api_key)}")
-    logger.info(f"OPENAI_API_KEY exists: {bool(openai_api_key)}")
-    logger.info(f"SUPABASE_URL exists: {bool(supabase_url)}")
-    logger.info(f"SUPABASE_SERVICE_KEY exists: {bool(supabase_key)}")
-    
-    # Initialize clients
-    try:
-        jigsawstack_client = JigsawStack(api_key=jigsawstack_api_key)
-        logger.info("JigsawStack client initialized")
-    except Exception as e:
-        logger.error(f"Failed to initialize JigsawStack client: {str(e)}")
-        raise
-    
-    try:
-        openai_client = openai.Client(api_key=openai_api_key)
-        logger.info("OpenAI client initialized")
-    except Exception as e:
-        logger.error(f"Failed to initialize OpenAI client: {str(e)}")
-        raise
-    
-    try:
-        supabase_client = create_client(supabase_url, supabase_key)
-        logger.info("Supabase client initialized")
-    except Exception as e:
-        logger.error(f"Failed to initialize Supabase client: {str(e)}")
-        raise
+    response = rate_limited_call('openai_chat', operation, openai_client.chat.completions.create, **params)
+    record_tokens(operation, response)
     
-    return jigsawstack_client, openai_client, supabase_client
+    if memo and (cache_if is None or cache_if(response.choices[0].message.content or "")):
+        memo.put(params, response)
+    return response
+
+def contains_json(pattern):
+    """Return a predicate checking that response content contains parseable JSON matching pattern"""
+    def check(content):
+        match = re.search(pattern, content, re.DOTALL)
+        if not match:
+            return False
+        try:
+            json.loads(match.group(0))
+            return True
+        except ValueError:
+            return False
+    return check
 
-def update_job_status(supabase_client, job_id, status, message):
-    """Update job status in Supabase"""
+def update_job_status(supabase_client, job_id, status, message, result=None, params=None):
+    """Update job status, and optionally the job parameters and result, in Supabase"""
     try:
         logger.info(f"Updating job status to '{status}' for job {job_id}")
-        supabase_client.table('lead_generation_jobs').upsert({
+        job_data = {
             'job_id': job_id,
             'status': status,
             'message': message,
             'updated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ')
-        }).execute()
+        }
+        if params is not None:
+            job_data['params'] = params
+        if result is not None:
+            job_data['result'] = result
+        emit_event('status', job_id=job_id, status=status, message=message)
+        with timed('supabase', 'update_job'):
+            supabase_client.table('lead_generation_jobs').upsert(job_data).execute()
         logger.info(f"Job status updated successfully")
     except Exception as e:
         logger.error(f"Error updating job status: {str(e)}")
         raise
 
 def analyze_existing_leads(supabase_client, openai_client):
-    """Analyze existing leads to generate optimized search queries"""
+    """Analyze the profile of all existing leads to generate optimized search queries"""
     logger.info("Analyzing existing leads to generate optimized search queries...")
     
-    # Fetch existing leads from Supabase
+    # Bring the aggregate profile of every stored lead up to date
     try:
-        response = supabase_client.table('leads').select('*').limit(20).execute()
-        existing_leads = response.data
-        logger.info(f"Retrieved {len(existing_leads)} existing leads for analysis")
+        profile = refresh_lead_profile(supabase_client)
+        logger.info(f"Summarized {profile['leads']} existing leads for analysis")
     except Exception as e:
         logger.error(f"Error fetching existing leads: {str(e)}")
         return default_search_parameters()
     
-    if not existing_leads:
+    if not profile['leads']:
         logger.info("No existing leads found, using default search parameters")
         return default_search_parameters()
     
-    # Prepare data for OpenAI analysis
-    lead_data = json.dumps(existing_leads)
-    
     prompt = f"""
-    Analyze these existing leads:
-    {lead_data}
+    Analyze this summary of all {profile['leads']} existing leads. Each distribution lists how many leads
+    have a value and their total weight, where leads further along the sales pipeline (contacted, qualified,
+    proposal, closed) and with higher lead scores weigh more. Keywords are the most common words of their
+    About texts, by the same weight:
+    {json.dumps(profile, separators=(',', ':'))}
     
     Based on this data, identify:
     1. The most promising industries in Singapore
@@ -134,7 +210,10 @@ def analyze_existing_leads(supabase_client, openai_client):
     
     try:
         logger.info("Sending analysis request to OpenAI...")
-        response = openai_client.chat.completions.create(
+        response = create_chat_completion(
+            openai_client,
+            operation='analyze_leads',
+            cache_if=contains_json(r'\{.*\}'),
             model="gpt-4o-mini",
             messages=[{"role": "user", "content": prompt}],
             temperature=0.5,
@@ -166,8 +245,12 @@ def default_search_parameters():
         "keywords": ["SME", "Singapore", "startup"]
     }
 
-def generate_search_queries(openai_client, search_params, count):
-    """Generate Singapore-focused search queries"""
+def generate_search_queries(openai_client, search_params, count, exclude=None, examples=None):
+    """Generate Singapore-focused search queries, avoiding any queries in exclude
+
+    Queries in examples found the most new companies before, and the new
+    queries are asked to vary on them.
+    """
     logger.info(f"Generating {count} search queries based on search parameters...")
     
     industries = ", ".join(search_params.get("industries", ["Technology"]))
@@ -185,9 +268,24 @@ def generate_search_queries(openai_client, search_params, count):
     Return the queries as a JSON array of strings.
     """
     
+    if exclude:
+        excluded = json.dumps(list(exclude)[-MAX_EXCLUDED_QUERIES:])
+        prompt += f"""
+    These queries have already been used, so return different ones: {excluded}
+    """
+    
+    if examples:
+        prompt += f"""
+    These queries found the most new companies so far. Write new variations of them, for example other
+    sub-industries, neighbourhoods or company types, rather than repeating them: {json.dumps(list(examples))}
+    """
+    
     try:
         logger.info("Sending query generation request to OpenAI...")
-        response = openai_client.chat.completions.create(
+        response = create_chat_completion(
+            openai_client,
+            operation='generate_queries',
+            cache_if=contains_json(r'\[.*\]'),
             model="gpt-4o-mini",
             messages=[{"role": "user", "content": prompt}],
             temperature=0.7,
@@ -215,11 +313,9 @@ def generate_search_queries(openai_client, search_params, count):
             if "singapore" not in query.lower():
                 query = f"{query} Singapore"
             final_queries.append(query)
-            
-        # Ensure we have the requested number of queries
-        while len(final_queries) < count:
-            final_queries.append(f"Singapore SME {len(final_queries) + 1}")
-            
+        
+        # A short answer is not padded with placeholder queries; SearchQueryFeed asks again
+        # in its next round if the queries it got do not find enough companies
         return final_queries[:count]
         
     except Exception as e:
@@ -235,98 +331,372 @@ def generate_search_queries(openai_client, search_params, count):
         logger.info(f"Using {len(fallback_queries[:count])} fallback queries due to error")
         return fallback_queries[:count]
 
-def find_linkedin_urls(jigsawstack_client, search_queries):
-    """Find LinkedIn URLs for the given search queries"""
-    logger.info(f"Finding LinkedIn URLs for {len(search_queries)} search queries...")
-    linkedin_urls = []
+def normalize_query(query):
+    """Normalize a search query so trivially different spellings share cache entries"""
+    return " ".join(str(query).lower().split())
+
+def fetch_search_results(jigsawstack_client, search_params):
+    """Run a JigsawStack search, serving repeated queries from the content cache"""
+    cache = get_cache()
+    if cache:
+        cache_key = make_cache_key(dict(search_params, query=normalize_query(search_params["query"])))
+        cached = cache.get('search', cache_key)
+        if cached is not None:
+            logger.info(f"Using cached search results for '{search_params['query']}'")
+            record_cache_hit('search')
+            return cached
     
-    for i, query in enumerate(search_queries):
-        logger.info(f"Processing query {i+1}/{len(search_queries)}: '{query}'")
+    logger.info(f"Sending search request to JigsawStack...")
+    search_results = rate_limited_call('jigsawstack_search', 'search', jigsawstack_client.web.search, search_params)
+    payload = search_results.json()
+    
+    if cache:
+        cache.set('search', cache_key, payload)
+    return payload
+
+def fetch_scrape_context(jigsawstack_client, scrape_params):
+    """Run a JigsawStack ai_scrape, serving previously scraped pages from the content cache"""
+    cache = get_cache()
+    if cache:
+        cache_key = make_cache_key(normalize_company_url(scrape_params["url"]), scrape_params["element_prompts"])
+        cached = cache.get('scrape', cache_key)
+        if cached is not None:
+            logger.info(f"Using cached scrape data for {scrape_params['url']}")
+            record_cache_hit('scrape')
+            return cached
+    
+    logger.info(f"Sending scrape request to JigsawStack...")
+    result = rate_limited_call('jigsawstack_scrape', 'ai_scrape', jigsawstack_client.web.ai_scrape, scrape_params)
+    context = result.json().get("context", {})
+    
+    if cache and context:
+        cache.set('scrape', cache_key, context)
+    return context
+
+def company_root_url(url):
+    """Reduce a LinkedIn company sub-page URL (jobs, posts, ...) to the company page itself"""
+    match = re.match(r'(https?://[^/]*linkedin\.com/company/[^/?#]+)', url, re.IGNORECASE)
+    return match.group(1) if match else url
+
+def search_result_text(result):
+    """Return the title, description and snippets of a search result as one lowercase string"""
+    parts = [result.get("title"), result.get("description"), result.get("snippet")]
+    snippets = result.get("snippets")
+    if isinstance(snippets, list):
+        parts.extend(snippets)
+    return " ".join(str(part) for part in parts if part).lower()
+
+def rank_company_results(results, query):
+    """Return (url, result) for the distinct LinkedIn company URLs in a result set, most relevant first
+
+    Results are scored by their position on the page, whether they are the
+    company page itself rather than a sub-page, whether they mention
+    Singapore and how many of the query's words they contain.
+    """
+    terms = set(re.findall(r'[a-z0-9]+', query.lower())) - RANKING_IGNORED_TERMS
+    scores = {}
+    for position, result in enumerate(results):
+        url = result.get("url", "")
+        if "linkedin.com/company/" not in url:
+            continue
+        root_url = company_root_url(url)
+        text = search_result_text(result)
+        score = 1.0 / (position + 1)
+        if root_url.rstrip('/') == url.split('?')[0].split('#')[0].rstrip('/'):
+            score += 0.5
+        if "singapore" in text:
+            score += 0.5
+        if terms:
+            score += 0.5 * sum(1 for term in terms if term in text) / len(terms)
+        key = normalize_company_url(root_url)
+        if key not in scores or score > scores[key][0]:
+            scores[key] = (score, root_url, result)
+    return [(url, result) for _, url, result in sorted(scores.values(), key=lambda item: -item[0])]
+
+def search_linkedin_results(jigsawstack_client, query, max_urls=DEFAULT_URLS_PER_QUERY):
+    """Search one query and return (url, result) for up to max_urls LinkedIn company URLs ranked by relevance
+
+    Returns None if the search failed, so the query is not recorded as searched.
+    """
+    try:
+        # Search for LinkedIn company URLs
+        search_params = {
+            "query": f"{query} company linkedin",
+            "ai_overview": True,
+            "safe_search": "moderate",
+            "spell_check": True
+        }
         
-        # Add a small delay between requests to avoid rate limiting
-        if i > 0:
-            time.sleep(1)
+        results = fetch_search_results(jigsawstack_client, search_params).get("results", [])
+        logger.info(f"Received {len(results)} search results")
         
-        try:
-            # Search for LinkedIn company URL
-            search_params = {
-                "query": f"{query} company linkedin",
-                "ai_overview": True,
-                "safe_search": "moderate",
-                "spell_check": True
-            }
-            
-            logger.info(f"Sending search request to JigsawStack...")
-            search_results = jigsawstack_client.web.search(search_params)
-            results = search_results.json().get("results", [])
-            logger.info(f"Received {len(results)} search results")
+        # Extract every distinct LinkedIn company URL from the search results
+        ranked = rank_company_results(results, query)[:max_urls]
+        if ranked:
+            logger.info(f"Found {len(ranked)} LinkedIn URLs: {[url for url, _ in ranked]}")
+            return ranked
+        
+        logger.warning(f"No LinkedIn URL found for query: '{query}'")
+        return []
+    
+    except ProviderUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching for '{query}': {str(e)}")
+    
+    return None
+
+def search_linkedin_urls(jigsawstack_client, query, max_urls=DEFAULT_URLS_PER_QUERY):
+    """Search one query and return up to max_urls LinkedIn company URLs ranked by relevance, or None on failure"""
+    ranked = search_linkedin_results(jigsawstack_client, query, max_urls)
+    return None if ranked is None else [url for url, _ in ranked]
+
+def search_linkedin_url(jigsawstack_client, query):
+    """Search for the LinkedIn company URL matching a single query"""
+    urls = search_linkedin_urls(jigsawstack_client, query, max_urls=1)
+    return urls[0] if urls else None
+
+class SearchQueryFeed:
+    """Iterable of search queries that keeps generating rounds until enough new companies are found
+
+    The search stage reports each finished query through record(), so a new
+    round is only requested once the previous one has been fully searched.
+    With a query_store, each round reuses proven queries from earlier jobs
+    and only asks the LLM for the rest.
+    """
+
+    def __init__(self, openai_client, search_params, target, max_rounds=MAX_QUERY_ROUNDS, journal=None,
+                 expected_yield=INITIAL_QUERY_YIELD, query_store=None):
+        self.openai_client = openai_client
+        self.search_params = search_params
+        self.target = target
+        self.max_rounds = max_rounds
+        # Rounds already generated by an interrupted run are replayed from the journal
+        self.journal = journal
+        # New companies per query assumed until real searches have been recorded
+        self.expected_yield = expected_yield
+        # Search yield of queries across jobs, or None to generate every query
+        self.query_store = query_store
+        self.issued = 0
+        self.searched = 0
+        self.found = 0
+        # Set when the pipeline stops taking work, so queued queries will never be searched
+        self.stopped = False
+        self._condition = threading.Condition()
+
+    def record(self, new_companies):
+        """Record that one query finished and how many new companies it found"""
+        with self._condition:
+            self.searched += 1
+            self.found += new_companies
+            self._condition.notify_all()
+
+    def stop(self):
+        """Stop issuing queries and stop waiting for the ones in flight"""
+        with self._condition:
+            self.stopped = True
+            self._condition.notify_all()
+
+    def record_search(self, query, urls_found, new_urls):
+        """Record the LinkedIn URLs a query returned and the new companies among them in the query store"""
+        if self.query_store is not None:
+            self.query_store.record_search(query, urls_found, new_urls)
+
+    def record_stored(self, urls):
+        """Credit stored leads to the queries that found them in the query store"""
+        if self.query_store is not None:
+            self.query_store.record_stored(urls)
+
+    def _next_queries(self, needed, used):
+        """Return up to needed new queries, reusing proven ones before generating the rest"""
+        if self.query_store is None:
+            queries = generate_search_queries(self.openai_client, self.search_params, needed, exclude=used)
+            return [query for query in queries if query not in used]
+        
+        reused = self.query_store.choose(self.query_store.reuse_share(needed), exclude=used)
+        if reused:
+            logger.info(f"Reusing {len(reused)} high-yield search queries from earlier jobs")
+        generated = []
+        if needed > len(reused):
+            # Known queries come first so the most recent ones of this job survive the exclusion limit
+            exclude = self.query_store.known_queries() + used + reused
+            generated = generate_search_queries(
+                self.openai_client, self.search_params, needed - len(reused), exclude=exclude,
+                examples=self.query_store.best_queries()
+            )
+            taken = {query_key(query) for query in used + reused}
+            generated = [
+                query for query in generated
+                if query_key(query) not in taken and not self.query_store.is_retired(query)
+            ]
+        if len(reused) + len(generated) < needed:
+            # Top up a short LLM answer with the next best stored queries
+            reused += self.query_store.choose(needed - len(reused) - len(generated), exclude=used + reused + generated)
+        return reused + generated
+
+    def _done(self):
+        return self.stopped or self.found >= self.target
+
+    def _queries_needed(self, remaining):
+        """Estimate how many queries will find the remaining companies, from the yield so far"""
+        # Until a query has found something, fall back to the expected yield
+        query_yield = self.found / self.searched if self.found else self.expected_yield
+        return max(1, math.ceil(remaining / max(1.0, query_yield) * (1 + QUERY_ROUND_MARGIN)))
+
+    def __iter__(self):
+        used = []
+        for round_number in range(self.max_rounds):
+            with self._condition:
+                # Wait for in-flight searches so the next round is sized by real results
+                while self.searched < self.issued and not self._done():
+                    self._condition.wait(timeout=1.0)
+                remaining = self.target - self.found
+            if remaining <= 0 or self.stopped:
+                return
             
-            # Extract LinkedIn URLs from search results
-            found_url = False
-            for result in results:
-                url = result.get("url", "")
-                if "linkedin.com/company/" in url:
-                    logger.info(f"Found LinkedIn URL: {url}")
-                    linkedin_urls.append(url)
-                    found_url = True
-                    break  # Take the first LinkedIn URL for each query
+            if round_number > 0:
+                logger.info(f"Found {self.found}/{self.target} new companies, generating more search queries...")
+            queries = self.journal.get_queries(round_number) if self.journal is not None else None
+            if queries is None:
+                queries = self._next_queries(self._queries_needed(remaining), used)
+                if self.journal is not None:
+                    self.journal.record_queries(round_number, queries)
+            if not queries:
+                logger.warning("No new search queries could be generated")
+                return
             
-            if not found_url:
-                logger.warning(f"No LinkedIn URL found for query: '{query}'")
-                
-        except Exception as e:
-            logger.error(f"Error searching for '{query}': {str(e)}")
+            for query in queries:
+                if self._done():
+                    return
+                used.append(query)
+                with self._condition:
+                    self.issued += 1
+                yield query
+        
+        logger.info(f"Stopping after {self.max_rounds} rounds of search queries with {self.found} new companies")
+
+def find_new_linkedin_urls(jigsawstack_client, query, dedup_index=None, query_feed=None, journal=None,
+                           urls_per_query=DEFAULT_URLS_PER_QUERY, snippet_filter=None):
+    """Search one query, returning its LinkedIn URLs for companies that are not already known
+
+    With a snippet_filter, companies whose search result shows they are off
+    target are dropped here, before they are scraped.
+    """
+    urls = []
+    try:
+        if journal is not None and journal.has_search(query):
+            # Searched before the job was interrupted
+            urls = journal.get_search(query)
+            if dedup_index is not None:
+                for url in urls:
+                    dedup_index.add(url)
+            return urls
+        
+        found = search_linkedin_results(jigsawstack_client, query, urls_per_query)
+        for url, result in found or []:
+            if dedup_index is not None and not dedup_index.add(url):
+                logger.info(f"Skipping already known company: {url}")
+                continue
+            if snippet_filter is not None and not snippet_filter.admit(url, result):
+                continue
+            urls.append(url)
+        if journal is not None and found is not None:
+            # A failed search is not journaled, so a resumed job tries the query again
+            journal.record_search(query, urls)
+        if query_feed is not None and found is not None:
+            query_feed.record_search(query, len(found), urls)
+        return urls
+    finally:
+        # Also counted when the search raises, so the feed never waits for a query that will not finish
+        if query_feed is not None:
+            query_feed.record(len(urls))
+
+def find_linkedin_urls(jigsawstack_client, search_queries, dedup_index=None, limit=None, journal=None,
+                       urls_per_query=DEFAULT_URLS_PER_QUERY, snippet_filter=None):
+    """Find LinkedIn URLs for the given search queries, skipping known companies"""
+    logger.info(f"Finding LinkedIn URLs for search queries...")
+    query_feed = search_queries if isinstance(search_queries, SearchQueryFeed) else None
+    linkedin_urls = []
     
-    logger.info(f"Found {len(linkedin_urls)} LinkedIn URLs in total")
+    for i, query in enumerate(search_queries):
+        logger.info(f"Processing query {i+1}: '{query}'")
+        linkedin_urls.extend(
+            find_new_linkedin_urls(
+                jigsawstack_client, query, dedup_index, query_feed, journal, urls_per_query, snippet_filter
+            )
+        )
+        if limit is not None and len(linkedin_urls) >= limit:
+            linkedin_urls = linkedin_urls[:limit]
+            break
+    
+    logger.info(f"Found {len(linkedin_urls)} LinkedIn URLs in total from {i + 1 if linkedin_urls else 0} queries")
     return linkedin_urls
 
-def scrape_linkedin_profiles(jigsawstack_client, linkedin_urls):
+def scrape_linkedin_profile(jigsawstack_client, url, journal=None, snippet_filter=None):
+    """Scrape data from a single LinkedIn profile, or take it from a complete search snippet"""
+    if journal is not None:
+        data = journal.get_scraped(url)
+        if data is not None:
+            return LeadRecord.from_dict(data)
+    
+    data = snippet_filter.take(url) if snippet_filter is not None else None
+    if data is not None:
+        logger.info(f"Search snippet of {url} has every scraped field, skipping the scrape")
+        lead = LeadRecord.from_dict(data)
+        if journal is not None:
+            journal.record_scraped(url, lead.to_dict())
+        return lead
+    
+    try:
+        # Scrape LinkedIn profile
+        scrape_params = {
+            "url": url,
+            "element_prompts": ["Company size", "Industry", "Website", "About"]
+        }
+        
+        data = fetch_scrape_context(jigsawstack_client, scrape_params)
+        logger.info(f"Received scrape data: {json.dumps(data)[:100]}...")
+        
+        # Ensure all prompts are present in the data
+        for prompt in scrape_params["element_prompts"]:
+            value = data.setdefault(prompt, ["-"])
+            # If the value is an empty list, replace it with '-'
+            if isinstance(value, list) and not value:
+                data[prompt] = "-"
+            elif isinstance(value, list):
+                # Join list elements into a comma-separated string
+                data[prompt] = ", ".join(map(str, value))
+        
+        # Add source URL
+        data["source_url"] = url
+        
+        # Extract company name from LinkedIn URL
+        company_name = company_name_from_url(url)
+        data["company_name"] = company_name
+        
+        logger.info(f"Successfully scraped data for: {company_name}")
+        lead = LeadRecord.from_dict(data)
+        if journal is not None:
+            journal.record_scraped(url, lead.to_dict())
+        return lead
+        
+    except ProviderUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Error scraping {url}: {str(e)}")
+    
+    return None
+
+def scrape_linkedin_profiles(jigsawstack_client, linkedin_urls, journal=None, snippet_filter=None):
     """Scrape data from LinkedIn profiles"""
     logger.info(f"Scraping data from {len(linkedin_urls)} LinkedIn profiles...")
     lead_data = []
     
     for i, url in enumerate(linkedin_urls):
         logger.info(f"Scraping profile {i+1}/{len(linkedin_urls)}: {url}")
-        
-        # Add a small delay between requests to avoid rate limiting
-        if i > 0:
-            time.sleep(2)
-        
-        try:
-            # Scrape LinkedIn profile
-            scrape_params = {
-                "url": url,
-                "element_prompts": ["Company size", "Industry", "Website", "About"]
-            }
-            
-            logger.info(f"Sending scrape request to JigsawStack...")
-            result = jigsawstack_client.web.ai_scrape(scrape_params)
-            data = result.json().get("context", {})
-            logger.info(f"Received scrape data: {json.dumps(data)[:100]}...")
-            
-            # Ensure all prompts are present in the data
-            for prompt in scrape_params["element_prompts"]:
-                value = data.setdefault(prompt, ["-"])
-                # If the value is an empty list, replace it with '-'
-                if isinstance(value, list) and not value:
-                    data[prompt] = "-"
-                elif isinstance(value, list):
-                    # Join list elements into a comma-separated string
-                    data[prompt] = ", ".join(map(str, value))
-            
-            # Add source URL
-            data["source_url"] = url
-            
-            # Extract company name from LinkedIn URL
-            company_slug = url.split("linkedin.com/company/")[1].split("/")[0].split("?")[0]
-            company_name = company_slug.replace("-", " ").title()
-            data["company_name"] = company_name
-            
-            logger.info(f"Successfully scraped data for: {company_name}")
+        data = scrape_linkedin_profile(jigsawstack_client, url, journal, snippet_filter)
+        if data:
             lead_data.append(data)
-            
-        except Exception as e:
-            logger.error(f"Error scraping {url}: {str(e)}")
     
     logger.info(f"Successfully scraped data for {len(lead_data)} profiles")
     return lead_data
@@ -353,7 +723,9 @@ def enrich_about_section(openai_client, lead):
     """
     
     try:
-        response = openai_client.chat.completions.create(
+        response = create_chat_completion(
+            openai_client,
+            operation='enrich_about',
             model="gpt-4o-mini",
             messages=[{"role": "user", "content": prompt}],
             temperature=0.7,
@@ -364,13 +736,38 @@ def enrich_about_section(openai_client, lead):
         if enhanced_about:
             logger.info(f"Successfully generated About section for {company_name}")
             return enhanced_about
+    except ProviderUnavailableError:
+        raise
     except Exception as e:
         logger.error(f"Error enriching About section: {str(e)}")
     
     return about
 
-def analyze_ai_readiness(openai_client, about_text, industry):
-    """Determine AI readiness category"""
+def match_ai_readiness(text):
+    """Return the AI readiness category named in the text, or None"""
+    for category in AI_READINESS_CATEGORIES:
+        if category.lower() in str(text).lower():
+            return category
+    return None
+
+def classify_locally(about_text, industry):
+    """Return the AI readiness category the local rules settle on, or None if the LLM is needed"""
+    rules = get_local_classifier()
+    if rules is None:
+        return None
+    category, confidence = rules.classify(about_text, industry)
+    record_local_classification(category)
+    if category:
+        logger.info(f"AI readiness settled locally: {category} (confidence {confidence:.2f})")
+    return category
+
+def analyze_ai_readiness(openai_client, about_text, industry, use_local=True):
+    """Determine AI readiness category, asking OpenAI only if the local rules cannot settle it"""
+    if use_local:
+        category = classify_locally(about_text, industry)
+        if category:
+            return category
+    
     logger.info(f"Analyzing AI readiness for industry: {industry}")
     
     prompt = f"""
@@ -392,7 +789,10 @@ def analyze_ai_readiness(openai_client, about_text, industry):
     
     try:
         logger.info("Sending AI readiness analysis request to OpenAI...")
-        response = openai_client.chat.completions.create(
+        response = create_chat_completion(
+            openai_client,
+            operation='ai_readiness',
+            cache_if=match_ai_readiness,
             model="gpt-4o-mini",
             messages=[{"role": "user", "content": prompt}],
             temperature=0.7,
@@ -401,18 +801,27 @@ def analyze_ai_readiness(openai_client, about_text, industry):
         result = response.choices[0].message.content.strip()
         
         # Ensure the result is one of the valid categories
-        valid_categories = ["AI Unaware", "AI Aware", "AI Ready", "AI Competent"]
-        for category in valid_categories:
-            if category.lower() in result.lower():
-                logger.info(f"AI readiness determined: {category}")
-                return category
+        category = match_ai_readiness(result)
+        if category:
+            logger.info(f"AI readiness determined: {category}")
+            return category
         
         logger.warning(f"Could not determine AI readiness from response: {result}")
         return "AI Unaware"
+    except ProviderUnavailableError:
+        raise
     except Exception as e:
         logger.error(f"Error getting AI readiness: {str(e)}")
         return "AI Unaware"
 
+def enrichment_is_complete(content):
+    """Return True if a combined enrichment response is a JSON object with a valid AI readiness category"""
+    try:
+        result = json.loads(content)
+    except ValueError:
+        return False
+    return isinstance(result, dict) and match_ai_readiness(result.get("ai_readiness", "")) is not None
+
 def determine_is_sme(company_size):
     """Determine if a company is an SME based on its size"""
     try:
@@ -428,229 +837,917 @@ def determine_is_sme(company_size):
     # Default to True if we can't determine
     return True
 
-def process_leads(openai_client, leads):
+def enrich_lead(openai_client, lead):
+    """Enrich About text, AI readiness and SME status with one structured OpenAI call"""
+    about = lead.get("About", "") or ""
+    needs_about = about == "-" or len(about) < 100
+    company_name = lead.get("company_name", "")
+    
+    logger.info(f"Enriching lead with combined OpenAI call: {company_name}")
+    
+    if needs_about:
+        about_instruction = (
+            'Write 2-3 sentences describing what this Singapore company likely does, its target market '
+            'within Singapore or Southeast Asia, and its potential value proposition.'
+        )
+    else:
+        about_instruction = 'The description is already complete, so set "about" to null.'
+    
+    prompt = f"""
+    Company information for a Singapore-based company:
+    - Company Name: {company_name}
+    - Industry: {lead.get("Industry", "")}
+    - Company Size: {lead.get("Company size", "")}
+    - Company Description: "{about}"
+    
+    1. about: {about_instruction}
+    2. ai_readiness: Classify the company using these AI Readiness categories, returning "AI Unaware" if no AI usage is detected:
+       - AI Unaware: Unaware of AI applications.
+       - AI Aware: Aware but limited use cases.
+       - AI Ready: Can integrate AI into processes.
+       - AI Competent: Develops custom AI solutions.
+    3. is_sme: true if the company is an SME (fewer than 200 employees), otherwise false.
+    
+    Return a JSON object:
+    {{
+      "about": "description or null",
+      "ai_readiness": "AI Unaware" | "AI Aware" | "AI Ready" | "AI Competent",
+      "is_sme": true | false
+    }}
+    """
+    
+    response = create_chat_completion(
+        openai_client,
+        operation='enrich_lead',
+        cache_if=enrichment_is_complete,
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": prompt}],
+        response_format={"type": "json_object"},
+        temperature=0.5,
+        max_tokens=250
+    )
+    content = response.choices[0].message.content
+    result = json.loads(content)
+    
+    category = match_ai_readiness(result.get("ai_readiness", ""))
+    if not category:
+        raise ValueError(f"Invalid AI readiness in combined response: {result.get('ai_readiness')}")
+    
+    enriched_about = result.get("about")
+    if not needs_about or not isinstance(enriched_about, str) or not enriched_about.strip():
+        enriched_about = about
+    
+    is_sme = result.get("is_sme")
+    if not isinstance(is_sme, bool):
+        is_sme = determine_is_sme(lead.get("Company size", ""))
+    
+    logger.info(f"Combined enrichment for {company_name}: {category}, SME: {is_sme}")
+    return {
+        "About": enriched_about.strip(),
+        "ai_readiness": category,
+        "is_sme": is_sme
+    }
+
+def estimate_tokens(text):
+    """Roughly estimate the number of tokens in a piece of text"""
+    return len(str(text)) // 4 + 1
+
+def pack_classification_batches(leads, indexes, max_batch_size):
+    """Split lead indexes into batches that fit the classification token budget"""
+    batches = []
+    batch = []
+    batch_tokens = 0
+    for index in indexes:
+        lead = leads[index]
+        lead_tokens = estimate_tokens(str(lead.get("About", ""))[:CLASSIFY_MAX_ABOUT_CHARS]) \
+            + estimate_tokens(lead.get("Industry", "")) + CLASSIFY_TOKENS_PER_LEAD
+        if batch and (len(batch) >= max_batch_size or batch_tokens + lead_tokens > CLASSIFY_PROMPT_TOKEN_BUDGET):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+        batch.append(index)
+        batch_tokens += lead_tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+def parse_batch_categories(content, count):
+    """Return {position: category} for the valid answers of a batch AI readiness response, or None without JSON"""
+    json_match = re.search(r'\[.*\]', content, re.DOTALL)
+    if not json_match:
+        return None
+    categories = {}
+    for entry in json.loads(json_match.group(0)):
+        if not isinstance(entry, dict):
+            continue
+        position = entry.get("index")
+        category = match_ai_readiness(entry.get("ai_readiness", ""))
+        if isinstance(position, int) and 0 <= position < count and category:
+            categories[position] = category
+    return categories
+
+def batch_is_complete(count):
+    """Return a predicate checking that a batch response has a valid category for each of count leads"""
+    def check(content):
+        try:
+            return len(parse_batch_categories(content, count) or {}) == count
+        except ValueError:
+            return False
+    return check
+
+def classify_ai_readiness_batch(openai_client, leads):
+    """Classify several leads with one OpenAI call, returning {position: category} for valid answers"""
+    companies = []
+    for position, lead in enumerate(leads):
+        about = str(lead.get("About", ""))[:CLASSIFY_MAX_ABOUT_CHARS]
+        companies.append(
+            f'[{position}] Industry: "{lead.get("Industry", "")}"\n'
+            f'    Company Description: "{about}"'
+        )
+    company_list = "\n".join(companies)
+    
+    prompt = f"""
+    Based on the AI Readiness categories:
+    - AI Unaware: Unaware of AI applications.
+    - AI Aware: Aware but limited use cases.
+    - AI Ready: Can integrate AI into processes.
+    - AI Competent: Develops custom AI solutions.
+    
+    Analyze the AI readiness of each of the following {len(leads)} companies based on the company description and industry.
+    If no AI usage is detected for a company, use "AI Unaware".
+    
+{company_list}
+    
+    Return a JSON array with one object per company, using the index shown in brackets:
+    [{{"index": 0, "ai_readiness": "AI Unaware" | "AI Aware" | "AI Ready" | "AI Competent"}}, ...]
+    """
+    
+    logger.info(f"Sending batch AI readiness request for {len(leads)} leads to OpenAI...")
+    response = create_chat_completion(
+        openai_client,
+        operation='classify_batch',
+        # A partial answer is not memoized, or retrying the same batch would get it again
+        cache_if=batch_is_complete(len(leads)),
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.7,
+        max_tokens=CLASSIFY_TOKENS_PER_LEAD * len(leads) + 50
+    )
+    content = response.choices[0].message.content
+    
+    categories = parse_batch_categories(content, len(leads))
+    if categories is None:
+        logger.warning(f"Could not find JSON array in batch AI readiness response: {content[:100]}...")
+        return {}
+    return categories
+
+def classify_leads(openai_client, leads, max_batch_size=DEFAULT_CLASSIFY_BATCH_SIZE):
+    """Set ai_readiness on every lead using batched prompts, re-queuing missing or malformed results"""
+    pending = list(range(len(leads)))
+    
+    for attempt in range(CLASSIFY_MAX_ATTEMPTS):
+        if not pending:
+            break
+        retry = []
+        for batch in pack_classification_batches(leads, pending, max_batch_size):
+            try:
+                categories = classify_ai_readiness_batch(openai_client, [leads[index] for index in batch])
+            except ProviderUnavailableError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in batch AI readiness analysis: {str(e)}")
+                categories = {}
+            for position, index in enumerate(batch):
+                if position in categories:
+                    leads[index]["ai_readiness"] = categories[position]
+                else:
+                    retry.append(index)
+        if retry:
+            logger.warning(f"Re-queuing {len(retry)} leads with missing AI readiness (attempt {attempt + 1})")
+        pending = retry
+    
+    # Classify anything the batches could not settle one lead at a time
+    for index in pending:
+        lead = leads[index]
+        lead["ai_readiness"] = analyze_ai_readiness(
+            openai_client, lead.get("About", ""), lead.get("Industry", ""), use_local=False
+        )
+    
+    return leads
+
+def checkpoint_enriched(journal, leads):
+    """Record fully enriched leads in the job journal"""
+    if journal is None:
+        return
+    for lead in leads:
+        if lead.get("ai_readiness") and not journal.is_enriched(lead.get("source_url")):
+            journal.record_enriched(lead.get("source_url"), dict(lead.items()))
+
+def process_lead(openai_client, lead, combined=True, classify=True, journal=None):
+    """Enrich a single lead with About text, AI readiness and SME status
+
+    Leads whose scraped About text is complete are first offered to the local
+    AI readiness rules, and need no OpenAI call at all if the rules settle them.
+    With classify=False, the remaining leads whose About text needs no
+    enrichment are left without ai_readiness so that classify_leads can handle
+    them in batches.
+    """
+    if journal is not None:
+        enriched = journal.get_enriched(lead.get("source_url"))
+        if enriched is not None:
+            return LeadRecord.from_dict(enriched)
+    
+    needs_about = lead.get("About", "") in ["-", "", None] or len(lead.get("About", "")) < 100
+    
+    # Generated About text is not evidence enough, so only scraped text is classified locally
+    if not needs_about:
+        category = classify_locally(lead.get("About", ""), lead.get("Industry", ""))
+        if category:
+            lead["ai_readiness"] = category
+            lead["is_sme"] = determine_is_sme(lead.get("Company size", ""))
+            checkpoint_enriched(journal, [lead])
+            return lead
+    
+    if combined and (needs_about or classify):
+        try:
+            lead.update(enrich_lead(openai_client, lead))
+            checkpoint_enriched(journal, [lead])
+            return lead
+        except ProviderUnavailableError:
+            raise
+        except Exception as e:
+            logger.warning(f"Combined enrichment failed, falling back to separate calls: {str(e)}")
+    
+    try:
+        # Enrich About section if needed
+        if needs_about:
+            lead["About"] = enrich_about_section(openai_client, lead)
+        
+        # Determine AI readiness
+        if classify:
+            lead["ai_readiness"] = analyze_ai_readiness(
+                openai_client, lead.get("About", ""), lead.get("Industry", ""), use_local=False
+            )
+        
+        # Determine if SME
+        lead["is_sme"] = determine_is_sme(lead.get("Company size", ""))
+        
+    except ProviderUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing lead: {str(e)}")
+        # Still return the lead, but without enrichment
+        return lead
+    
+    checkpoint_enriched(journal, [lead])
+    return lead
+
+def process_leads(openai_client, leads, combined=True, classify_batch_size=DEFAULT_CLASSIFY_BATCH_SIZE, journal=None):
     """Process and enrich lead data"""
     logger.info(f"Processing and enriching {len(leads)} leads...")
     enriched_leads = []
+    batch_classify = classify_batch_size > 1
     
     for i, lead in enumerate(leads):
         logger.info(f"Processing lead {i+1}/{len(leads)}: {lead.get('company_name', 'Unknown')}")
-        
-        try:
-            # Enrich About section if needed
-            if lead.get("About", "") in ["-", "", None] or len(lead.get("About", "")) < 100:
-                lead["About"] = enrich_about_section(openai_client, lead)
-            
-            # Determine AI readiness
-            lead["ai_readiness"] = analyze_ai_readiness(openai_client, lead.get("About", ""), lead.get("Industry", ""))
-            
-            # Determine if SME
-            lead["is_sme"] = determine_is_sme(lead.get("Company size", ""))
-            
-            # Add to enriched leads
-            enriched_leads.append(lead)
-            
-        except Exception as e:
-            logger.error(f"Error processing lead: {str(e)}")
-            # Still add the lead, but without enrichment
-            enriched_leads.append(lead)
+        enriched_leads.append(process_lead(openai_client, lead, combined, not batch_classify, journal))
+    
+    if batch_classify:
+        unclassified = [lead for lead in enriched_leads if not lead.get("ai_readiness")]
+        if unclassified:
+            logger.info(f"Classifying AI readiness for {len(unclassified)} leads in batches...")
+            classify_leads(openai_client, unclassified, classify_batch_size)
+            checkpoint_enriched(journal, unclassified)
     
     logger.info(f"Successfully processed {len(enriched_leads)} leads")
     return enriched_leads
 
-def store_leads(supabase_client, leads):
-    """Store leads in Supabase"""
-    logger.info(f"Storing {len(leads)} leads in Supabase...")
-    success_count = 0
+def build_lead_record(lead):
+    """Convert an enriched lead into a row for the Supabase leads table"""
+    # Convert company size to integer if possible
+    company_size = lead.get('Company size', '')
+    try:
+        # Try to extract numeric value from company size
+        size_match = re.search(r'\d+', str(company_size))
+        if size_match:
+            employee_count = int(size_match.group())
+        else:
+            employee_count = None
+    except:
+        employee_count = None
     
-    for i, lead in enumerate(leads):
-        logger.info(f"Storing lead {i+1}/{len(leads)}: {lead.get('company_name', 'Unknown')}")
+    # Prepare lead data for Supabase
+    lead_data = {
+        'company_name': lead.get('company_name', ''),
+        'employee_count': employee_count,
+        'is_sme': lead.get('is_sme', True),
+        'about': lead.get('About', ''),
+        'industry': lead.get('Industry', ''),
+        'ai_readiness': lead.get('ai_readiness', 'AI Unaware'),
+        'lead_source': 'LinkedIn',
+        'status': 'new',
+        'email': None,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'updated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'source_url': lead.get('source_url', '')
+    }
+    
+    # Add email if website is available
+    if lead.get('Website') and lead.get('Website') != '-':
+        website = lead.get('Website', '')
+        # Clean up website URL to extract domain
+        domain = website.replace('http://', '').replace('https://', '').split('/')[0]
+        lead_data['email'] = f"contact@{domain}"
+    
+    return lead_data
+
+def upsert_lead_records(supabase_client, records):
+    """Insert lead rows that are not stored yet by source_url, returning the source_urls inserted or None on failure"""
+    try:
+        with timed('supabase', 'upsert_leads'):
+            # Leads already stored keep their row as it is, including the status set by sales,
+            # and only the rows actually inserted come back
+            response = supabase_client.table('leads') \
+                .upsert(records, on_conflict='source_url', ignore_duplicates=True, returning='representation') \
+                .execute()
         
+        # Check if the upsert was successful
+        if hasattr(response, 'error') and response.error:
+            logger.error(f"Error upserting {len(records)} leads into Supabase: {response.error}")
+            return None
+        return {row.get('source_url') for row in response.data or []}
+        
+    except Exception as e:
+        logger.error(f"Error upserting {len(records)} leads into Supabase: {str(e)}")
+        return None
+
+def store_lead_batch(supabase_client, leads, journal=None):
+    """Store a batch of leads with one multi-row upsert, returning per-lead flags of the leads inserted"""
+    records = []
+    results = [False] * len(leads)
+    for i, lead in enumerate(leads):
+        if journal is not None and journal.is_stored(lead.get('source_url')):
+            # Stored before the job was interrupted
+            results[i] = True
+            continue
         try:
-            # Convert company size to integer if possible
-            company_size = lead.get('Company size', '')
-            try:
-                # Try to extract numeric value from company size
-                size_match = re.search(r'\d+', str(company_size))
-                if size_match:
-                    employee_count = int(size_match.group())
-                else:
-                    employee_count = None
-            except:
-                employee_count = None
-            
-            # Prepare lead data for Supabase
-            lead_data = {
-                'company_name': lead.get('company_name', ''),
-                'employee_count': employee_count,
-                'is_sme': lead.get('is_sme', True),
-                'about': lead.get('About', ''),
-                'industry': lead.get('Industry', ''),
-                'ai_readiness': lead.get('ai_readiness', 'AI Unaware'),
-                'lead_source': 'LinkedIn',
-                'status': 'new',
-                'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ'),
-                'updated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ'),
-                'source_url': lead.get('source_url', '')
-            }
-            
-            # Add email if website is available
-            if lead.get('Website') and lead.get('Website') != '-':
-                website = lead.get('Website', '')
-                # Clean up website URL to extract domain
-                domain = website.replace('http://', '').replace('https://', '').split('/')[0]
-                lead_data['email'] = f"contact@{domain}"
-            
-            # Insert lead into Supabase
-            logger.info(f"Inserting lead into Supabase: {lead_data['company_name']}")
-            response = supabase_client.table('leads').insert(lead_data).execute()
-            
-            # Check if the insertion was successful
-            if hasattr(response, 'error') and response.error:
-                logger.error(f"Error inserting lead into Supabase: {response.error}")
-            else:
-                logger.info(f"Successfully inserted lead: {lead_data['company_name']}")
-                success_count += 1
-                
+            records.append((i, build_lead_record(lead)))
         except Exception as e:
-            logger.error(f"Error storing lead in Supabase: {str(e)}")
+            logger.error(f"Error preparing lead {lead.get('company_name', 'Unknown')} for Supabase: {str(e)}")
+    
+    if not records:
+        record_progress('stored', sum(results))
+        return results
+    
+    # Score the whole batch at once so the dashboard can sort by lead_score
+    for (_, record), score in zip(records, score_leads([record for _, record in records])):
+        record['lead_score'] = int(score)
+    
+    logger.info(f"Upserting batch of {len(records)} leads into Supabase...")
+    inserted = upsert_lead_records(supabase_client, [record for _, record in records])
+    if inserted is not None:
+        for i, record in records:
+            results[i] = record['source_url'] in inserted
+            if results[i] and journal is not None:
+                journal.record_stored(record['source_url'])
+        skipped = len(records) - sum(results[i] for i, _ in records)
+        logger.info(f"Successfully upserted batch of {len(records)} leads"
+                    + (f", {skipped} already stored" if skipped else ""))
+        record_progress('stored', sum(results))
+        return results
+    
+    # Fall back to one row at a time so a single bad row does not sink the whole batch
+    logger.warning(f"Batch upsert failed, retrying {len(records)} leads row by row")
+    for i, record in records:
+        inserted = upsert_lead_records(supabase_client, [record])
+        results[i] = inserted is not None and record['source_url'] in inserted
+        if results[i]:
+            if journal is not None:
+                journal.record_stored(record['source_url'])
+            logger.info(f"Successfully inserted lead: {record['company_name']}")
+        elif inserted is not None:
+            logger.info(f"Lead already stored: {record['company_name']} ({record['source_url']})")
+        else:
+            logger.error(f"Failed to store lead: {record['company_name']} ({record['source_url']})")
+    
+    record_progress('stored', sum(results))
+    return results
+
+def store_leads(supabase_client, leads, batch_size=DEFAULT_STORE_BATCH_SIZE, journal=None, query_feed=None):
+    """Store leads in Supabase in batches of multi-row upserts"""
+    logger.info(f"Storing {len(leads)} leads in Supabase in batches of {batch_size}...")
+    success_count = 0
+    
+    for start in range(0, len(leads), batch_size):
+        batch = leads[start:start + batch_size]
+        logger.info(f"Storing leads {start+1}-{start+len(batch)}/{len(leads)}")
+        results = store_lead_batch(supabase_client, batch, journal)
+        if query_feed is not None:
+            query_feed.record_stored([lead.get('source_url') for lead, stored in zip(batch, results) if stored])
+        success_count += sum(results)
     
     logger.info(f"Successfully stored {success_count} out of {len(leads)} leads in Supabase")
     return success_count
 
-def main():
-    """Main function to run the lead generation process"""
-    # Parse command line arguments
+def run_serial_stages(jigsawstack_client, openai_client, supabase_client, search_queries,
+                      batch_size=DEFAULT_STORE_BATCH_SIZE, combined_enrichment=True,
+                      classify_batch_size=DEFAULT_CLASSIFY_BATCH_SIZE, dedup_index=None, limit=None, journal=None,
+                      urls_per_query=DEFAULT_URLS_PER_QUERY, snippet_filter=None):
+    """Run the search, scrape, enrich and store stages one after another"""
+    summary = {'found': 0, 'scraped': 0, 'enriched': 0, 'stored': 0}
+    
+    # Step 3: Find LinkedIn URLs using JigsawStack
+    logger.info("Finding LinkedIn company URLs...")
+    started = time.monotonic()
+    linkedin_urls = find_linkedin_urls(
+        jigsawstack_client, search_queries, dedup_index, limit, journal, urls_per_query, snippet_filter
+    )
+    logger.info(f"Found LinkedIn URLs: {linkedin_urls}")
+    summary['found'] = len(linkedin_urls)
+    record_stage('search', time.monotonic() - started, summary['found'])
+    record_progress('found', summary['found'])
+    if not linkedin_urls:
+        return summary
+    
+    # Step 4: Scrape data from LinkedIn profiles
+    logger.info("Scraping LinkedIn profiles...")
+    started = time.monotonic()
+    lead_data = scrape_linkedin_profiles(jigsawstack_client, linkedin_urls, journal, snippet_filter)
+    logger.info(f"Scraped data for {len(lead_data)} profiles")
+    summary['scraped'] = len(lead_data)
+    record_stage('scrape', time.monotonic() - started, summary['scraped'])
+    record_progress('scraped', summary['scraped'])
+    if not lead_data:
+        return summary
+    
+    # Step 5: Process and enrich lead data
+    logger.info("Processing and enriching lead data...")
+    started = time.monotonic()
+    enriched_leads = process_leads(openai_client, lead_data, combined_enrichment, classify_batch_size, journal)
+    logger.info(f"Processed and enriched {len(enriched_leads)} leads")
+    summary['enriched'] = len(enriched_leads)
+    record_stage('enrich', time.monotonic() - started, summary['enriched'])
+    record_progress('enriched', summary['enriched'])
+    
+    # Step 6: Store in Supabase
+    logger.info("Storing leads in Supabase...")
+    started = time.monotonic()
+    query_feed = search_queries if isinstance(search_queries, SearchQueryFeed) else None
+    summary['stored'] = store_leads(supabase_client, enriched_leads, batch_size, journal, query_feed)
+    record_stage('store', time.monotonic() - started, summary['stored'])
+    return summary
+
+def run_pipelined_stages(jigsawstack_client, openai_client, supabase_client, search_queries, concurrency,
+                         batch_size=DEFAULT_STORE_BATCH_SIZE, combined_enrichment=True,
+                         classify_batch_size=DEFAULT_CLASSIFY_BATCH_SIZE, dedup_index=None, limit=None, journal=None,
+                         urls_per_query=DEFAULT_URLS_PER_QUERY, flush_interval=STORE_BATCH_TIMEOUT, snippet_filter=None):
+    """Run the search, scrape, enrich and store stages as a streaming pipeline
+
+    Leads are stored in micro-batches of up to batch_size as soon as they are
+    enriched, or after flush_interval seconds if fewer are waiting.
+    """
+    logger.info(f"Running lead pipeline with concurrency {concurrency}...")
+    query_feed = search_queries if isinstance(search_queries, SearchQueryFeed) else None
+    
+    batch_classify = classify_batch_size > 1
+    
+    def classify(batch):
+        unclassified = [lead for lead in batch if not lead.get("ai_readiness")]
+        if unclassified:
+            classify_leads(openai_client, unclassified, classify_batch_size)
+            checkpoint_enriched(journal, unclassified)
+        return batch
+    
+    def search(query):
+        urls = find_new_linkedin_urls(
+            jigsawstack_client, query, dedup_index, query_feed, journal, urls_per_query, snippet_filter
+        )
+        record_progress('found', len(urls))
+        return urls
+    
+    def scrape(url):
+        lead = scrape_linkedin_profile(jigsawstack_client, url, journal, snippet_filter)
+        if lead is not None:
+            record_progress('scraped')
+        return lead
+    
+    def enrich(lead):
+        lead = process_lead(openai_client, lead, combined_enrichment, not batch_classify, journal)
+        record_progress('enriched')
+        return lead
+    
+    def store(batch):
+        results = store_lead_batch(supabase_client, batch, journal)
+        stored_leads = [lead for lead, stored in zip(batch, results) if stored]
+        if query_feed is not None:
+            query_feed.record_stored([lead.get('source_url') for lead in stored_leads])
+        return stored_leads
+    
+    stages = [
+        Stage('search', search, workers=concurrency, fan_out=True, limit=limit),
+        Stage('scrape', scrape, workers=concurrency),
+        Stage('enrich', enrich, workers=concurrency)
+    ]
+    if batch_classify:
+        stages.append(Stage(
+            'classify', classify, workers=concurrency, fan_out=True,
+            batch_size=classify_batch_size, batch_timeout=CLASSIFY_BATCH_TIMEOUT
+        ))
+    stages.append(Stage(
+        'store', store, workers=2, fan_out=True, batch_size=batch_size, batch_timeout=flush_interval
+    ))
+    # Stored leads are counted, not kept, so memory does not grow with the lead count
+    # A provider that stays down stops the job, which can then be resumed from its journal
+    lead_pipeline = Pipeline(
+        stages, observer=record_stage_item, collect=False, abort_on=(ProviderUnavailableError,),
+        on_stop=query_feed.stop if query_feed is not None else None
+    )
+    lead_pipeline.run(search_queries)
+    
+    stats = lead_pipeline.stats()
+    for name, stage_stats in stats.items():
+        record_stage(name, stage_stats['busy_seconds'], stage_stats['produced'])
+    return {
+        'found': stats['search']['produced'],
+        'scraped': stats['scrape']['produced'],
+        'enriched': stats['enrich']['produced'],
+        'stored': stats['store']['produced']
+    }
+
+def warm_cache(jigsawstack_client, linkedin_urls, concurrency):
+    """Scrape LinkedIn URLs into the content cache without enriching or storing them"""
+    logger.info(f"Warming content cache with {len(linkedin_urls)} LinkedIn URLs...")
+    warm_pipeline = Pipeline([
+        Stage('scrape', lambda url: scrape_linkedin_profile(jigsawstack_client, url), workers=concurrency)
+    ])
+    warm_pipeline.run(linkedin_urls)
+    scraped = warm_pipeline.stats()['scrape']['produced']
+    logger.info(f"Content cache warmed with {scraped} of {len(linkedin_urls)} profiles")
+    return scraped
+
+def build_parser():
+    """Build the command line argument parser"""
     parser = argparse.ArgumentParser(description='Lead Generation System')
     parser.add_argument('--job-id', help='Job ID for tracking (default: auto-generated UUID)')
     parser.add_argument('--count', type=int, default=5, help='Number of leads to generate (default: 5)')
     parser.add_argument('--target-profile', default='{}', help='Target profile as JSON string (default: {})')
     parser.add_argument('--verbose', action='store_true', help='Enable verbose logging')
     parser.add_argument('--analyze-only', action='store_true', help='Only analyze existing leads, do not generate new ones')
-    args = parser.parse_args()
-    
-    # Set logging level based on verbose flag
-    if args.verbose:
-        logging.getLogger('lead_generation').setLevel(logging.DEBUG)
+    parser.add_argument('--concurrency', type=int, default=4, help='Number of concurrent workers per pipeline stage (default: 4)')
+    parser.add_argument('--serial', action='store_true', help='Run the pipeline stages one after another instead of streaming')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_STORE_BATCH_SIZE,
+                        help=f'Number of leads per Supabase upsert (default: {DEFAULT_STORE_BATCH_SIZE})')
+    parser.add_argument('--flush-interval', type=float, default=STORE_BATCH_TIMEOUT,
+                        help=f'Most seconds an enriched lead waits before its batch is stored (default: {STORE_BATCH_TIMEOUT})')
+    parser.add_argument('--progress-interval', type=float, default=DEFAULT_PROGRESS_INTERVAL,
+                        help=f'Least seconds between progress updates of the job row (default: {DEFAULT_PROGRESS_INTERVAL})')
+    parser.add_argument('--separate-enrichment', action='store_true',
+                        help='Use separate OpenAI calls for About enrichment and AI readiness instead of one combined call')
+    parser.add_argument('--classify-batch-size', type=int, default=DEFAULT_CLASSIFY_BATCH_SIZE,
+                        help=f'Maximum leads per batch AI readiness prompt, 1 to classify one lead per call (default: {DEFAULT_CLASSIFY_BATCH_SIZE})')
+    parser.add_argument('--no-local-classifier', action='store_true',
+                        help='Classify every lead with OpenAI instead of settling clear-cut AI readiness cases locally')
+    parser.add_argument('--local-confidence', type=float, default=DEFAULT_MIN_CONFIDENCE,
+                        help=f'Share of the keyword evidence a category needs to be settled locally (default: {DEFAULT_MIN_CONFIDENCE})')
+    parser.add_argument('--urls-per-query', type=int, default=DEFAULT_URLS_PER_QUERY,
+                        help=f'Most LinkedIn company URLs taken from each search, 1 for only the best match (default: {DEFAULT_URLS_PER_QUERY})')
+    parser.add_argument('--allow-duplicates', action='store_true',
+                        help='Do not skip companies that are already stored as leads')
+    parser.add_argument('--no-query-store', action='store_true',
+                        help='Generate every search query with the LLM instead of reusing high-yield queries of earlier jobs')
+    parser.add_argument('--no-snippet-filter', action='store_true',
+                        help='Scrape every new company instead of filtering and settling candidates from their search snippets')
+    parser.add_argument('--snippet-min-score', type=int, default=DEFAULT_SNIPPET_MIN_SCORE,
+                        help=f'Least target profile score of a search snippet before its company is scraped (default: {DEFAULT_SNIPPET_MIN_SCORE})')
+    parser.add_argument('--cache-path', help='Path of the SQLite content cache (default: .cache/lead_cache.sqlite3)')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the content cache for search and scrape results')
+    parser.add_argument('--refresh-cache', action='store_true', help='Ignore cached results but store fresh ones')
+    parser.add_argument('--lead-profile-path',
+                        help='Path of the SQLite lead profile aggregates (default: .cache/lead_profile.sqlite3)')
+    parser.add_argument('--rebuild-lead-profile', action='store_true',
+                        help='Rebuild the lead profile from every lead instead of only those updated since the last refresh')
+    parser.add_argument('--no-llm-cache', action='store_true', help='Do not memoize OpenAI responses')
+    parser.add_argument('--warm-cache', metavar='URLS_FILE',
+                        help='Scrape the LinkedIn URLs listed in a file (one per line) into the cache and exit')
+    parser.add_argument('--rescore-leads', action='store_true',
+                        help='Recompute lead_score for every stored lead and exit')
+    parser.add_argument('--rescore-chunk-size', type=int, default=DEFAULT_RESCORE_CHUNK_SIZE,
+                        help=f'Leads read and rescored per chunk with --rescore-leads (default: {DEFAULT_RESCORE_CHUNK_SIZE})')
+    parser.add_argument('--rescore-dry-run', action='store_true',
+                        help='With --rescore-leads, only count the scores that would change')
+    parser.add_argument('--rate-limit', action='append', default=[], metavar='PROVIDER=RATE[:BURST]',
+                        help='Override a provider rate limit in requests/second (providers: jigsawstack_search, jigsawstack_scrape, openai_chat)')
+    parser.add_argument('--provider-concurrency', action='append', default=[], metavar='PROVIDER=N',
+                        help='Override the calls in flight per provider across all jobs (providers: jigsawstack_search, jigsawstack_scrape, openai_chat)')
+    parser.add_argument('--max-retries', type=int, default=DEFAULT_MAX_RETRIES,
+                        help=f'Retries of a call after a server error, timeout or dropped connection (default: {DEFAULT_MAX_RETRIES})')
+    parser.add_argument('--call-deadline', action='append', default=[], metavar='PROVIDER=SECONDS',
+                        help='Override the seconds one call attempt may take, 0 for no deadline (providers: jigsawstack_search, jigsawstack_scrape, openai_chat)')
+    parser.add_argument('--connect-timeout', type=float, default=DEFAULT_CONNECT_TIMEOUT,
+                        help=f'Seconds allowed to open a connection to an API (default: {DEFAULT_CONNECT_TIMEOUT})')
+    parser.add_argument('--read-timeout', action='append', default=[], metavar='API=SECONDS',
+                        help='Override the seconds allowed between bytes of a response (apis: jigsawstack, openai, supabase)')
+    parser.add_argument('--worker', action='store_true',
+                        help='Run as a resident worker that keeps clients warm and processes queued jobs')
+    parser.add_argument('--job-source', choices=['table', 'stdin'], default='table',
+                        help='Where the worker takes jobs from: queued lead_generation_jobs rows or JSON lines on stdin (default: table)')
+    parser.add_argument('--max-jobs', type=int, default=DEFAULT_MAX_JOBS,
+                        help=f'Number of jobs the worker runs concurrently (default: {DEFAULT_MAX_JOBS})')
+    parser.add_argument('--interactive-jobs', type=int, default=DEFAULT_INTERACTIVE_JOBS,
+                        help=f'Extra worker job slots for analyze-only and small jobs (default: {DEFAULT_INTERACTIVE_JOBS})')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f'Seconds between checks for queued jobs in table mode (default: {DEFAULT_POLL_INTERVAL})')
+    parser.add_argument('--resume', metavar='JOB_ID',
+                        help='Resume an interrupted job from its journal, skipping the work it already finished')
+    parser.add_argument('--journal-dir', help='Directory of the job journals (default: .jobs)')
+    parser.add_argument('--no-journal', action='store_true', help='Do not checkpoint job progress')
+    parser.add_argument('--metrics-file',
+                        help='Write call latencies, retries, token usage and cost in Prometheus text format to this file after each job')
+    parser.add_argument('--events', choices=EVENT_FORMATS, default='none',
+                        help='Write machine-readable job events and results, one JSON object per line (default: none)')
+    parser.add_argument('--events-fd', type=int,
+                        help='File descriptor for the event stream (default: stdout)')
+    return parser
+
+def run_job(clients, job_id, args):
+    """Run one lead generation job with its own metrics, returning True on success"""
+    metrics = Metrics()
+    # Provider calls of interactive jobs are served before those of batch jobs
+    with job_metrics(metrics), job_schedule(job_id, job_priority(args.analyze_only, args.count)):
+        success = execute_job(clients, job_id, args)
+    logger.info(f"Job metrics: {json.dumps(metrics.summary())}")
+    if args.metrics_file:
+        # Process totals, which cover every job a worker has run
+        write_prometheus_file(args.metrics_file, get_process_metrics())
+    return success
+
+def execute_job(clients, job_id, args):
+    """Run the stages of one lead generation job and record its status, returning True on success"""
+    jigsawstack_client, openai_client, supabase_client = clients
     
-    # Generate job ID if not provided
-    job_id = args.job_id if args.job_id else str(uuid.uuid4())
-    
-    # Parse target profile
-    try:
-        target_profile = json.loads(args.target_profile)
-    except json.JSONDecodeError:
-        logger.error(f"Invalid target profile JSON: {args.target_profile}")
-        sys.exit(1)
+    journal = None
+    journal_path = get_journal_path(job_id, args.journal_dir)
+    if args.resume:
+        if not os.path.exists(journal_path):
+            message = f'No job journal found for job {job_id} at {journal_path}'
+            logger.error(message)
+            emit_event('result', job_id=job_id, status='error', message=message)
+            return False
+        journal = JobJournal(journal_path)
+        if journal.params is not None:
+            # Resume with the parameters the job was started with
+            args = argparse.Namespace(**vars(args))
+            args.count = journal.params['count']
+            args.target_profile = json.dumps(journal.params['target_profile'])
+            args.analyze_only = journal.params['analyze_only']
+        logger.info(f"Resuming job {job_id} from its journal")
     
     logger.info(f"Starting lead generation process...")
     logger.info(f"Job ID: {job_id}")
     logger.info(f"Lead count: {args.count}")
-    logger.info(f"Target profile: {json.dumps(target_profile)}")
+    logger.info(f"Target profile: {args.target_profile}")
+    
+    params = {
+        'count': args.count,
+        'target_profile': json.loads(args.target_profile),
+        'analyze_only': args.analyze_only
+    }
+    emit_event('job_started', job_id=job_id, params=params)
     
     try:
-        # Initialize API clients
-        jigsawstack_client, openai_client, supabase_client = initialize_clients()
-        
-        # Create job record in Supabase
-        update_job_status(supabase_client, job_id, 'created', 'Lead generation job created')
-        
-        # Update job status to processing
-        update_job_status(supabase_client, job_id, 'processing', 'Lead generation started')
+        if journal is None:
+            # Create job record in Supabase
+            update_job_status(supabase_client, job_id, 'created', 'Lead generation job created', params=params)
+            
+            # Update job status to processing
+            update_job_status(supabase_client, job_id, 'processing', 'Lead generation started')
+        else:
+            update_job_status(supabase_client, job_id, 'processing', 'Lead generation resumed')
         
         # Step 1: Analyze existing leads to generate search parameters
-        logger.info("Analyzing existing leads...")
-        search_params = analyze_existing_leads(supabase_client, openai_client)
-        logger.info(f"Search parameters: {search_params}")
-        
-        # If analyze-only flag is set, exit after analysis
-        if args.analyze_only:
-            logger.info("Analyze-only flag set, skipping lead generation")
-            update_job_status(
-                supabase_client, 
-                job_id, 
-                'complete', 
-                'Lead analysis completed successfully'
-            )
-            return
-        
-        # Skip lead generation if count is 0
-        if args.count <= 0:
-            logger.info("Lead count is 0, skipping lead generation")
-            update_job_status(
-                supabase_client, 
-                job_id, 
-                'complete', 
-                'Lead analysis completed successfully'
-            )
-            return
-        
-        # Step 2: Generate search queries based on search parameters
-        logger.info(f"Generating search queries for {args.count} leads...")
-        search_queries = generate_search_queries(openai_client, search_params, args.count)
-        logger.info(f"Generated search queries: {search_queries}")
-        
-        # Step 3: Find LinkedIn URLs using JigsawStack
-        logger.info("Finding LinkedIn company URLs...")
-        linkedin_urls = find_linkedin_urls(jigsawstack_client, search_queries)
-        logger.info(f"Found LinkedIn URLs: {linkedin_urls}")
+        if journal is not None and journal.search_params is not None:
+            logger.info("Reusing search parameters from the job journal")
+            search_params = journal.search_params
+        else:
+            logger.info("Analyzing existing leads...")
+            emit_event('stage', job_id=job_id, stage='analyze', state='started')
+            search_params = analyze_existing_leads(supabase_client, openai_client)
+            emit_event('stage', job_id=job_id, stage='analyze', state='complete')
+        logger.info(f"Search parameters: {json.dumps(search_params)}")
+        emit_event('search_params', job_id=job_id, search_params=search_params)
+        result = {'search_params': search_params}
         
-        if not linkedin_urls:
-            logger.warning("No LinkedIn URLs found. Updating job status and exiting.")
+        if args.analyze_only or args.count <= 0:
+            # If analyze-only flag is set or count is 0, finish after analysis
+            logger.info("Analyze-only flag set or lead count is 0, skipping lead generation")
+            message = 'Lead analysis completed successfully'
+        else:
+            # Make the search parameters available before the longer generation stages finish
             update_job_status(
-                supabase_client, 
-                job_id, 
-                'complete', 
-                'No LinkedIn URLs found. Try different search queries.'
+                supabase_client, job_id, 'processing', 'Search parameters generated, finding leads', result
             )
-            return
-        
-        # Step 4: Scrape data from LinkedIn profiles
-        logger.info("Scraping LinkedIn profiles...")
-        lead_data = scrape_linkedin_profiles(jigsawstack_client, linkedin_urls)
-        logger.info(f"Scraped data for {len(lead_data)} profiles")
-        
-        if not lead_data:
-            logger.warning("No lead data scraped. Updating job status and exiting.")
-            update_job_status(
-                supabase_client, 
-                job_id, 
-                'complete', 
-                'No lead data could be scraped. Try different LinkedIn URLs.'
+            
+            # Checkpoint every stage so an interrupted job can be resumed
+            if journal is None and not args.no_journal:
+                if os.path.exists(journal_path):
+                    logger.warning(f"Discarding old job journal {journal_path}")
+                    os.remove(journal_path)
+                journal = JobJournal(journal_path)
+            if journal is not None and journal.search_params is None:
+                journal.record_params(params, search_params)
+            
+            # Load the companies we already have so they are not scraped again
+            dedup_index = None if args.allow_duplicates else load_dedup_index(supabase_client)
+            if dedup_index is not None and journal is not None:
+                # Companies found by this job before it was interrupted are still its own
+                for url in journal.found_urls():
+                    dedup_index.discard(url)
+            
+            # Step 2: Generate search queries based on search parameters, in rounds until
+            # enough new companies have been found
+            logger.info(f"Generating search queries for {args.count} leads...")
+            # Proven queries from earlier jobs are reused; duplicates allowed would inflate their yield
+            query_store = None
+            if not args.no_query_store and dedup_index is not None:
+                query_store = QueryPerformanceStore(supabase_client).load()
+            search_queries = SearchQueryFeed(
+                openai_client, search_params, args.count, journal=journal,
+                expected_yield=min(INITIAL_QUERY_YIELD, args.urls_per_query), query_store=query_store
             )
-            return
-        
-        # Step 5: Process and enrich lead data
-        logger.info("Processing and enriching lead data...")
-        enriched_leads = process_leads(openai_client, lead_data)
-        logger.info(f"Processed and enriched {len(enriched_leads)} leads")
-        
-        # Step 6: Store in Supabase
-        logger.info("Storing leads in Supabase...")
-        success_count = store_leads(supabase_client, enriched_leads)
+            
+            # Search results that show a company is off target, or already tell everything
+            # the scrape would, save the scrape
+            snippet_filter = None if args.no_snippet_filter else SnippetFilter(search_params, args.snippet_min_score)
+            
+            # Steps 3-6: Find LinkedIn URLs, scrape and enrich the profiles, then store the leads.
+            # Running counters are written to the job row while the stages run
+            emit_event('stage', job_id=job_id, stage='generate', state='started')
+            progress = JobProgress(supabase_client, job_id, args.progress_interval, target=args.count)
+            with job_progress(progress):
+                try:
+                    if args.serial:
+                        summary = run_serial_stages(
+                            jigsawstack_client, openai_client, supabase_client, search_queries, args.batch_size,
+                            not args.separate_enrichment, args.classify_batch_size, dedup_index, args.count,
+                            journal, args.urls_per_query, snippet_filter
+                        )
+                    else:
+                        summary = run_pipelined_stages(
+                            jigsawstack_client, openai_client, supabase_client, search_queries, args.concurrency,
+                            args.batch_size, not args.separate_enrichment, args.classify_batch_size, dedup_index,
+                            args.count, journal, args.urls_per_query, args.flush_interval, snippet_filter
+                        )
+                    progress.set(summary)
+                finally:
+                    progress.flush()
+                    if query_store is not None:
+                        # Searches made before a failure still steer later jobs
+                        query_store.flush()
+                        logger.info(f"Search query yield: {json.dumps(query_store.summary())}")
+            logger.info(f"Stage summary: {json.dumps(summary)}")
+            emit_event('stage', job_id=job_id, stage='generate', state='complete', summary=summary)
+            if get_cache():
+                logger.info(f"Content cache: {json.dumps(get_cache().stats())}")
+            result['summary'] = summary
+            
+            if not summary['found']:
+                logger.warning("No new LinkedIn URLs found.")
+                message = 'No new LinkedIn URLs found. Try different search queries.'
+            elif not summary['scraped']:
+                logger.warning("No lead data scraped.")
+                message = 'No lead data could be scraped. Try different LinkedIn URLs.'
+            else:
+                message = f"Successfully generated {summary['stored']} leads"
         
         # Update job status to complete
-        logger.info(f"Updating job status to 'complete' for job {job_id}")
-        update_job_status(
-            supabase_client, 
-            job_id, 
-            'complete', 
-            f'Successfully generated {success_count} leads'
-        )
+        result['metrics'] = get_job_metrics().summary()
+        update_job_status(supabase_client, job_id, 'complete', message, result)
+        emit_event('result', job_id=job_id, status='complete', message=message, result=result)
+        if journal is not None:
+            journal.remove()
         logger.info("Lead generation process completed successfully")
+        return True
         
     except Exception as e:
         logger.error(f"Error in lead generation: {str(e)}", exc_info=True)
+        message = f'Error generating leads: {str(e)}'
+        if journal is not None:
+            journal.close()
+            logger.info(f"Finished work is checkpointed, continue the job with --resume {job_id}")
+        emit_event('result', job_id=job_id, status='error', message=message)
         try:
-            update_job_status(
-                supabase_client,
-                job_id,
-                'error',
-                f'Error generating leads: {str(e)}'
-            )
+            update_job_status(supabase_client, job_id, 'error', message, {'metrics': get_job_metrics().summary()})
         except Exception as update_error:
             logger.error(f"Error updating job status: {str(update_error)}")
+        return False
+
+def configure_logging(log_file=DEFAULT_LOG_FILE, verbose=False):
+    """Log to stderr and to log_file, which is only created when the first record is written"""
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.insert(0, logging.FileHandler(log_file, delay=True))
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=handlers
+    )
+    if verbose:
+        logger.setLevel(logging.DEBUG)
+
+def main():
+    """Main function to run the lead generation process"""
+    # Parse command line arguments
+    args = build_parser().parse_args()
+    
+    # Configure logging, with verbose logging if requested
+    configure_logging(verbose=args.verbose)
+    
+    # Generate job ID if not provided
+    job_id = args.resume or args.job_id or str(uuid.uuid4())
+    
+    # Parse target profile
+    try:
+        json.loads(args.target_profile)
+    except json.JSONDecodeError:
+        logger.error(f"Invalid target profile JSON: {args.target_profile}")
         sys.exit(1)
+    
+    # Send machine-readable events to stdout or the requested file descriptor
+    configure_events(args.events, args.events_fd)
+    
+    # Configure the shared provider rate limits
+    try:
+        configure_rate_limits(args.rate_limit)
+    except ValueError as e:
+        logger.error(f"Invalid rate limit: {str(e)}")
+        sys.exit(1)
+    
+    # Configure the calls in flight per provider, shared fairly by all jobs
+    try:
+        configure_scheduler(args.provider_concurrency)
+    except ValueError as e:
+        logger.error(f"Invalid provider concurrency: {str(e)}")
+        sys.exit(1)
+    
+    # Configure retries, circuit breakers and attempt deadlines for every external call
+    try:
+        configure_resilience(args.max_retries, args.call_deadline)
+    except ValueError as e:
+        logger.error(f"Invalid retry settings: {str(e)}")
+        sys.exit(1)
+    
+    # Configure the timeouts of the pooled connections every API client is built on
+    try:
+        configure_transport(args.connect_timeout, args.read_timeout)
+    except ValueError as e:
+        logger.error(f"Invalid timeout: {str(e)}")
+        sys.exit(1)
+    
+    # Settle clear-cut AI readiness cases locally before asking OpenAI
+    configure_local_classifier(not args.no_local_classifier, args.local_confidence)
+    
+    # Open the content cache for search, scrape and OpenAI results
+    configure_cache(
+        args.cache_path, enabled=not args.no_cache, read=not args.refresh_cache,
+        memoize_llm=not args.no_llm_cache
+    )
+    
+    # Open the aggregate profile of existing leads that analysis is based on
+    configure_lead_profile(args.lead_profile_path, rebuild=args.rebuild_lead_profile)
+    
+    # Initialize API clients
+    try:
+        clients = initialize_clients()
+    except Exception as e:
+        logger.error(f"Error initializing API clients: {str(e)}", exc_info=True)
+        sys.exit(1)
+    
+    try:
+        # Warm the content cache and exit if requested
+        if args.warm_cache:
+            with open(args.warm_cache) as urls_file:
+                linkedin_urls = [line.strip() for line in urls_file if "linkedin.com/company/" in line]
+            warm_cache(clients[0], linkedin_urls, args.concurrency)
+            return
+        
+        # Recompute lead_score for the whole leads table and exit if requested
+        if args.rescore_leads:
+            rescore_leads(clients[2], args.rescore_chunk_size, args.rescore_dry_run)
+            return
+        
+        # Keep the clients warm and process queued jobs until stopped
+        if args.worker:
+            worker = JobWorker(
+                lambda worker_job_id, job_args: run_job(clients, worker_job_id, job_args),
+                clients[2], args, args.max_jobs, args.poll_interval, args.interactive_jobs
+            )
+            worker.run(args.job_source)
+            return
+        
+        if not run_job(clients, job_id, args):
+            sys.exit(1)
+    finally:
+        close_http_clients()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Lead Profile Aggregates
+Compact summary of every stored lead, used by analyze_existing_leads in place
+of raw rows: the industry and company size distributions, the AI readiness
+and status mix, and the top About keywords, each weighted by how far the
+lead has moved through the sales pipeline and by its lead score.
+
+Each lead's contribution (its industry, size band, category, weight and
+keywords) is kept in a local SQLite file, and the aggregates are summed from
+it. A refresh only reads the leads whose updated_at is past the cursor of
+the last refresh and replaces their contributions, so keeping the profile
+current costs one small query per job. Deleted leads are only noticed by a
+full rebuild, which runs every REBUILD_AFTER_DAYS.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import logging
+from collections import Counter
+
+from metrics import timed
+
+logger = logging.getLogger('lead_generation')
+
+DEFAULT_PROFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'lead_profile.sqlite3')
+# Leads read per page during a refresh
+PAGE_SIZE = 1000
+# Days between full rebuilds, which drop the contributions of deleted leads
+REBUILD_AFTER_DAYS = 7
+# Columns read from the leads table; About text is reduced to keywords and never kept
+LEAD_COLUMNS = 'id,industry,employee_count,ai_readiness,status,lead_score,about,updated_at'
+# LinkedIn company size bands as (low, high), high None if open; a stored employee_count is the low end of one
+SIZE_BANDS = [(1, 10), (11, 50), (51, 200), (201, 500), (501, 1000), (1001, 5000), (5001, 10000), (10001, None)]
+
+# Weight of a lead by status, so leads further along the sales pipeline shape the search more
+STATUS_WEIGHTS = {'new': 1.0, 'contacted': 1.5, 'qualified': 2.5, 'proposal': 3.0, 'closed': 4.0}
+# Most distinct keywords kept per lead, the most frequent in its About text
+KEYWORDS_PER_LEAD = 15
+# Entries of each distribution and keywords listed in the summary sent to the LLM
+SUMMARY_TOP_ENTRIES = 10
+SUMMARY_TOP_KEYWORDS = 25
+# Words too common in company descriptions to tell leads apart
+STOPWORDS = frozenset("""
+    a about across all also an and any are as at be been being both but by can company companies
+    do does each for from had has have help helps how in into is it its more most not of on one
+    or our other out over provide provides providing such than that the their them they this
+    those through to up us we what when where which while who will with within you your
+    singapore singaporean based business businesses services service solutions solution clients
+    customers team year years well new including offer offers leading range
+""".split())
+WORD_PATTERN = re.compile(r'[a-z][a-z\-]{2,}')
+
+
+def lead_weight(lead):
+    """Return the weight of a lead from its status and lead score"""
+    status_weight = STATUS_WEIGHTS.get(str(lead.get('status') or 'new').lower(), 1.0)
+    try:
+        score = float(lead.get('lead_score') or 0)
+    except (TypeError, ValueError):
+        score = 0.0
+    return round(status_weight * (1 + max(0.0, min(score, 100.0)) / 100), 4)
+
+
+def size_band(employee_count):
+    """Return the LinkedIn size band of an employee count as 'low-high' or 'low+', or 'unknown'"""
+    try:
+        count = int(employee_count)
+    except (TypeError, ValueError):
+        return 'unknown'
+    if count < 1:
+        return 'unknown'
+    for low, high in SIZE_BANDS:
+        if high is None or count <= high:
+            return f"{low}+" if high is None else f"{low}-{high}"
+
+
+def extract_keywords(about_text, industry=''):
+    """Return the most frequent distinctive words of a lead's About text and industry"""
+    text = f"{about_text or ''} {industry or ''}".lower()
+    if text.strip() in ('', '-'):
+        return []
+    counts = Counter(word.strip('-') for word in WORD_PATTERN.findall(text))
+    return [word for word, _ in counts.most_common() if word and word not in STOPWORDS][:KEYWORDS_PER_LEAD]
+
+
+def lead_contribution(lead):
+    """Return what one lead adds to the profile"""
+    return (
+        str(lead['id']),
+        (lead.get('industry') or 'unknown').strip() or 'unknown',
+        size_band(lead.get('employee_count')),
+        lead.get('ai_readiness') or 'unclassified',
+        str(lead.get('status') or 'new').lower(),
+        lead_weight(lead),
+        extract_keywords(lead.get('about'), lead.get('industry'))
+    )
+
+
+class LeadProfileStore:
+    """Per-lead contributions in SQLite, refreshed from the leads table by updated_at"""
+
+    def __init__(self, path=DEFAULT_PROFILE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS lead_contributions (
+                lead_id TEXT PRIMARY KEY,
+                industry TEXT NOT NULL,
+                size_band TEXT NOT NULL,
+                ai_readiness TEXT NOT NULL,
+                status TEXT NOT NULL,
+                weight REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS lead_keywords (
+                lead_id TEXT NOT NULL,
+                keyword TEXT NOT NULL,
+                weight REAL NOT NULL,
+                PRIMARY KEY (lead_id, keyword)
+            );
+            CREATE INDEX IF NOT EXISTS idx_lead_keywords_keyword ON lead_keywords(keyword);
+            CREATE TABLE IF NOT EXISTS profile_state (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def _get_state(self, key):
+        row = self._conn.execute('SELECT value FROM profile_state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key, value):
+        self._conn.execute('INSERT OR REPLACE INTO profile_state (key, value) VALUES (?, ?)', (key, str(value)))
+
+    def apply(self, leads):
+        """Replace the contributions of the given leads"""
+        with self._lock:
+            for lead in leads:
+                lead_id, industry, band, readiness, status, weight, keywords = lead_contribution(lead)
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO lead_contributions '
+                    '(lead_id, industry, size_band, ai_readiness, status, weight) VALUES (?, ?, ?, ?, ?, ?)',
+                    (lead_id, industry, band, readiness, status, weight)
+                )
+                self._conn.execute('DELETE FROM lead_keywords WHERE lead_id = ?', (lead_id,))
+                self._conn.executemany(
+                    'INSERT INTO lead_keywords (lead_id, keyword, weight) VALUES (?, ?, ?)',
+                    [(lead_id, keyword, weight) for keyword in keywords]
+                )
+            self._conn.commit()
+
+    def refresh(self, supabase_client, rebuild=False):
+        """Apply the leads changed since the last refresh, or all leads when rebuilding; returns the count read"""
+        with self._lock:
+            cursor = self._get_state('cursor')
+            rebuilt_at = float(self._get_state('rebuilt_at') or 0)
+            # Contributions computed from other columns are recomputed from every lead
+            columns = self._get_state('columns')
+        if (rebuild or cursor is None or columns != LEAD_COLUMNS
+                or time.time() - rebuilt_at > REBUILD_AFTER_DAYS * 86400):
+            rebuild, cursor = True, None
+        logger.info("Rebuilding the lead profile from every lead" if rebuild
+                    else f"Refreshing the lead profile with leads updated since {cursor}")
+
+        seen = set()
+        latest = cursor
+        read = 0
+        start = 0
+        while True:
+            query = supabase_client.table('leads').select(LEAD_COLUMNS)
+            if cursor is not None:
+                # Leads updated in the same instant as the cursor are read again, which is harmless
+                query = query.gte('updated_at', cursor)
+            with timed('supabase', 'select_lead_profile'):
+                response = query.order('updated_at').order('id').range(start, start + PAGE_SIZE - 1).execute()
+            rows = [row for row in response.data or [] if row.get('id') is not None]
+            self.apply(rows)
+            for row in rows:
+                seen.add(str(row['id']))
+                if row.get('updated_at') and (latest is None or str(row['updated_at']) > latest):
+                    latest = str(row['updated_at'])
+            read += len(rows)
+            if len(response.data or []) < PAGE_SIZE:
+                break
+            start += PAGE_SIZE
+
+        with self._lock:
+            if rebuild:
+                # Leads that were not read any more have been deleted
+                stale = [
+                    (lead_id,) for (lead_id,) in self._conn.execute('SELECT lead_id FROM lead_contributions')
+                    if lead_id not in seen
+                ]
+                self._conn.executemany('DELETE FROM lead_contributions WHERE lead_id = ?', stale)
+                self._conn.executemany('DELETE FROM lead_keywords WHERE lead_id = ?', stale)
+                self._set_state('rebuilt_at', time.time())
+                self._set_state('columns', LEAD_COLUMNS)
+            if latest is not None:
+                self._set_state('cursor', latest)
+            self._conn.commit()
+        logger.info(f"Lead profile refreshed with {read} leads")
+        return read
+
+    def _distribution(self, column, limit=None):
+        rows = self._conn.execute(
+            f'SELECT {column}, COUNT(*), SUM(weight) FROM lead_contributions '
+            f'GROUP BY {column} ORDER BY SUM(weight) DESC' + (f' LIMIT {int(limit)}' if limit else '')
+        ).fetchall()
+        return [{'value': value, 'leads': count, 'weight': round(weight, 2)} for value, count, weight in rows]
+
+    def summary(self):
+        """Return the aggregate profile of every lead, compact enough for a prompt"""
+        with self._lock:
+            total, total_weight = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(weight), 0) FROM lead_contributions'
+            ).fetchone()
+            keywords = self._conn.execute(
+                'SELECT keyword FROM lead_keywords GROUP BY keyword ORDER BY SUM(weight) DESC, keyword LIMIT ?',
+                (SUMMARY_TOP_KEYWORDS,)
+            ).fetchall()
+            return {
+                'leads': total,
+                'total_weight': round(total_weight, 2),
+                'industries': self._distribution('industry', SUMMARY_TOP_ENTRIES),
+                'company_sizes': self._distribution('size_band', SUMMARY_TOP_ENTRIES),
+                'ai_readiness': {row['value']: row['leads'] for row in self._distribution('ai_readiness')},
+                'statuses': {row['value']: row['leads'] for row in self._distribution('status')},
+                'keywords': [keyword for (keyword,) in keywords]
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_rebuild = False
+
+
+def configure_lead_profile(path=None, rebuild=False):
+    """Open the shared lead profile store; rebuild forces the next refresh to read every lead"""
+    global _store, _rebuild
+    if _store is not None:
+        _store.close()
+    path = path or os.environ.get('LEAD_PROFILE_PATH') or DEFAULT_PROFILE_PATH
+    _store = LeadProfileStore(path)
+    _rebuild = rebuild
+    logger.info(f"Using lead profile at {path}")
+    return _store
+
+
+def get_lead_profile():
+    """Return the shared lead profile store, opening it at the default path if needed"""
+    if _store is None:
+        configure_lead_profile()
+    return _store
+
+
+def refresh_lead_profile(supabase_client):
+    """Bring the shared lead profile up to date and return its summary"""
+    global _rebuild
+    store = get_lead_profile()
+    store.refresh(supabase_client, rebuild=_rebuild)
+    _rebuild = False
+    summary = store.summary()
+    logger.info(f"Lead profile: {json.dumps(summary)[:200]}...")
+    return summary
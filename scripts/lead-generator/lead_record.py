@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Lead Records
+Compact record of one lead as it moves through the scrape, enrich and store
+stages. It uses __slots__ instead of a per-lead dict, and is read and written
+with the same field names as the scraped data ("Company size", "About", ...),
+so the stage functions work on it exactly as on the dicts it replaces.
+"""
+
+# Field name as scraped or enriched -> attribute of the record
+LEAD_FIELDS = {
+    'company_name': 'company_name',
+    'source_url': 'source_url',
+    'Company size': 'company_size',
+    'Industry': 'industry',
+    'Website': 'website',
+    'About': 'about',
+    'ai_readiness': 'ai_readiness',
+    'is_sme': 'is_sme'
+}
+
+
+class LeadRecord:
+    """Dict-like lead with a fixed set of fields"""
+
+    __slots__ = tuple(LEAD_FIELDS.values())
+
+    def __init__(self, data=None, **fields):
+        if data:
+            self.update(data)
+        if fields:
+            self.update(fields)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from scraped or journaled data, ignoring fields a lead does not keep"""
+        return cls({key: value for key, value in data.items() if key in LEAD_FIELDS})
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, LEAD_FIELDS[key])
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        setattr(self, LEAD_FIELDS[key], value)
+
+    def __contains__(self, key):
+        return key in LEAD_FIELDS and hasattr(self, LEAD_FIELDS[key])
+
+    def __repr__(self):
+        return f"LeadRecord({self.to_dict()!r})"
+
+    def get(self, key, default=None):
+        attribute = LEAD_FIELDS.get(key)
+        return getattr(self, attribute, default) if attribute else default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, data):
+        for key, value in data.items():
+            self[key] = value
+
+    def keys(self):
+        return [key for key in LEAD_FIELDS if key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
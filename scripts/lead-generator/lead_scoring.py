@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Lead Scoring
+Python port of calculateLeadScore in src/lib/leadScoring.ts, with the same
+weights and bands: SME status, annual revenue, employee count and AI
+readiness are worth 25 points each, and a fast response time multiplies the
+sum by up to 1.3, capped at 100. Leads are scored as NumPy arrays, a batch
+at a time, so the pipeline fills lead_score when it stores leads and the
+whole table can be rescored in chunks. NumPy is imported by the functions
+that score, so jobs that never store a lead do not load it.
+"""
+
+import math
+import logging
+
+from metrics import timed
+
+logger = logging.getLogger('lead_generation')
+
+# Points of each score component, as DEFAULT_WEIGHTS in leadScoring.ts
+DEFAULT_WEIGHTS = {
+    'sme': 25,
+    'revenue': 25,
+    'employees': 25,
+    'ai_readiness': 25
+}
+# (lowest, highest, share of the component's points, lowest included, highest included), first match wins
+REVENUE_BANDS = [
+    (10000000, 20000000, 1.0, True, True),
+    (8000000, 10000000, 0.75, True, False),
+    (20000000, 25000000, 0.6, False, True)
+]
+EMPLOYEE_BANDS = [
+    (10, 50, 1.0, True, True),
+    (5, 10, 0.75, True, False),
+    (50, 60, 0.6, False, True)
+]
+# Share of the AI readiness points per category
+AI_READINESS_SHARES = {
+    'AI Competent': 1.0,
+    'AI Ready': 0.8,
+    'AI Aware': 0.6,
+    'AI Unaware': 0.2
+}
+# (most hours to respond, multiplier), first match wins
+RESPONSE_TIME_MULTIPLIERS = [(24, 1.3), (48, 1.2), (72, 1.1)]
+# Most points a lead can score
+MAX_SCORE = 100
+# Columns of the leads table the score depends on
+SCORE_COLUMNS = ('is_sme', 'annual_revenue', 'employee_count', 'ai_readiness', 'response_time')
+# Leads read and rescored per chunk by rescore_leads
+DEFAULT_RESCORE_CHUNK_SIZE = 1000
+# Most lead IDs in one update request, which lists them in its URL
+UPDATE_ID_BATCH = 200
+
+
+def points(weight, share):
+    """Return the points of a band, rounded down like Math.floor in leadScoring.ts"""
+    return math.floor(weight * share)
+
+
+def numeric_column(leads, column):
+    """Return a column as floats, with NaN for missing or non-numeric values"""
+    import numpy as np
+
+    values = np.full(len(leads), np.nan)
+    for i, lead in enumerate(leads):
+        value = lead.get(column)
+        if value is None or value == '':
+            continue
+        try:
+            values[i] = float(value)
+        except (TypeError, ValueError):
+            pass
+    return values
+
+
+def band_points(values, bands, weight):
+    """Return the points of each value from the first band it falls in, 0 outside every band"""
+    import numpy as np
+
+    # leadScoring.ts skips the component when the value is 0 or missing
+    present = ~np.isnan(values) & (values != 0)
+    conditions = []
+    choices = []
+    for low, high, share, low_included, high_included in bands:
+        above = values >= low if low_included else values > low
+        below = values <= high if high_included else values < high
+        conditions.append(present & above & below)
+        choices.append(points(weight, share))
+    return np.select(conditions, choices, default=0)
+
+
+def score_components(leads, weights=DEFAULT_WEIGHTS):
+    """Return the score components of a batch of lead rows as arrays"""
+    import numpy as np
+
+    count = len(leads)
+    sme = np.fromiter((bool(lead.get('is_sme')) for lead in leads), dtype=bool, count=count)
+    readiness_points = {category: points(weights['ai_readiness'], share) for category, share in AI_READINESS_SHARES.items()}
+    response_time = numeric_column(leads, 'response_time')
+    responded = ~np.isnan(response_time) & (response_time != 0)
+    multiplier = np.select(
+        [responded & (response_time <= hours) for hours, _ in RESPONSE_TIME_MULTIPLIERS],
+        [value for _, value in RESPONSE_TIME_MULTIPLIERS],
+        default=1.0
+    )
+    return {
+        'sme_score': np.where(sme, weights['sme'], 0),
+        'revenue_score': band_points(numeric_column(leads, 'annual_revenue'), REVENUE_BANDS, weights['revenue']),
+        'employee_score': band_points(numeric_column(leads, 'employee_count'), EMPLOYEE_BANDS, weights['employees']),
+        'ai_readiness_score': np.fromiter(
+            (readiness_points.get(lead.get('ai_readiness'), 0) for lead in leads), dtype=np.int64, count=count
+        ),
+        'response_time_multiplier': multiplier
+    }
+
+
+def score_leads(leads, weights=DEFAULT_WEIGHTS):
+    """Return the lead_score of each lead row in a batch as an integer array"""
+    import numpy as np
+
+    if not leads:
+        return np.zeros(0, dtype=np.int64)
+    components = score_components(leads, weights)
+    base = (components['sme_score'] + components['revenue_score'] + components['employee_score']
+            + components['ai_readiness_score'])
+    # Math.round rounds halves up, unlike np.round
+    total = np.floor(base * components['response_time_multiplier'] + 0.5)
+    return np.minimum(MAX_SCORE, total).astype(np.int64)
+
+
+def rescore_leads(supabase_client, chunk_size=DEFAULT_RESCORE_CHUNK_SIZE, dry_run=False):
+    """Recompute lead_score for every lead in chunks, updating only the scores that changed
+
+    Returns the number of leads read and the number whose score changed.
+    """
+    import numpy as np
+
+    logger.info(f"Rescoring every lead in chunks of {chunk_size}...")
+    read = changed = 0
+    start = 0
+    while True:
+        with timed('supabase', 'select_lead_scores'):
+            response = supabase_client.table('leads') \
+                .select(','.join(('id', 'lead_score') + SCORE_COLUMNS)) \
+                .order('id') \
+                .range(start, start + chunk_size - 1) \
+                .execute()
+        rows = response.data or []
+        if rows:
+            scores = score_leads(rows)
+            current = np.array([row.get('lead_score') if row.get('lead_score') is not None else -1 for row in rows])
+            stale = np.flatnonzero(scores != current)
+            changed += len(stale)
+            if len(stale) and not dry_run:
+                # One update per distinct score rather than per lead
+                ids = np.array([rows[i]['id'] for i in stale], dtype=object)
+                for score in np.unique(scores[stale]):
+                    score_ids = list(ids[scores[stale] == score])
+                    for batch_start in range(0, len(score_ids), UPDATE_ID_BATCH):
+                        with timed('supabase', 'update_lead_scores'):
+                            supabase_client.table('leads') \
+                                .update({'lead_score': int(score)}) \
+                                .in_('id', score_ids[batch_start:batch_start + UPDATE_ID_BATCH]) \
+                                .execute()
+            read += len(rows)
+            logger.info(f"Rescored {read} leads, {changed} changed")
+        if len(rows) < chunk_size:
+            break
+        start += chunk_size
+    logger.info(f"Rescored {read} leads, {changed} scores {'would change' if dry_run else 'updated'}")
+    return read, changed
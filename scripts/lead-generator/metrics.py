@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Job Instrumentation
+Latency histograms for every external call (JigsawStack, OpenAI, Supabase),
+rate limit retries and waits, OpenAI token usage with estimated cost, and
+per-stage timings. Measurements go to the metrics of the job that made the
+call and to process-wide totals, and can be exported as a JSON summary or as
+Prometheus text.
+"""
+
+import contextvars
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger('lead_generation')
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float('inf')
+)
+
+# OpenAI prices in USD per million (prompt, completion) tokens, matched by model name prefix
+OPENAI_PRICES = {
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-3.5-turbo': (0.50, 1.50)
+}
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Estimate the USD cost of a completion, 0 for models without a known price"""
+    matches = [name for name in OPENAI_PRICES if str(model or '').startswith(name)]
+    if not matches:
+        return 0.0
+    prompt_price, completion_price = OPENAI_PRICES[max(matches, key=len)]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000000
+
+
+class Histogram:
+    """Cumulative latency histogram"""
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = 0.0
+        self.errors = 0
+
+    def observe(self, seconds, error=False):
+        self.count += 1
+        self.sum += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        if error:
+            self.errors += 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation within its bucket, clamped to the observed range"""
+        if not self.count:
+            return 0.0
+        return min(self.max, max(self.min, self._interpolate(q)))
+
+    def _interpolate(self, q):
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            if count and seen + count >= rank:
+                if bound == float('inf'):
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound if bound != float('inf') else lower
+        return lower
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total_seconds': round(self.sum, 3),
+            'mean_seconds': round(self.sum / self.count, 3) if self.count else 0.0,
+            'p50_seconds': round(self.quantile(0.5), 3),
+            'p95_seconds': round(self.quantile(0.95), 3),
+            'p99_seconds': round(self.quantile(0.99), 3),
+            'max_seconds': round(self.max, 3)
+        }
+
+
+class Metrics:
+    """Thread-safe collection of call, token, retry and stage measurements"""
+
+    def __init__(self):
+        self.calls = {}
+        self.retries = {}
+        self.error_retries = {}
+        self.circuit_waits = {}
+        self.rate_limit_waits = {}
+        self.queue_waits = {}
+        self.backoff_waits = {}
+        self.cache_hits = {}
+        self.local_classifications = {}
+        self.snippet_decisions = {}
+        self.tokens = {}
+        self.stages = {}
+        self.stage_latency = {}
+        self._lock = threading.Lock()
+
+    def observe_call(self, provider, operation, seconds, error=False):
+        with self._lock:
+            self.calls.setdefault((provider, operation), Histogram()).observe(seconds, error)
+
+    def add_retry(self, provider):
+        with self._lock:
+            self.retries[provider] = self.retries.get(provider, 0) + 1
+
+    def add_error_retry(self, provider):
+        with self._lock:
+            self.error_retries[provider] = self.error_retries.get(provider, 0) + 1
+
+    def add_circuit_wait(self, provider, seconds):
+        with self._lock:
+            self.circuit_waits[provider] = self.circuit_waits.get(provider, 0.0) + seconds
+
+    def add_rate_limit_wait(self, provider, seconds):
+        with self._lock:
+            self.rate_limit_waits[provider] = self.rate_limit_waits.get(provider, 0.0) + seconds
+
+    def add_queue_wait(self, provider, seconds):
+        with self._lock:
+            self.queue_waits[provider] = self.queue_waits.get(provider, 0.0) + seconds
+
+    def add_backoff_wait(self, provider, seconds):
+        with self._lock:
+            self.backoff_waits[provider] = self.backoff_waits.get(provider, 0.0) + seconds
+
+    def add_cache_hit(self, namespace):
+        with self._lock:
+            self.cache_hits[namespace] = self.cache_hits.get(namespace, 0) + 1
+
+    def add_local_classification(self, outcome):
+        with self._lock:
+            self.local_classifications[outcome] = self.local_classifications.get(outcome, 0) + 1
+
+    def add_snippet_decision(self, outcome):
+        with self._lock:
+            self.snippet_decisions[outcome] = self.snippet_decisions.get(outcome, 0) + 1
+
+    def add_tokens(self, operation, model, prompt_tokens, completion_tokens):
+        with self._lock:
+            usage = self.tokens.setdefault((operation, model), {'prompt': 0, 'completion': 0, 'cost_usd': 0.0})
+            usage['prompt'] += prompt_tokens
+            usage['completion'] += completion_tokens
+            usage['cost_usd'] += estimate_cost(model, prompt_tokens, completion_tokens)
+
+    def observe_stage_item(self, stage, seconds):
+        with self._lock:
+            self.stage_latency.setdefault(stage, Histogram()).observe(seconds)
+
+    def add_stage(self, stage, seconds, items=0):
+        with self._lock:
+            totals = self.stages.setdefault(stage, {'seconds': 0.0, 'items': 0})
+            totals['seconds'] += seconds
+            totals['items'] += items
+
+    def summary(self):
+        """Return the measurements as a JSON-serializable dict"""
+        with self._lock:
+            tokens = {}
+            for (operation, model), usage in sorted(self.tokens.items()):
+                totals = tokens.setdefault(operation, {'prompt': 0, 'completion': 0, 'cost_usd': 0.0})
+                totals['prompt'] += usage['prompt']
+                totals['completion'] += usage['completion']
+                totals['cost_usd'] += usage['cost_usd']
+            for totals in tokens.values():
+                totals['cost_usd'] = round(totals['cost_usd'], 6)
+            return {
+                'calls': {
+                    f"{provider}.{operation}": histogram.summary()
+                    for (provider, operation), histogram in sorted(self.calls.items())
+                },
+                'retries': dict(self.retries),
+                # Retries after server errors, timeouts and dropped connections
+                'error_retries': dict(self.error_retries),
+                'circuit_wait_seconds': {
+                    provider: round(seconds, 3) for provider, seconds in self.circuit_waits.items()
+                },
+                'rate_limit_wait_seconds': {
+                    provider: round(seconds, 3) for provider, seconds in self.rate_limit_waits.items()
+                },
+                'queue_wait_seconds': {
+                    provider: round(seconds, 3) for provider, seconds in self.queue_waits.items()
+                },
+                # Time slept between retries after server errors, timeouts and dropped connections
+                'backoff_wait_seconds': {
+                    provider: round(seconds, 3) for provider, seconds in self.backoff_waits.items()
+                },
+                'cache_hits': dict(self.cache_hits),
+                # Leads the local AI readiness rules settled, by category, and those left to the LLM
+                'local_classifications': dict(self.local_classifications),
+                'llm_classifications_avoided': sum(
+                    count for outcome, count in self.local_classifications.items() if outcome != 'deferred'
+                ),
+                # Candidates dropped as off target or settled from their search snippet, so never scraped
+                'snippet_decisions': dict(self.snippet_decisions),
+                'scrapes_avoided': sum(self.snippet_decisions.values()),
+                'tokens': tokens,
+                'cost_usd': round(sum(usage['cost_usd'] for usage in self.tokens.values()), 6),
+                'stages': {
+                    stage: {'seconds': round(totals['seconds'], 3), 'items': totals['items']}
+                    for stage, totals in self.stages.items()
+                },
+                'stage_latency': {
+                    stage: histogram.summary() for stage, histogram in self.stage_latency.items()
+                }
+            }
+
+    def prometheus_text(self):
+        """Return the measurements in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            lines.append('# HELP lead_external_call_seconds Latency of external API calls')
+            lines.append('# TYPE lead_external_call_seconds histogram')
+            for (provider, operation), histogram in sorted(self.calls.items()):
+                labels = f'provider="{provider}",operation="{operation}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, histogram.buckets):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'lead_external_call_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f'lead_external_call_seconds_sum{{{labels}}} {histogram.sum:.6f}')
+                lines.append(f'lead_external_call_seconds_count{{{labels}}} {histogram.count}')
+
+            lines.append('# HELP lead_external_call_errors_total External API calls that raised an error')
+            lines.append('# TYPE lead_external_call_errors_total counter')
+            for (provider, operation), histogram in sorted(self.calls.items()):
+                lines.append(
+                    f'lead_external_call_errors_total{{provider="{provider}",operation="{operation}"}} '
+                    f'{histogram.errors}'
+                )
+
+            lines.append('# HELP lead_rate_limit_retries_total Calls retried after a 429 response')
+            lines.append('# TYPE lead_rate_limit_retries_total counter')
+            for provider, count in sorted(self.retries.items()):
+                lines.append(f'lead_rate_limit_retries_total{{provider="{provider}"}} {count}')
+
+            lines.append('# HELP lead_error_retries_total Calls retried after a server error, timeout or dropped connection')
+            lines.append('# TYPE lead_error_retries_total counter')
+            for provider, count in sorted(self.error_retries.items()):
+                lines.append(f'lead_error_retries_total{{provider="{provider}"}} {count}')
+
+            lines.append('# HELP lead_circuit_wait_seconds_total Time calls waited for an open circuit breaker')
+            lines.append('# TYPE lead_circuit_wait_seconds_total counter')
+            for provider, seconds in sorted(self.circuit_waits.items()):
+                lines.append(f'lead_circuit_wait_seconds_total{{provider="{provider}"}} {seconds:.6f}')
+
+            lines.append('# HELP lead_rate_limit_wait_seconds_total Time spent waiting for rate limit tokens')
+            lines.append('# TYPE lead_rate_limit_wait_seconds_total counter')
+            for provider, seconds in sorted(self.rate_limit_waits.items()):
+                lines.append(f'lead_rate_limit_wait_seconds_total{{provider="{provider}"}} {seconds:.6f}')
+
+            lines.append('# HELP lead_provider_queue_wait_seconds_total Time spent waiting for a provider slot')
+            lines.append('# TYPE lead_provider_queue_wait_seconds_total counter')
+            for provider, seconds in sorted(self.queue_waits.items()):
+                lines.append(f'lead_provider_queue_wait_seconds_total{{provider="{provider}"}} {seconds:.6f}')
+
+            lines.append('# HELP lead_backoff_wait_seconds_total Time spent backing off between retries')
+            lines.append('# TYPE lead_backoff_wait_seconds_total counter')
+            for provider, seconds in sorted(self.backoff_waits.items()):
+                lines.append(f'lead_backoff_wait_seconds_total{{provider="{provider}"}} {seconds:.6f}')
+
+            lines.append('# HELP lead_cache_hits_total Calls served from the content cache or LLM memo')
+            lines.append('# TYPE lead_cache_hits_total counter')
+            for namespace, count in sorted(self.cache_hits.items()):
+                lines.append(f'lead_cache_hits_total{{namespace="{namespace}"}} {count}')
+
+            lines.append('# HELP lead_local_classifications_total Leads the local AI readiness rules settled or deferred')
+            lines.append('# TYPE lead_local_classifications_total counter')
+            for outcome, count in sorted(self.local_classifications.items()):
+                lines.append(f'lead_local_classifications_total{{outcome="{outcome}"}} {count}')
+
+            lines.append('# HELP lead_snippet_decisions_total Candidates not scraped because of their search snippet')
+            lines.append('# TYPE lead_snippet_decisions_total counter')
+            for outcome, count in sorted(self.snippet_decisions.items()):
+                lines.append(f'lead_snippet_decisions_total{{outcome="{outcome}"}} {count}')
+
+            lines.append('# HELP lead_openai_tokens_total OpenAI tokens used')
+            lines.append('# TYPE lead_openai_tokens_total counter')
+            for (operation, model), usage in sorted(self.tokens.items()):
+                for kind in ('prompt', 'completion'):
+                    lines.append(
+                        f'lead_openai_tokens_total{{operation="{operation}",model="{model}",type="{kind}"}} '
+                        f'{usage[kind]}'
+                    )
+
+            lines.append('# HELP lead_openai_cost_usd_total Estimated OpenAI cost in USD')
+            lines.append('# TYPE lead_openai_cost_usd_total counter')
+            for (operation, model), usage in sorted(self.tokens.items()):
+                lines.append(
+                    f'lead_openai_cost_usd_total{{operation="{operation}",model="{model}"}} {usage["cost_usd"]:.6f}'
+                )
+
+            lines.append('# HELP lead_stage_seconds_total Time spent working in each pipeline stage')
+            lines.append('# TYPE lead_stage_seconds_total counter')
+            for stage, totals in sorted(self.stages.items()):
+                lines.append(f'lead_stage_seconds_total{{stage="{stage}"}} {totals["seconds"]:.6f}')
+
+            lines.append('# HELP lead_stage_item_seconds Time a pipeline stage spent on one item or batch')
+            lines.append('# TYPE lead_stage_item_seconds histogram')
+            for stage, histogram in sorted(self.stage_latency.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, histogram.buckets):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'lead_stage_item_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'lead_stage_item_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'lead_stage_item_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+            lines.append('# HELP lead_stage_items_total Items produced by each pipeline stage')
+            lines.append('# TYPE lead_stage_items_total counter')
+            for stage, totals in sorted(self.stages.items()):
+                lines.append(f'lead_stage_items_total{{stage="{stage}"}} {totals["items"]}')
+        return '\n'.join(lines) + '\n'
+
+
+# Totals for everything this process has done, across jobs
+_process_metrics = Metrics()
+# Metrics of the job running in the current context; pipeline threads inherit it
+_job_metrics = contextvars.ContextVar('job_metrics', default=None)
+
+
+def get_process_metrics():
+    """Return the process-wide metrics"""
+    return _process_metrics
+
+
+def get_job_metrics():
+    """Return the metrics of the current job, or None outside a job"""
+    return _job_metrics.get()
+
+
+@contextmanager
+def job_metrics(metrics):
+    """Attribute measurements made inside the block to the given job metrics"""
+    token = _job_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _job_metrics.reset(token)
+
+
+def _targets():
+    job = _job_metrics.get()
+    return (_process_metrics, job) if job is not None else (_process_metrics,)
+
+
+@contextmanager
+def timed(provider, operation):
+    """Measure the latency of an external call made inside the block"""
+    start = time.monotonic()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        seconds = time.monotonic() - start
+        for metrics in _targets():
+            metrics.observe_call(provider, operation, seconds, error)
+
+
+def record_retry(provider):
+    for metrics in _targets():
+        metrics.add_retry(provider)
+
+
+def record_error_retry(provider):
+    for metrics in _targets():
+        metrics.add_error_retry(provider)
+
+
+def record_circuit_wait(provider, seconds):
+    if seconds > 0:
+        for metrics in _targets():
+            metrics.add_circuit_wait(provider, seconds)
+
+
+def record_rate_limit_wait(provider, seconds):
+    if seconds > 0:
+        for metrics in _targets():
+            metrics.add_rate_limit_wait(provider, seconds)
+
+
+def record_queue_wait(provider, seconds):
+    if seconds > 0:
+        for metrics in _targets():
+            metrics.add_queue_wait(provider, seconds)
+
+
+def record_backoff_wait(provider, seconds):
+    if seconds > 0:
+        for metrics in _targets():
+            metrics.add_backoff_wait(provider, seconds)
+
+
+def record_cache_hit(namespace):
+    for metrics in _targets():
+        metrics.add_cache_hit(namespace)
+
+
+def record_local_classification(category):
+    """Count a lead settled by the local AI readiness rules, or deferred to the LLM when category is None"""
+    for metrics in _targets():
+        metrics.add_local_classification(category or 'deferred')
+
+
+def record_snippet_decision(outcome):
+    """Count a candidate dropped as 'off_target' or settled from its 'complete' search snippet"""
+    for metrics in _targets():
+        metrics.add_snippet_decision(outcome)
+
+
+def record_tokens(operation, response):
+    """Record the token usage of an OpenAI response"""
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+    model = getattr(response, 'model', None) or 'unknown'
+    for metrics in _targets():
+        metrics.add_tokens(operation, model, prompt_tokens, completion_tokens)
+
+
+def record_stage_item(stage, seconds):
+    """Record how long a pipeline stage spent on one item or batch"""
+    for metrics in _targets():
+        metrics.observe_stage_item(stage, seconds)
+
+
+def record_stage(stage, seconds, items=0):
+    for metrics in _targets():
+        metrics.add_stage(stage, seconds, items)
+
+
+def write_prometheus_file(path, metrics):
+    """Write metrics in Prometheus text format, replacing the file atomically"""
+    temp_path = f"{path}.tmp"
+    try:
+        with open(temp_path, 'w') as metrics_file:
+            metrics_file.write(metrics.prometheus_text())
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.error(f"Error writing metrics to {path}: {str(e)}")
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Streaming Pipeline Engine
+Runs the lead generation stages concurrently. Each stage is a pool of
+workers fed by a bounded queue, so an item moves to the next stage as soon
+as the previous one has produced it.
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('lead_generation')
+
+# Sentinel placed on a queue to tell a worker that no more items will arrive
+_DONE = object()
+
+
+class Stage:
+    """A named pipeline stage backed by a blocking function"""
+
+    def __init__(self, name, func, workers=1, fan_out=False, batch_size=1, batch_timeout=1.0, limit=None):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        # When fan_out is set, func returns an iterable of items for the next stage
+        self.fan_out = fan_out
+        # When batch_size > 1, func receives a list of up to batch_size items, collected
+        # for at most batch_timeout seconds after the first item arrives
+        self.batch_size = max(1, batch_size)
+        self.batch_timeout = batch_timeout
+        # Once the stage has produced limit items, it and every stage before it stop
+        # taking new work and the source is no longer read
+        self.limit = limit
+        self.received = 0
+        self.produced = 0
+        self.failed = 0
+        # Seconds the stage's workers spent inside func
+        self.busy_seconds = 0.0
+
+    def stats(self):
+        """Return the item counters and busy time for this stage"""
+        return {
+            'received': self.received,
+            'produced': self.produced,
+            'failed': self.failed,
+            'busy_seconds': round(self.busy_seconds, 3)
+        }
+
+
+class Pipeline:
+    """Connects stages with bounded queues and runs them as worker pools"""
+
+    def __init__(self, stages, queue_size=100, observer=None, collect=True, abort_on=(), on_stop=None):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self.queue_size = queue_size
+        # With collect=False the final stage outputs are only counted, so items are
+        # released as soon as they leave the pipeline
+        self.collect = collect
+        # Optional observer(stage_name, seconds) called after each item or batch is processed
+        self.observer = observer
+        # Exception types that stop the whole pipeline instead of failing one item;
+        # run() raises the first of them once the workers have drained their queues
+        self.abort_on = tuple(abort_on)
+        self._abort_error = None
+        # Optional on_stop() called once when stages stop taking work, so a source
+        # blocked waiting for their results can give up
+        self.on_stop = on_stop
+        # Index of the last stage that has stopped taking work, or -1
+        self._stopped_through = -1
+
+    def run(self, source):
+        """Run the pipeline over the source items and return the final stage outputs (if collected)"""
+        return asyncio.run(self.run_async(source))
+
+    def stats(self):
+        """Return the item counters for every stage, keyed by stage name"""
+        return {stage.name: stage.stats() for stage in self.stages}
+
+    async def run_async(self, source):
+        """Asynchronous entry point for callers that already run an event loop"""
+        loop = asyncio.get_running_loop()
+        # One thread per worker plus one for pulling items from the source
+        executor = ThreadPoolExecutor(
+            max_workers=sum(stage.workers for stage in self.stages) + 1,
+            thread_name_prefix='pipeline'
+        )
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        results = []
+
+        try:
+            tasks = [asyncio.ensure_future(self._feed(loop, executor, source, queues[0]))]
+            for index, stage in enumerate(self.stages):
+                output = queues[index + 1] if index + 1 < len(queues) else None
+                next_stage = self.stages[index + 1] if output is not None else None
+                tasks.append(asyncio.ensure_future(
+                    self._run_stage(loop, executor, stage, queues[index], output, next_stage, results)
+                ))
+            await asyncio.gather(*tasks)
+        finally:
+            executor.shutdown(wait=True)
+
+        for stage in self.stages:
+            logger.info(f"Stage '{stage.name}': {stage.received} in, {stage.produced} out, {stage.failed} failed")
+        if self._abort_error is not None:
+            raise self._abort_error
+        return results
+
+    async def _feed(self, loop, executor, source, queue):
+        """Pull items from the (possibly lazy) source into the first queue"""
+        iterator = iter(source)
+        while self._stopped_through < 0:
+            # The source may block (e.g. generating queries on demand), so pull it off-loop.
+            # Running it in a copy of the current context keeps context variables such as
+            # the job's metrics visible in the executor threads
+            item = await loop.run_in_executor(executor, contextvars.copy_context().run, next, iterator, _DONE)
+            if item is _DONE:
+                break
+            await queue.put(item)
+        for _ in range(self.stages[0].workers):
+            await queue.put(_DONE)
+
+    async def _run_stage(self, loop, executor, stage, queue, output, next_stage, results):
+        """Run all workers of a stage, then signal the next stage that input is exhausted"""
+        index = self.stages.index(stage)
+        await asyncio.gather(*[
+            self._worker(loop, executor, index, stage, queue, output, results)
+            for _ in range(stage.workers)
+        ])
+        if output is not None:
+            for _ in range(next_stage.workers):
+                await output.put(_DONE)
+
+    async def _worker(self, loop, executor, index, stage, queue, output, results):
+        """Process items from the stage queue until the sentinel arrives"""
+        finished = False
+        while not finished:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            if index <= self._stopped_through:
+                # A downstream limit was reached, so drain the queue without doing the work
+                continue
+            if stage.batch_size > 1:
+                item, finished = await self._collect_batch(stage, queue, item)
+                stage.received += len(item)
+            else:
+                stage.received += 1
+
+            started = time.monotonic()
+            try:
+                value = await loop.run_in_executor(executor, contextvars.copy_context().run, stage.func, item)
+            except Exception as e:
+                logger.error(f"Error in pipeline stage '{stage.name}': {str(e)}")
+                stage.failed += len(item) if stage.batch_size > 1 else 1
+                if isinstance(e, self.abort_on) and self._abort_error is None:
+                    logger.error(f"Stopping the pipeline after the error in stage '{stage.name}'")
+                    self._abort_error = e
+                    self._stop_through(len(self.stages) - 1)
+                continue
+            finally:
+                elapsed = time.monotonic() - started
+                stage.busy_seconds += elapsed
+                if self.observer is not None:
+                    self.observer(stage.name, elapsed)
+
+            if value is None:
+                continue
+            for produced in (value if stage.fan_out else [value]):
+                if stage.limit is not None and stage.produced >= stage.limit:
+                    break
+                stage.produced += 1
+                if stage.limit is not None and stage.produced >= stage.limit:
+                    logger.info(f"Stage '{stage.name}' reached its limit of {stage.limit} items")
+                    self._stop_through(index)
+                if output is None:
+                    if self.collect:
+                        results.append(produced)
+                else:
+                    await output.put(produced)
+
+    def _stop_through(self, index):
+        """Stop the stages up to index from taking new work"""
+        if self._stopped_through < 0 and self.on_stop is not None:
+            self.on_stop()
+        self._stopped_through = max(self._stopped_through, index)
+
+    async def _collect_batch(self, stage, queue, first):
+        """Gather up to batch_size items, returning the batch and whether input is exhausted"""
+        batch = [first]
+        deadline = time.monotonic() + stage.batch_timeout
+        while len(batch) < stage.batch_size:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(0.05, remaining))
+                continue
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Job Progress
+Running found/scraped/enriched/stored counters for a lead generation job.
+The stages count their items with record_progress(), and the counters are
+written to the job's `progress` column in lead_generation_jobs (and emitted
+as 'progress' events) at most once per interval, so the dashboard can show
+how far a job is while leads are already being stored.
+"""
+
+import contextlib
+import threading
+import time
+import logging
+from contextvars import ContextVar
+
+from events import emit_event
+from metrics import timed
+
+logger = logging.getLogger('lead_generation')
+
+# Counters kept per job, in pipeline order
+PROGRESS_COUNTERS = ('found', 'scraped', 'enriched', 'stored')
+# Least number of seconds between two progress writes to the job row
+DEFAULT_PROGRESS_INTERVAL = 1.0
+
+
+class JobProgress:
+    """Thread-safe progress counters for one job, written to its job row"""
+
+    def __init__(self, supabase_client, job_id, interval=DEFAULT_PROGRESS_INTERVAL, target=None):
+        self.supabase_client = supabase_client
+        self.job_id = job_id
+        self.interval = interval
+        # Searches can turn up more companies than the job passes on, so found stops at the target
+        self.target = target
+        self.counters = dict.fromkeys(PROGRESS_COUNTERS, 0)
+        self._written = None
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def add(self, counter, count=1):
+        with self._lock:
+            self.counters[counter] += count
+            if counter == 'found' and self.target is not None:
+                self.counters[counter] = min(self.counters[counter], self.target)
+            due = time.monotonic() - self._last_write >= self.interval
+        if due:
+            self.flush(force=False)
+
+    def set(self, counters):
+        """Replace the counters, e.g. with the final stage summary of the job"""
+        with self._lock:
+            for counter in PROGRESS_COUNTERS:
+                if counter in counters:
+                    self.counters[counter] = counters[counter]
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def flush(self, force=True):
+        """Write the counters to the job row if they changed since the last write"""
+        # Stage workers call this concurrently; one write at a time is enough
+        if not self._write_lock.acquire(blocking=force):
+            return
+        try:
+            counters = self.snapshot()
+            if counters == self._written:
+                return
+            self._last_write = time.monotonic()
+            emit_event('progress', job_id=self.job_id, **counters)
+            if self.supabase_client is None:
+                self._written = counters
+                return
+            try:
+                with timed('supabase', 'update_progress'):
+                    self.supabase_client.table('lead_generation_jobs') \
+                        .update({'progress': counters, 'updated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ')}) \
+                        .eq('job_id', self.job_id) \
+                        .execute()
+                self._written = counters
+            except Exception as e:
+                # Progress is informational; the job carries on without it
+                logger.warning(f"Could not update progress for job {self.job_id}: {str(e)}")
+        finally:
+            self._write_lock.release()
+
+
+# Progress of the job running in the current context, if any
+_job_progress = ContextVar('job_progress', default=None)
+
+
+def get_job_progress():
+    return _job_progress.get()
+
+
+@contextlib.contextmanager
+def job_progress(progress):
+    """Count the items of every stage run inside the block towards progress"""
+    token = _job_progress.set(progress)
+    try:
+        yield progress
+    finally:
+        _job_progress.reset(token)
+
+
+def record_progress(counter, count=1):
+    progress = _job_progress.get()
+    if progress is not None and count:
+        progress.add(counter, count)
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Query Performance Store
+Remembers, across jobs, how well each search query worked: the searches
+spent on it, the LinkedIn company URLs they returned, how many of those were
+new companies and how many leads were stored from it. The numbers live in
+the Supabase `search_query_stats` table.
+
+Query selection works like a multi-armed bandit. Each past query is an arm
+whose reward is new companies per search. A job reuses the queries with the
+best upper confidence bound, once their results have had time to change, and
+retires queries that keep coming back without new companies. Only the rest
+of each round is asked from the LLM, which is shown the best queries so it
+writes new variations of them.
+"""
+
+import calendar
+import math
+import threading
+import time
+import logging
+
+from metrics import timed
+
+logger = logging.getLogger('lead_generation')
+
+# Most stored queries loaded at the start of a job, most recently used first
+MAX_LOADED_QUERIES = 1000
+# Days before a query is searched again; search results are cached for a day and
+# new companies take a while to show up
+REUSE_AFTER_DAYS = 7
+# Share of each round always left to new LLM queries, so new arms keep being explored
+EXPLORE_FRACTION = 0.3
+# Weight of the exploration bonus in the upper confidence bound
+UCB_EXPLORATION = 0.5
+# Searches in a row without a new company after which a query is retired
+RETIRE_AFTER_DRY_SEARCHES = 2
+# Best queries shown to the LLM as examples to vary
+MAX_EXAMPLE_QUERIES = 10
+
+STAT_COUNTERS = ('searches', 'urls_found', 'new_companies', 'leads_stored')
+
+
+def query_key(query):
+    """Normalize a query so trivially different spellings share one row"""
+    return " ".join(str(query).lower().split())
+
+
+def parse_timestamp(value):
+    """Return the epoch seconds of a UTC timestamp from PostgREST, or 0"""
+    try:
+        return calendar.timegm(time.strptime(str(value)[:19], '%Y-%m-%dT%H:%M:%S'))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class QueryStats:
+    """Counters of one query, as loaded plus what this job added"""
+
+    __slots__ = ('query', 'searches', 'urls_found', 'new_companies', 'leads_stored', 'dry_streak',
+                 'retired', 'last_searched', 'changes')
+
+    def __init__(self, query, row=None):
+        row = row or {}
+        self.query = row.get('query') or query
+        for counter in STAT_COUNTERS:
+            setattr(self, counter, row.get(counter) or 0)
+        self.dry_streak = row.get('dry_streak') or 0
+        self.retired = bool(row.get('retired'))
+        self.last_searched = parse_timestamp(row.get('last_searched_at'))
+        # What this job added, written back on flush
+        self.changes = dict.fromkeys(STAT_COUNTERS, 0)
+
+    def reward(self):
+        """New companies per search"""
+        return self.new_companies / self.searches if self.searches else 0.0
+
+
+class QueryPerformanceStore:
+    """Per-query search yield shared between jobs through the search_query_stats table"""
+
+    def __init__(self, supabase_client):
+        self.supabase_client = supabase_client
+        self.enabled = supabase_client is not None
+        self._stats = {}
+        # New company URL -> key of the query that found it, to credit stored leads
+        self._url_queries = {}
+        # Counts of this job, kept after they are flushed
+        self._job_totals = dict.fromkeys(STAT_COUNTERS, 0)
+        self._job_queries = set()
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read the stats of recently used queries; without the table the store stays disabled"""
+        if not self.enabled:
+            return self
+        try:
+            with timed('supabase', 'select_query_stats'):
+                response = self.supabase_client.table('search_query_stats') \
+                    .select('*') \
+                    .order('last_searched_at', desc=True) \
+                    .limit(MAX_LOADED_QUERIES) \
+                    .execute()
+        except Exception as e:
+            logger.warning(f"Query performance store unavailable, queries will not be reused: {str(e)}")
+            self.enabled = False
+            return self
+        with self._lock:
+            for row in response.data or []:
+                key = row.get('query_key') or query_key(row.get('query', ''))
+                self._stats[key] = QueryStats(row.get('query', key), row)
+        retired = sum(1 for stats in self._stats.values() if stats.retired)
+        logger.info(f"Loaded search stats for {len(self._stats)} queries ({retired} retired)")
+        return self
+
+    def known_queries(self):
+        """Return every loaded query, so the LLM does not suggest them again"""
+        with self._lock:
+            return [stats.query for stats in self._stats.values()]
+
+    def is_retired(self, query):
+        """Return True if a query stopped finding new companies in earlier searches"""
+        with self._lock:
+            stats = self._stats.get(query_key(query))
+            return stats is not None and stats.retired
+
+    def choose(self, count, exclude=()):
+        """Pick up to count proven queries to search again, by upper confidence bound of their yield"""
+        excluded = {query_key(query) for query in exclude}
+        reuse_before = time.time() - REUSE_AFTER_DAYS * 86400
+        with self._lock:
+            total_searches = sum(stats.searches for stats in self._stats.values())
+            candidates = [
+                (key, stats) for key, stats in self._stats.items()
+                if not stats.retired and stats.searches and stats.new_companies
+                and stats.last_searched < reuse_before and key not in excluded
+            ]
+        if not candidates or count <= 0:
+            return []
+
+        def upper_bound(stats):
+            return stats.reward() + UCB_EXPLORATION * math.sqrt(math.log(max(total_searches, 2)) / stats.searches)
+
+        candidates.sort(key=lambda item: -upper_bound(item[1]))
+        return [stats.query for _, stats in candidates[:count]]
+
+    def reuse_share(self, needed):
+        """Return how many of the needed queries may come from the store"""
+        return int(needed * (1 - EXPLORE_FRACTION))
+
+    def best_queries(self, count=MAX_EXAMPLE_QUERIES):
+        """Return the highest-yield queries, as examples for new variations"""
+        with self._lock:
+            ranked = sorted(
+                (stats for stats in self._stats.values() if stats.new_companies),
+                key=lambda stats: -stats.reward()
+            )
+        return [stats.query for stats in ranked[:count]]
+
+    def record_search(self, query, urls_found, new_urls):
+        """Count one search of a query, its LinkedIn URLs and the new companies among them"""
+        if not self.enabled:
+            return
+        key = query_key(query)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = QueryStats(query)
+            for counter, count in (('searches', 1), ('urls_found', urls_found), ('new_companies', len(new_urls))):
+                setattr(stats, counter, getattr(stats, counter) + count)
+                stats.changes[counter] += count
+                self._job_totals[counter] += count
+            self._job_queries.add(key)
+            stats.dry_streak = 0 if new_urls else stats.dry_streak + 1
+            if stats.dry_streak >= RETIRE_AFTER_DRY_SEARCHES and not stats.retired:
+                stats.retired = True
+                logger.info(f"Retiring search query '{stats.query}' after {stats.dry_streak} searches without new companies")
+            stats.last_searched = time.time()
+            for url in new_urls:
+                self._url_queries[url] = key
+
+    def record_stored(self, urls):
+        """Credit stored leads to the queries that found them"""
+        if not self.enabled:
+            return
+        with self._lock:
+            for url in urls:
+                stats = self._stats.get(self._url_queries.pop(url, None))
+                if stats is not None:
+                    stats.leads_stored += 1
+                    stats.changes['leads_stored'] += 1
+                    self._job_totals['leads_stored'] += 1
+
+    def summary(self):
+        """Return this job's searches, new companies and stored leads across its queries"""
+        with self._lock:
+            totals = dict(self._job_totals)
+            totals['queries'] = len(self._job_queries)
+        totals['new_companies_per_search'] = round(totals['new_companies'] / totals['searches'], 3) \
+            if totals['searches'] else 0.0
+        return totals
+
+    def flush(self):
+        """Add this job's counts to the stored rows of its queries"""
+        if not self.enabled:
+            return
+        with self._lock:
+            changed = {key: stats for key, stats in self._stats.items() if any(stats.changes.values())}
+        if not changed:
+            return
+        try:
+            # Re-read the rows so counts added by jobs running at the same time are kept
+            with timed('supabase', 'select_query_stats'):
+                response = self.supabase_client.table('search_query_stats') \
+                    .select('*') \
+                    .in_('query_key', list(changed)) \
+                    .execute()
+            current = {row['query_key']: row for row in response.data or []}
+            rows = []
+            for key, stats in changed.items():
+                row = current.get(key, {})
+                rows.append({
+                    'query_key': key,
+                    'query': stats.query,
+                    **{counter: (row.get(counter) or 0) + stats.changes[counter] for counter in STAT_COUNTERS},
+                    'dry_streak': stats.dry_streak,
+                    'retired': stats.retired,
+                    'last_searched_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(stats.last_searched)),
+                    'updated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ')
+                })
+            with timed('supabase', 'upsert_query_stats'):
+                self.supabase_client.table('search_query_stats').upsert(rows, on_conflict='query_key').execute()
+            with self._lock:
+                for stats in changed.values():
+                    stats.changes = dict.fromkeys(STAT_COUNTERS, 0)
+            logger.info(f"Saved search stats for {len(rows)} queries")
+        except Exception as e:
+            # The stats only steer later jobs; this one has its leads either way
+            logger.warning(f"Could not save search query stats: {str(e)}")
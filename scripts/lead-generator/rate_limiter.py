@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Provider Rate Limiting
+Shared token buckets for the external APIs used by the lead generator.
+Each provider gets one bucket per process, so every stage and every job
+running in the process draws from the same budget. Buckets slow down when a
+provider answers 429 (honouring Retry-After) and recover gradually as calls
+succeed again. Each attempt also holds one of the provider's slots from
+scheduler.py, which caps the calls in flight and shares them fairly between jobs,
+and goes through the provider's circuit breaker, retries and attempt deadline
+from resilience.py. Only the attempts themselves are timed as call latency;
+time spent waiting for the circuit, a token, a slot or a retry backoff is
+reported through its own counter.
+"""
+
+import os
+import threading
+import time
+import logging
+from metrics import (
+    record_backoff_wait, record_circuit_wait, record_error_retry, record_rate_limit_wait, record_retry, timed
+)
+from resilience import (
+    AttemptDeadlineExceeded, backoff_delay, call_with_deadline, get_circuit_breaker, get_max_retries, is_retryable
+)
+from scheduler import provider_slot
+
+logger = logging.getLogger('lead_generation')
+
+# Default limits per provider as (requests per second, burst size).
+# Override with --rate-limit provider=rate[:burst] or the
+# <PROVIDER>_RATE_LIMIT environment variable, e.g. JIGSAWSTACK_SCRAPE_RATE_LIMIT=2:4
+DEFAULT_RATE_LIMITS = {
+    'jigsawstack_search': (5.0, 10),
+    'jigsawstack_scrape': (2.0, 4),
+    'openai_chat': (8.0, 16)
+}
+
+# Provider name under which the attempts of each bucket are timed in the call latency metrics
+CALL_METRIC_PROVIDERS = {
+    'jigsawstack_search': 'jigsawstack',
+    'jigsawstack_scrape': 'jigsawstack',
+    'openai_chat': 'openai'
+}
+
+# Fraction of the configured rate recovered after each successful call
+RECOVERY_STEP = 0.1
+# Factor applied to the current rate when the provider answers 429
+BACKOFF_FACTOR = 0.5
+# The rate never drops below this fraction of the configured rate
+MIN_RATE_FRACTION = 0.05
+# Number of times a call is retried after being rate limited
+MAX_RATE_LIMIT_RETRIES = 3
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose refill rate adapts to 429 responses"""
+
+    def __init__(self, name, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError(f"Rate for '{name}' must be positive, got {rate}")
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1, rate))
+        self.current_rate = self.rate
+        self.min_rate = self.rate * MIN_RATE_FRACTION
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.current_rate)
+            self._last_refill = now
+
+    def acquire(self, tokens=1):
+        """Block until the requested number of tokens is available, then take them"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._blocked_until and self._tokens >= tokens:
+                    self._tokens -= tokens
+                    if waited > 1:
+                        logger.debug(f"Rate limiter '{self.name}' delayed call by {waited:.2f}s")
+                    return waited
+                wait = max(
+                    self._blocked_until - now,
+                    (tokens - self._tokens) / self.current_rate
+                )
+            time.sleep(wait)
+            waited += wait
+
+    def on_success(self):
+        """Gradually restore the rate after the provider accepted a call"""
+        with self._lock:
+            if self.current_rate < self.rate:
+                self.current_rate = min(self.rate, self.current_rate + self.rate * RECOVERY_STEP)
+
+    def on_rate_limited(self, retry_after=None):
+        """Slow down after a 429 and pause until Retry-After has passed"""
+        with self._lock:
+            now = time.monotonic()
+            self.current_rate = max(self.min_rate, self.current_rate * BACKOFF_FACTOR)
+            pause = retry_after if retry_after is not None else 1.0 / self.current_rate
+            self._blocked_until = max(self._blocked_until, now + pause)
+            # Tokens start accumulating again only once the pause is over
+            self._tokens = 0.0
+            self._last_refill = self._blocked_until
+        logger.warning(
+            f"Rate limited by '{self.name}', pausing {pause:.2f}s "
+            f"and reducing rate to {self.current_rate:.2f}/s"
+        )
+
+
+_buckets = {}
+_limits = dict(DEFAULT_RATE_LIMITS)
+_registry_lock = threading.Lock()
+
+
+def parse_rate_limit(value):
+    """Parse a 'rate[:burst]' string into a (rate, burst) tuple"""
+    rate, _, burst = str(value).partition(':')
+    return float(rate), (int(burst) if burst else None)
+
+
+def configure_rate_limits(overrides=None):
+    """Apply rate limits from the environment and 'provider=rate[:burst]' overrides"""
+    with _registry_lock:
+        for provider in DEFAULT_RATE_LIMITS:
+            env_value = os.environ.get(f"{provider.upper()}_RATE_LIMIT")
+            if env_value:
+                _limits[provider] = parse_rate_limit(env_value)
+
+        for override in overrides or []:
+            provider, _, value = override.partition('=')
+            if not value:
+                raise ValueError(f"Invalid rate limit '{override}', expected provider=rate[:burst]")
+            _limits[provider.strip()] = parse_rate_limit(value)
+
+        # Rebuild buckets so the new limits take effect
+        _buckets.clear()
+
+    for provider, (rate, burst) in sorted(_limits.items()):
+        logger.info(f"Rate limit for {provider}: {rate}/s (burst {burst or max(1, int(rate))})")
+
+
+def get_rate_limiter(provider):
+    """Return the shared token bucket for a provider"""
+    with _registry_lock:
+        bucket = _buckets.get(provider)
+        if bucket is None:
+            rate, burst = _limits.get(provider, (1.0, None))
+            bucket = TokenBucket(provider, rate, burst)
+            _buckets[provider] = bucket
+        return bucket
+
+
+def get_status_code(error):
+    """Extract the HTTP status code from an API client exception, if any"""
+    for attr in ('status_code', 'code', 'status'):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+        if isinstance(value, str) and value.isdigit():
+            return int(value)
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def get_retry_after(error):
+    """Extract the Retry-After delay in seconds from an API client exception, if any"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        value = headers.get('retry-after')
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def rate_limited_call(provider, operation, func, *args, **kwargs):
+    """Call func once the provider's bucket allows it
+
+    429 responses are retried after the bucket's pause, server errors, timeouts
+    and dropped connections after a jittered backoff, and calls wait while the
+    provider's circuit is open. Each attempt is timed as operation.
+    """
+    metric_provider = CALL_METRIC_PROVIDERS.get(provider, provider)
+    bucket = get_rate_limiter(provider)
+    breaker = get_circuit_breaker(provider)
+    rate_limited_attempts = 0
+    error_retries = 0
+    while True:
+        record_circuit_wait(provider, breaker.wait_until_closed())
+        # A retry queues for a new slot, so other jobs are served while this one backs off
+        with provider_slot(provider) as slot:
+            record_rate_limit_wait(provider, bucket.acquire())
+            try:
+                with timed(metric_provider, operation):
+                    result = call_with_deadline(provider, func, *args, **kwargs)
+            except AttemptDeadlineExceeded as e:
+                # The abandoned request still counts against the provider until it ends
+                if e.future is not None:
+                    slot.release_when_done(e.future)
+                error = e
+            except Exception as e:
+                error = e
+            else:
+                error = None
+        
+        if error is None:
+            breaker.record_success()
+            bucket.on_success()
+            return result
+        
+        status_code = get_status_code(error)
+        if status_code == 429:
+            # The provider is up, just busy
+            breaker.record_success()
+            if rate_limited_attempts >= MAX_RATE_LIMIT_RETRIES:
+                raise error
+            rate_limited_attempts += 1
+            record_retry(provider)
+            bucket.on_rate_limited(get_retry_after(error))
+            continue
+        
+        if not is_retryable(error, status_code):
+            # A client error such as a bad request still means the provider answered
+            breaker.record_success()
+            raise error
+        
+        breaker.record_failure()
+        if error_retries >= get_max_retries():
+            raise error
+        delay = backoff_delay(error_retries)
+        error_retries += 1
+        record_error_retry(provider)
+        logger.warning(
+            f"Call to '{provider}' failed ({str(error)[:100]}), retry {error_retries} in {delay:.2f}s"
+        )
+        time.sleep(delay)
+        record_backoff_wait(provider, delay)
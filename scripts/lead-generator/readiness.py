@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Local AI Readiness Rules
+Keyword classifier for the four AI readiness categories, run before any
+OpenAI call. Each phrase carries a weight per category, with specific
+phrases ("custom AI models", "computer vision") weighing more than common
+ones ("software", "cloud"), and repeated phrases count with diminishing
+returns, much like TF-IDF. A lead is settled locally only when one category
+clearly dominates, or when a substantial About text of a non-tech company
+has no technology terms at all; everything else is left to the LLM. Generic
+technology terms (cloud, software, automation) only add evidence: a lead is
+never settled above AI Unaware unless its text mentions AI or machine
+learning itself, since the LLM treats a company with no AI usage as Unaware.
+
+Run this module to measure how often the rules settle a lead and how well
+they agree with the LLM on a labeled sample:
+
+    python readiness.py --sample labeled.jsonl
+    python readiness.py --from-supabase 500 --relabel
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import logging
+
+logger = logging.getLogger('lead_generation')
+
+# Valid AI readiness categories, least to most mature, shared with the lead generator
+AI_READINESS_CATEGORIES = ["AI Unaware", "AI Aware", "AI Ready", "AI Competent"]
+
+# Share of the evidence the leading category needs before a lead is settled locally
+DEFAULT_MIN_CONFIDENCE = 0.7
+# Least evidence for the leading category before a lead is settled locally
+MIN_EVIDENCE = 2.5
+# Shortest About text that can show a company is AI Unaware by having no technology terms
+UNAWARE_MIN_ABOUT_CHARS = 100
+# Industries whose companies are never assumed AI Unaware, however plain their About text
+TECH_INDUSTRY_PATTERN = re.compile(
+    r'software|information technology|\bit\b|internet|computer|artificial intelligence|data|telecom',
+    re.IGNORECASE
+)
+
+# Phrase pattern -> weight of the evidence it gives each category
+READINESS_TERMS = [
+    # Building AI
+    (r'\b(?:develop|develops|developing|build|builds|building|design|designs|train|trains)\b[^.]{0,40}?'
+     r'\b(?:ai|artificial intelligence|machine learning|deep learning)\b', {'AI Competent': 3.0}),
+    (r'\bcustom (?:ai|machine learning|ml)\b', {'AI Competent': 3.0}),
+    (r'\b(?:ai|ml|machine learning|deep learning) (?:models?|platforms?|solutions|products?|engines?|research)\b',
+     {'AI Competent': 2.5, 'AI Ready': 0.5}),
+    (r'\b(?:ai|ml|machine learning) (?:engineers?|researchers?|scientists?)\b', {'AI Competent': 2.5}),
+    (r'\b(?:deep learning|neural networks?|computer vision|natural language processing|nlp)\b', {'AI Competent': 2.0}),
+    (r'\b(?:large language models?|llms?|generative ai|gen ai)\b', {'AI Competent': 2.0, 'AI Ready': 0.5}),
+    (r'\bdata scien(?:ce|tists?)\b', {'AI Competent': 1.5, 'AI Ready': 0.5}),
+    # Using AI and data in the business
+    (r'\b(?:use|uses|using|leverage|leverages|leveraging|powered by|apply|applies|applying|adopted)\b[^.]{0,30}?'
+     r'\b(?:ai|artificial intelligence|machine learning)\b', {'AI Ready': 2.5}),
+    (r'\bai[- ](?:powered|driven|enabled|based)\b', {'AI Ready': 2.0, 'AI Competent': 0.5}),
+    (r'\bmachine learning\b', {'AI Ready': 1.0, 'AI Competent': 1.0}),
+    (r'\b(?:predictive analytics|data analytics|big data|business intelligence|data platform)\b', {'AI Ready': 1.5}),
+    (r'\b(?:automation|automate|automates|automated|automating|rpa)\b', {'AI Ready': 1.0}),
+    (r'\b(?:cloud|saas|software[- ]as[- ]a[- ]service|apis?|iot|internet of things)\b', {'AI Ready': 1.0}),
+    (r'\bdigital transformation\b', {'AI Ready': 1.0, 'AI Aware': 0.5}),
+    # Knowing about AI
+    (r'\b(?:ai|artificial intelligence)\b', {'AI Aware': 1.5}),
+    (r'\bchatbots?\b', {'AI Aware': 1.5, 'AI Ready': 0.5}),
+    (r'\b(?:exploring|explore|interested in|learning about|looking to adopt)\b[^.]{0,30}?'
+     r'\b(?:ai|artificial intelligence|automation)\b', {'AI Aware': 2.0}),
+    (r'\b(?:digitis\w*|digitiz\w*|e-?commerce|online platform|mobile apps?)\b', {'AI Aware': 0.5, 'AI Ready': 0.5}),
+    (r'\b(?:software|technology|tech|digital)\b', {'AI Aware': 0.5, 'AI Ready': 0.5})
+]
+# Terms that show a company deals with AI itself, required to settle a lead above AI Unaware
+AI_EVIDENCE_PATTERN = re.compile(
+    r'\b(?:ai|artificial intelligence|machine learning|ml|deep learning|neural networks?|computer vision'
+    r'|natural language processing|nlp|large language models?|llms?|generative ai|gen ai|chatbots?'
+    r'|data scien(?:ce|tists?)|predictive analytics)\b',
+    re.IGNORECASE
+)
+_COMPILED_TERMS = [(re.compile(pattern, re.IGNORECASE), weights) for pattern, weights in READINESS_TERMS]
+
+
+def score_readiness(about_text, industry=''):
+    """Return the keyword evidence for each AI readiness category"""
+    text = f"{about_text or ''} {industry or ''}"
+    scores = dict.fromkeys(AI_READINESS_CATEGORIES, 0.0)
+    for pattern, weights in _COMPILED_TERMS:
+        matches = len(pattern.findall(text))
+        if not matches:
+            continue
+        # Repeating a phrase adds less evidence each time
+        frequency = 1 + math.log(matches)
+        for category, weight in weights.items():
+            scores[category] += weight * frequency
+    return scores
+
+
+class ReadinessRules:
+    """Settles clear-cut leads locally and defers ambiguous ones to the LLM"""
+
+    def __init__(self, min_confidence=DEFAULT_MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+
+    def classify(self, about_text, industry=''):
+        """Return (category, confidence), with category None when the lead needs the LLM"""
+        about_text = '' if about_text in (None, '-') else str(about_text)
+        scores = score_readiness(about_text, industry)
+        total = sum(scores.values())
+        if not total:
+            # Plenty of text and not one technology term
+            if len(about_text.strip()) >= UNAWARE_MIN_ABOUT_CHARS and not TECH_INDUSTRY_PATTERN.search(industry or ''):
+                return 'AI Unaware', 1.0
+            return None, 0.0
+        category = max(AI_READINESS_CATEGORIES, key=lambda name: scores[name])
+        confidence = scores[category] / total
+        if scores[category] < MIN_EVIDENCE or confidence < self.min_confidence:
+            return None, confidence
+        if category != 'AI Unaware' and not AI_EVIDENCE_PATTERN.search(f"{about_text} {industry or ''}"):
+            # Only generic technology terms; whether the company uses AI is for the LLM to judge
+            return None, confidence
+        return category, confidence
+
+
+# Rules used by the lead generator, or None when the LLM classifies every lead
+_rules = ReadinessRules()
+
+
+def configure_local_classifier(enabled=True, min_confidence=DEFAULT_MIN_CONFIDENCE):
+    """Enable the local classifier with the given confidence, or disable it"""
+    global _rules
+    _rules = ReadinessRules(min_confidence) if enabled else None
+    if enabled:
+        logger.info(f"Local AI readiness classifier settles leads at confidence {min_confidence}")
+    else:
+        logger.info("Local AI readiness classifier disabled, every lead is classified by the LLM")
+    return _rules
+
+
+def get_local_classifier():
+    """Return the local classifier, or None when it is disabled"""
+    return _rules
+
+
+def evaluate(samples, min_confidence=DEFAULT_MIN_CONFIDENCE):
+    """Compare the local rules with the LLM labels of samples ({'about', 'industry', 'ai_readiness'})"""
+    rules = ReadinessRules(min_confidence)
+    confusion = {label: dict.fromkeys(AI_READINESS_CATEGORIES, 0) for label in AI_READINESS_CATEGORIES}
+    labeled = settled = agreed = 0
+    for sample in samples:
+        label = sample.get('ai_readiness')
+        if label not in AI_READINESS_CATEGORIES:
+            continue
+        labeled += 1
+        category, _ = rules.classify(sample.get('about'), sample.get('industry'))
+        if category is None:
+            continue
+        settled += 1
+        agreed += category == label
+        confusion[label][category] += 1
+    return {
+        'min_confidence': min_confidence,
+        'samples': labeled,
+        'settled': settled,
+        'deferred': labeled - settled,
+        'coverage': round(settled / labeled, 3) if labeled else 0.0,
+        'agreement': round(agreed / settled, 3) if settled else 0.0,
+        # LLM label -> local category, for the leads settled locally
+        'confusion': confusion
+    }
+
+
+def load_sample_file(path):
+    """Read labeled leads from a JSON array or JSON lines file"""
+    with open(path) as sample_file:
+        content = sample_file.read().strip()
+    if content.startswith('['):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def load_supabase_sample(limit):
+    """Fetch classified leads from the Supabase leads table"""
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    load_dotenv()
+    supabase_client = create_client(os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_SERVICE_KEY"))
+    response = supabase_client.table('leads') \
+        .select('about,industry,ai_readiness') \
+        .not_.is_('ai_readiness', 'null') \
+        .order('created_at', desc=True) \
+        .limit(limit) \
+        .execute()
+    return response.data or []
+
+
+def relabel_with_llm(samples):
+    """Replace the labels of samples with fresh answers from the LLM prompt"""
+    import lead_generator
+
+    _, openai_client, _ = lead_generator.initialize_clients()
+    for sample in samples:
+        sample['ai_readiness'] = lead_generator.analyze_ai_readiness(
+            openai_client, sample.get('about', ''), sample.get('industry', ''), use_local=False
+        )
+    return samples
+
+
+def print_report(report):
+    print(f"confidence {report['min_confidence']:.2f}: settled {report['settled']} of {report['samples']} "
+          f"({report['coverage']:.1%}), agreement with the LLM {report['agreement']:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the local AI readiness classifier against LLM labels')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--sample', help='JSON or JSON lines file of leads with about, industry and ai_readiness')
+    source.add_argument('--from-supabase', type=int, metavar='N', help='Use the N most recent classified leads')
+    parser.add_argument('--relabel', action='store_true',
+                        help='Label the sample with fresh LLM calls; stored leads may have been settled by these rules')
+    parser.add_argument('--thresholds', default='0.5,0.6,0.7,0.8,0.9',
+                        help='Comma-separated confidence thresholds to compare (default: 0.5,0.6,0.7,0.8,0.9)')
+    parser.add_argument('--output', help='Write the reports as JSON to this file')
+    args = parser.parse_args()
+
+    samples = load_sample_file(args.sample) if args.sample else load_supabase_sample(args.from_supabase)
+    if args.relabel:
+        samples = relabel_with_llm(samples)
+
+    reports = []
+    for threshold in [float(value) for value in args.thresholds.split(',') if value.strip()]:
+        report = evaluate(samples, threshold)
+        print_report(report)
+        reports.append(report)
+
+    default_report = evaluate(samples)
+    print(f"\nAt the default confidence {DEFAULT_MIN_CONFIDENCE}, LLM label -> local category:")
+    for label, row in default_report['confusion'].items():
+        print(f"  {label:<13} " + '  '.join(f"{category}: {count}" for category, count in row.items()))
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(reports, output_file, indent=2)
+        print(f"Reports written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
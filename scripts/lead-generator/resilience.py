@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Call Resilience
+Retries, circuit breakers and deadlines for the external API calls made
+through rate_limiter.rate_limited_call. Server errors, timeouts and dropped
+connections are retried with jittered exponential backoff. Each provider has
+a circuit breaker that opens after consecutive failures and makes further
+calls wait, which pauses the stages using that provider instead of letting
+every item fail. One probe call then checks whether the provider is back. If
+it stays down longer than the breaker's maximum wait, calls raise
+ProviderUnavailableError and the job stops, to be resumed from its journal.
+Each attempt also has a deadline, so one hung request cannot hold a stage
+worker indefinitely. The request itself cannot be interrupted, so an
+abandoned attempt keeps its provider slot until it finishes or hits its
+httpx timeout, and the calls in flight never exceed the provider's limit.
+"""
+
+import contextvars
+import random
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger('lead_generation')
+
+# HTTP status codes worth another attempt; 429 is handled by the rate limiter
+RETRYABLE_STATUS_CODES = {408, 425, 500, 502, 503, 504}
+# Exception classes, matched by name anywhere in the exception's class hierarchy, that mean the
+# request never got a proper answer (httpx, requests, openai and built-in network errors)
+RETRYABLE_ERROR_NAMES = {
+    'TimeoutException', 'NetworkError', 'RemoteProtocolError', 'APIConnectionError',
+    'ConnectionError', 'Timeout', 'TimeoutError'
+}
+# Retries after a retryable error, on top of the first attempt
+DEFAULT_MAX_RETRIES = 4
+# Backoff before retry n is drawn uniformly from 0 to min(BACKOFF_MAX, BACKOFF_BASE * 2 ** n) seconds
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 20.0
+
+# Consecutive failed calls that open a provider's circuit
+BREAKER_FAILURE_THRESHOLD = 5
+# Seconds an open circuit waits before a probe call, doubled after each failed probe
+BREAKER_COOLDOWN = 5.0
+BREAKER_MAX_COOLDOWN = 60.0
+# Most seconds a call waits for an open circuit before giving up on the provider
+BREAKER_MAX_WAIT = 300.0
+
+# Seconds one attempt may take in total, per provider
+DEFAULT_ATTEMPT_DEADLINES = {
+    'jigsawstack_search': 45.0,
+    'jigsawstack_scrape': 120.0,
+    'openai_chat': 90.0
+}
+# Most attempts running at once under a deadline; abandoned attempts finish in the background
+DEADLINE_WORKERS = 64
+
+
+class ProviderUnavailableError(Exception):
+    """A provider's circuit stayed open for longer than the breaker waits"""
+
+
+class AttemptDeadlineExceeded(TimeoutError):
+    """An attempt took longer than its provider's deadline; future is the attempt still running"""
+
+    def __init__(self, message, future=None):
+        super().__init__(message)
+        self.future = future
+
+
+def is_retryable(error, status_code=None):
+    """Return True if a failed call may succeed when tried again"""
+    if status_code in RETRYABLE_STATUS_CODES:
+        return True
+    if status_code is not None:
+        return False
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def backoff_delay(retry):
+    """Return a jittered delay in seconds before the given retry, counting from 0"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** retry))
+
+
+class CircuitBreaker:
+    """Closed, open or half-open state of one provider, shared by every job in the process"""
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN,
+                 max_wait=BREAKER_MAX_WAIT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_wait = max_wait
+        self.state = 'closed'
+        self.trips = 0
+        self._failures = 0
+        self._opened_until = 0.0
+        self._lock = threading.Lock()
+
+    def wait_until_closed(self):
+        """Block while the circuit is open, returning the seconds waited
+
+        Once the cooldown has passed, one caller is let through as a probe and
+        the others keep waiting for its outcome.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if self.state == 'closed':
+                    return waited
+                if self.state == 'open' and now >= self._opened_until:
+                    self.state = 'half_open'
+                    logger.info(f"Circuit for '{self.name}' half open, probing the provider")
+                    return waited
+                pause = max(self._opened_until - now, 0.1)
+            if waited >= self.max_wait:
+                raise ProviderUnavailableError(
+                    f"'{self.name}' has been failing for more than {self.max_wait:.0f}s, giving up"
+                )
+            pause = min(pause, self.max_wait - waited + 0.01)
+            time.sleep(pause)
+            waited += pause
+
+    def record_success(self):
+        """The provider answered, so close the circuit"""
+        with self._lock:
+            self._failures = 0
+            if self.state != 'closed':
+                logger.info(f"Circuit for '{self.name}' closed, the provider is answering again")
+                self.state = 'closed'
+                self.cooldown = self.base_cooldown
+
+    def record_failure(self):
+        """Count a failed call, opening the circuit after too many in a row or a failed probe"""
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open':
+                self.cooldown = min(BREAKER_MAX_COOLDOWN, self.cooldown * 2)
+            elif self.state == 'closed' and self._failures >= self.failure_threshold:
+                self.trips += 1
+            else:
+                return
+            self.state = 'open'
+            self._opened_until = time.monotonic() + self.cooldown
+        logger.warning(
+            f"Circuit for '{self.name}' open after {self._failures} failed calls, pausing its calls for {self.cooldown:.1f}s"
+        )
+
+
+_breakers = {}
+_deadlines = dict(DEFAULT_ATTEMPT_DEADLINES)
+_max_retries = DEFAULT_MAX_RETRIES
+_breaker_max_wait = BREAKER_MAX_WAIT
+_registry_lock = threading.Lock()
+_deadline_executor = None
+
+
+def configure_resilience(max_retries=None, deadlines=None, breaker_max_wait=None):
+    """Apply the retry count, 'provider=seconds' attempt deadline overrides and open circuit wait"""
+    global _max_retries, _breaker_max_wait
+    with _registry_lock:
+        if max_retries is not None:
+            if max_retries < 0:
+                raise ValueError(f"Retries must not be negative, got {max_retries}")
+            _max_retries = int(max_retries)
+        for override in deadlines or []:
+            provider, _, value = override.partition('=')
+            if not value:
+                raise ValueError(f"Invalid call deadline '{override}', expected provider=seconds")
+            # 0 turns the deadline off
+            _deadlines[provider.strip()] = float(value)
+        if breaker_max_wait is not None:
+            _breaker_max_wait = float(breaker_max_wait)
+        # Start with closed circuits
+        _breakers.clear()
+    logger.info(f"Retrying failed calls up to {_max_retries} times, attempt deadlines: {_deadlines}")
+
+
+def get_max_retries():
+    return _max_retries
+
+
+def get_circuit_breaker(provider):
+    """Return the shared circuit breaker for a provider"""
+    with _registry_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = CircuitBreaker(provider, max_wait=_breaker_max_wait)
+            _breakers[provider] = breaker
+        return breaker
+
+
+def call_with_deadline(provider, func, *args, **kwargs):
+    """Call func, raising AttemptDeadlineExceeded if it runs past the provider's deadline"""
+    global _deadline_executor
+    deadline = _deadlines.get(provider)
+    if not deadline:
+        return func(*args, **kwargs)
+    with _registry_lock:
+        if _deadline_executor is None:
+            _deadline_executor = ThreadPoolExecutor(max_workers=DEADLINE_WORKERS, thread_name_prefix='api-call')
+    future = _deadline_executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+    try:
+        return future.result(timeout=deadline)
+    except FutureTimeoutError:
+        # The request cannot be interrupted; it finishes or times out on its own in the background
+        future.cancel()
+        raise AttemptDeadlineExceeded(f"'{provider}' call exceeded its {deadline:g}s deadline", future) from None
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Provider Scheduler
+Global concurrency budget per provider, shared by every job running in the
+process. A call waits for one of the provider's slots, and waiting calls are
+served one job at a time in turn, so a large job cannot starve the others.
+Interactive jobs, such as analyze-only runs and small lead counts, are served
+before batch jobs. Together with the token buckets in rate_limiter.py this
+keeps the total load on each provider within its limits however many jobs
+run at once.
+"""
+
+import contextlib
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+
+from metrics import record_queue_wait
+
+logger = logging.getLogger('lead_generation')
+
+# Default number of calls in flight per provider across all jobs.
+# Override with --provider-concurrency provider=N or the
+# <PROVIDER>_CONCURRENCY environment variable, e.g. JIGSAWSTACK_SCRAPE_CONCURRENCY=2
+DEFAULT_PROVIDER_CONCURRENCY = {
+    'jigsawstack_search': 4,
+    'jigsawstack_scrape': 4,
+    'openai_chat': 8
+}
+
+# Priority classes; lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+# Jobs asking for at most this many leads are treated as interactive
+INTERACTIVE_MAX_COUNT = 5
+
+
+def job_priority(analyze_only, count):
+    """Return the priority class of a job from its parameters"""
+    return PRIORITY_INTERACTIVE if analyze_only or count <= INTERACTIVE_MAX_COUNT else PRIORITY_BATCH
+
+
+class FairScheduler:
+    """Slots for one provider, handed to waiting jobs round-robin, highest priority first"""
+
+    def __init__(self, name, limit):
+        if limit < 1:
+            raise ValueError(f"Concurrency for '{name}' must be at least 1, got {limit}")
+        self.name = name
+        self.limit = int(limit)
+        self.in_flight = 0
+        # priority -> OrderedDict of job_id -> deque of waiting calls; the first job is served next
+        self._waiting = {}
+        self._lock = threading.Lock()
+
+    def _has_waiters(self):
+        return any(self._waiting.values())
+
+    def acquire(self, job_id=None, priority=PRIORITY_BATCH):
+        """Block until a slot is free, returning the seconds spent waiting"""
+        with self._lock:
+            if self.in_flight < self.limit and not self._has_waiters():
+                self.in_flight += 1
+                return 0.0
+            waiter = threading.Event()
+            jobs = self._waiting.setdefault(priority, OrderedDict())
+            jobs.setdefault(job_id, deque()).append(waiter)
+        started = time.monotonic()
+        waiter.wait()
+        return time.monotonic() - started
+
+    def release(self):
+        """Hand the slot to the next waiting call, or give it back"""
+        with self._lock:
+            waiter = self._next_waiter()
+            if waiter is None:
+                self.in_flight -= 1
+            else:
+                # The slot passes straight to the waiter, so in_flight is unchanged
+                waiter.set()
+
+    def _next_waiter(self):
+        for priority in sorted(self._waiting):
+            jobs = self._waiting[priority]
+            if not jobs:
+                continue
+            job_id, waiters = next(iter(jobs.items()))
+            waiter = waiters.popleft()
+            # Move the job to the back of the line so the other jobs get the next slots
+            del jobs[job_id]
+            if waiters:
+                jobs[job_id] = waiters
+            return waiter
+        return None
+
+    def waiting(self):
+        with self._lock:
+            return sum(len(waiters) for jobs in self._waiting.values() for waiters in jobs.values())
+
+
+_schedulers = {}
+_limits = dict(DEFAULT_PROVIDER_CONCURRENCY)
+_registry_lock = threading.Lock()
+
+
+def configure_scheduler(overrides=None):
+    """Apply provider concurrency from the environment and 'provider=N' overrides"""
+    with _registry_lock:
+        for provider in DEFAULT_PROVIDER_CONCURRENCY:
+            env_value = os.environ.get(f"{provider.upper()}_CONCURRENCY")
+            if env_value:
+                _limits[provider] = int(env_value)
+
+        for override in overrides or []:
+            provider, _, value = override.partition('=')
+            if not value:
+                raise ValueError(f"Invalid provider concurrency '{override}', expected provider=N")
+            _limits[provider.strip()] = int(value)
+
+        # Rebuild schedulers so the new limits take effect
+        _schedulers.clear()
+
+    for provider, limit in sorted(_limits.items()):
+        logger.info(f"Concurrency for {provider}: {limit} calls in flight")
+
+
+def get_provider_concurrency(provider):
+    """Return the most calls in flight allowed for a provider"""
+    with _registry_lock:
+        return _limits.get(provider, max(DEFAULT_PROVIDER_CONCURRENCY.values()))
+
+
+def get_scheduler(provider):
+    """Return the shared scheduler for a provider"""
+    with _registry_lock:
+        scheduler = _schedulers.get(provider)
+        if scheduler is None:
+            scheduler = FairScheduler(provider, _limits.get(provider, max(DEFAULT_PROVIDER_CONCURRENCY.values())))
+            _schedulers[provider] = scheduler
+        return scheduler
+
+
+# (job_id, priority) of the job running in the current context
+_job_schedule = ContextVar('job_schedule', default=(None, PRIORITY_BATCH))
+
+
+@contextlib.contextmanager
+def job_schedule(job_id, priority=PRIORITY_BATCH):
+    """Attribute the provider calls made inside the block to a job and its priority"""
+    token = _job_schedule.set((job_id, priority))
+    try:
+        yield
+    finally:
+        _job_schedule.reset(token)
+
+
+class SlotLease:
+    """One held provider slot, released at the end of its block unless handed to a call still running"""
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.handed_over = False
+
+    def release_when_done(self, future):
+        """Keep the slot until a call abandoned in the background finishes"""
+        self.handed_over = True
+        future.add_done_callback(lambda _: self.scheduler.release())
+
+
+@contextlib.contextmanager
+def provider_slot(provider):
+    """Hold one of the provider's slots for the duration of the block, yielding its SlotLease"""
+    scheduler = get_scheduler(provider)
+    job_id, priority = _job_schedule.get()
+    record_queue_wait(provider, scheduler.acquire(job_id, priority))
+    lease = SlotLease(scheduler)
+    try:
+        yield lease
+    finally:
+        if not lease.handed_over:
+            scheduler.release()
@@ -4,6 +4,9 @@ const cors = require('cors');
 const { v4: uuidv4 } = require('uuid');
 const path = require('path');
 const fs = require('fs');
+const readline = require('readline');
+const { createClient } = require('@supabase/supabase-js');
+require('dotenv').config();
 
 const app = express();
 app.use(cors({
@@ -19,12 +22,122 @@ if (!fs.existsSync(logsDir)) {
   fs.mkdirSync(logsDir);
 }
 
+// In worker mode one resident Python worker processes jobs queued in Supabase,
+// instead of a new Python process being spawned for every request
+const workerMode = process.env.LEAD_WORKER_MODE === 'true';
+const workerMaxJobs = process.env.LEAD_WORKER_MAX_JOBS || '3';
+const workerInteractiveJobs = process.env.LEAD_WORKER_INTERACTIVE_JOBS || '2';
+// How often and for how long analyze-leads waits for the worker's result
+const ANALYSIS_POLL_INTERVAL_MS = 250;
+const ANALYSIS_TIMEOUT_MS = 120000;
+// Delay before a worker that exited is started again
+const WORKER_RESTART_DELAY_MS = 2000;
+// How long the last progress of a spawned job is kept after its process exits
+const PROGRESS_RETENTION_MS = 10 * 60 * 1000;
+
+// Latest progress counters of spawned jobs, from their 'progress' events
+const jobProgress = new Map();
+
+const supabase = workerMode
+  ? createClient(process.env.SUPABASE_URL, process.env.SUPABASE_SERVICE_KEY)
+  : null;
+
+// Start the resident worker and restart it if it exits
+function startWorker() {
+  const logStream = fs.createWriteStream(path.join(logsDir, 'worker.log'), { flags: 'a' });
+  const workerProcess = spawn('python', [
+    path.join(__dirname, 'lead_generator.py'),
+    '--worker',
+    '--max-jobs', workerMaxJobs,
+    '--interactive-jobs', workerInteractiveJobs,
+    '--verbose'
+  ]);
+  console.log(`Started lead generator worker (pid ${workerProcess.pid})`);
+
+  workerProcess.stdout.on('data', (data) => {
+    logStream.write(`[STDOUT] ${data.toString()}`);
+  });
+
+  workerProcess.stderr.on('data', (data) => {
+    logStream.write(`[STDERR] ${data.toString()}`);
+  });
+
+  workerProcess.on('close', (code) => {
+    console.error(`Lead generator worker exited with code ${code}, restarting`);
+    logStream.write(`[INFO] Worker exited with code ${code}\n`);
+    logStream.end();
+    setTimeout(startWorker, WORKER_RESTART_DELAY_MS);
+  });
+}
+
+// Queue a job for the worker
+async function queueJob(jobId, params) {
+  const { error } = await supabase
+    .from('lead_generation_jobs')
+    .insert({
+      job_id: jobId,
+      status: 'queued',
+      message: 'Lead generation job queued',
+      params
+    });
+  if (error) {
+    throw new Error(error.message);
+  }
+}
+
+// Read a job row from Supabase
+async function getJob(jobId) {
+  const { data, error } = await supabase
+    .from('lead_generation_jobs')
+    .select('job_id, status, message, result, progress')
+    .eq('job_id', jobId)
+    .maybeSingle();
+  if (error) {
+    throw new Error(error.message);
+  }
+  return data;
+}
+
+// Wait until a job has finished and return its row
+async function waitForJob(jobId, timeoutMs) {
+  const deadline = Date.now() + timeoutMs;
+  while (Date.now() < deadline) {
+    const job = await getJob(jobId);
+    if (job && (job.status === 'complete' || job.status === 'error')) {
+      return job;
+    }
+    await new Promise((resolve) => setTimeout(resolve, ANALYSIS_POLL_INTERVAL_MS));
+  }
+  return null;
+}
+
+if (workerMode) {
+  startWorker();
+}
+
 // Endpoint to analyze existing leads
 app.get('/api/analyze-leads', async (req, res) => {
   try {
     const jobId = `analyze-${uuidv4()}`;
     console.log(`Starting lead analysis job ${jobId}`);
     
+    if (workerMode) {
+      await queueJob(jobId, { count: 0, analyze_only: true });
+      const job = await waitForJob(jobId, ANALYSIS_TIMEOUT_MS);
+      if (job && job.status === 'complete' && job.result && job.result.search_params) {
+        res.json({ 
+          success: true, 
+          results: job.result.search_params
+        });
+      } else {
+        res.json({ 
+          success: false, 
+          message: job ? job.message : 'Timed out waiting for analysis results'
+        });
+      }
+      return;
+    }
+    
     // Create log file for this job
     const logFile = path.join(logsDir, `${jobId}.log`);
     const logStream = fs.createWriteStream(logFile, { flags: 'a' });
@@ -34,17 +147,26 @@ app.get('/api/analyze-leads', async (req, res) => {
       path.join(__dirname, 'lead_generator.py'),
       '--job-id', jobId,
       '--count', '0',  // No leads to generate, just analyze
-      '--analyze-only', 'true'
+      '--analyze-only',
+      '--events', 'ndjson'
     ]);
     
-    let output = '';
-    
-    // Log output for debugging
-    pythonProcess.stdout.on('data', (data) => {
-      const dataStr = data.toString();
-      output += dataStr;
-      console.log(`[${jobId}] stdout: ${dataStr}`);
-      logStream.write(`[STDOUT] ${dataStr}\n`);
+    // The script writes one JSON event per line to stdout; keep the analysis and the final result
+    let searchParams = null;
+    let result = null;
+    const events = readline.createInterface({ input: pythonProcess.stdout });
+    events.on('line', (line) => {
+      logStream.write(`[EVENT] ${line}\n`);
+      try {
+        const event = JSON.parse(line);
+        if (event.event === 'search_params') {
+          searchParams = event.search_params;
+        } else if (event.event === 'result') {
+          result = event;
+        }
+      } catch (error) {
+        console.log(`[${jobId}] stdout: ${line}`);
+      }
     });
     
     pythonProcess.stderr.on('data', (data) => {
@@ -63,25 +185,15 @@ app.get('/api/analyze-leads', async (req, res) => {
       });
     });
     
-    // Try to extract analysis results from output
-    try {
-      const analysisMatch = output.match(/Search parameters: ({.*})/);
-      if (analysisMatch && analysisMatch[1]) {
-        const analysisResults = JSON.parse(analysisMatch[1]);
-        res.json({ 
-          success: true, 
-          results: analysisResults
-        });
-      } else {
-        res.json({ 
-          success: false, 
-          message: 'Could not extract analysis results'
-        });
-      }
-    } catch (error) {
+    if (searchParams) {
+      res.json({ 
+        success: true, 
+        results: searchParams
+      });
+    } else {
       res.json({ 
         success: false, 
-        message: `Error parsing analysis results: ${error.message}`
+        message: result ? result.message : 'Could not extract analysis results'
       });
     }
   } catch (error) {
@@ -94,12 +206,30 @@ app.get('/api/analyze-leads', async (req, res) => {
 });
 
 // Endpoint to generate leads
-app.post('/api/generate-leads', (req, res) => {
+app.post('/api/generate-leads', async (req, res) => {
   const { count = 5, targetProfile = {} } = req.body;
   const jobId = uuidv4();
   
   console.log(`Starting lead generation job ${jobId} with count ${count}`);
   
+  if (workerMode) {
+    try {
+      await queueJob(jobId, { count, target_profile: targetProfile });
+      res.json({ 
+        success: true, 
+        jobId,
+        message: 'Lead generation job queued'
+      });
+    } catch (error) {
+      console.error(`Error queueing job ${jobId}:`, error);
+      res.status(500).json({ 
+        success: false, 
+        message: `Error queueing lead generation job: ${error.message}` 
+      });
+    }
+    return;
+  }
+  
   // Create log file for this job
   const logFile = path.join(logsDir, `${jobId}.log`);
   const logStream = fs.createWriteStream(logFile, { flags: 'a' });
@@ -113,14 +243,23 @@ app.post('/api/generate-leads', (req, res) => {
     '--job-id', jobId,
     '--count', count.toString(),
     '--target-profile', targetProfileJson,
-    '--verbose'
+    '--verbose',
+    '--events', 'ndjson'
   ]);
   
-  // Log output for debugging
-  pythonProcess.stdout.on('data', (data) => {
-    const output = data.toString();
-    console.log(`[${jobId}] stdout: ${output}`);
-    logStream.write(`[STDOUT] ${output}\n`);
+  // The script writes one JSON event per line to stdout; keep the latest progress counters
+  const events = readline.createInterface({ input: pythonProcess.stdout });
+  events.on('line', (line) => {
+    logStream.write(`[EVENT] ${line}\n`);
+    try {
+      const event = JSON.parse(line);
+      if (event.event === 'progress') {
+        const { found, scraped, enriched, stored } = event;
+        jobProgress.set(jobId, { found, scraped, enriched, stored });
+      }
+    } catch (error) {
+      console.log(`[${jobId}] stdout: ${line}`);
+    }
   });
   
   pythonProcess.stderr.on('data', (data) => {
@@ -133,6 +272,7 @@ app.post('/api/generate-leads', (req, res) => {
     console.log(`[${jobId}] Process exited with code ${code}`);
     logStream.write(`[INFO] Process exited with code ${code}\n`);
     logStream.end();
+    setTimeout(() => jobProgress.delete(jobId), PROGRESS_RETENTION_MS);
   });
   
   // Return the job ID immediately
@@ -148,6 +288,19 @@ app.get('/api/check-status/:jobId', async (req, res) => {
   const { jobId } = req.params;
   
   try {
+    if (workerMode) {
+      const job = await getJob(jobId);
+      if (job) {
+        res.json({ status: job.status, message: job.message, result: job.result, progress: job.progress });
+      } else {
+        res.status(404).json({ 
+          status: 'not_found', 
+          message: `No job found with ID: ${jobId}` 
+        });
+      }
+      return;
+    }
+    
     // This would typically query Supabase for the job status
     // For now, we'll just check if the log file exists
     const logFile = path.join(logsDir, `${jobId}.log`);
@@ -157,13 +310,14 @@ app.get('/api/check-status/:jobId', async (req, res) => {
       const logContent = fs.readFileSync(logFile, 'utf8');
       const lines = logContent.split('\n').filter(line => line.trim());
       const lastLine = lines[lines.length - 1] || '';
+      const progress = jobProgress.get(jobId) || null;
       
       if (lastLine.includes('Process exited with code 0')) {
-        res.json({ status: 'complete', message: 'Lead generation completed successfully' });
+        res.json({ status: 'complete', message: 'Lead generation completed successfully', progress });
       } else if (lastLine.includes('Process exited with code')) {
-        res.json({ status: 'error', message: 'Lead generation failed' });
+        res.json({ status: 'error', message: 'Lead generation failed', progress });
       } else {
-        res.json({ status: 'processing', message: 'Lead generation in progress' });
+        res.json({ status: 'processing', message: 'Lead generation in progress', progress });
       }
     } else {
       res.status(404).json({ 
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Search Snippet Pre-filter
+Reads what a search result already says about a LinkedIn company before the
+company is scraped. LinkedIn company results carry the company name in their
+title and often the industry, company size, headquarters, website and the
+start of the About text in their snippets. Each candidate is scored against
+the target profile of the job: one whose snippet contradicts it (too large,
+headquartered outside Singapore, unrelated industry) is dropped before any
+scrape, and one whose snippet already holds every field the scrape asks for
+becomes a lead without an ai_scrape call.
+"""
+
+import re
+import threading
+import logging
+
+from metrics import record_snippet_decision
+
+logger = logging.getLogger('lead_generation')
+
+# Fields ai_scrape is asked for; a snippet holding all of them replaces the scrape
+SCRAPE_FIELDS = ("Company size", "Industry", "Website", "About")
+# Shortest snippet About text kept as the lead's About; shorter ones would be enriched anyway
+MIN_ABOUT_CHARS = 100
+# Candidates scoring below this are dropped before scraping
+DEFAULT_MIN_SCORE = 0
+# Score for each piece of evidence for or against the target profile
+SIZE_MATCH_SCORE = 1
+SIZE_MISMATCH_SCORE = -2
+INDUSTRY_MATCH_SCORE = 1
+INDUSTRY_MISMATCH_SCORE = -1
+SINGAPORE_SCORE = 1
+FOREIGN_HEADQUARTERS_SCORE = -2
+
+# "Label: value" pairs of LinkedIn company snippets
+SNIPPET_LABELS = {
+    'industry': 'Industry',
+    'company size': 'Company size',
+    'headquarters': 'Headquarters',
+    'website': 'Website',
+    'type': None,
+    'founded': None,
+    'specialties': None
+}
+LABEL_PATTERN = re.compile(r'\b(' + '|'.join(SNIPPET_LABELS) + r')\s*:\s*', re.IGNORECASE)
+# Characters separating the parts of a snippet
+SEPARATOR_PATTERN = re.compile(r'\s*[|·;\n]\s*')
+SIZE_PATTERN = re.compile(r'(\d[\d,]*)\s*(?:-|–|to)\s*(\d[\d,]*)(?:\s+employees)?|(\d[\d,]*)\+(?:\s+employees)?', re.IGNORECASE)
+EMPLOYEES_PATTERN = re.compile(r'(\d[\d,]*\s*(?:-|–|to)\s*\d[\d,]*|\d[\d,]*\+)\s+employees', re.IGNORECASE)
+# Parts of a snippet that are LinkedIn boilerplate rather than about the company
+BOILERPLATE_PATTERN = re.compile(
+    r'followers on linkedin|see who you know|view company|employees on linkedin|^linkedin$', re.IGNORECASE
+)
+TITLE_SUFFIX_PATTERN = re.compile(r'\s*[|\-–]\s*linkedin\s*$', re.IGNORECASE)
+
+
+def result_parts(result):
+    """Return the description and snippets of a search result as a list of strings"""
+    parts = [result.get("description"), result.get("snippet")]
+    snippets = result.get("snippets")
+    if isinstance(snippets, list):
+        parts.extend(snippets)
+    return [str(part) for part in parts if part]
+
+
+def company_name_from_url(url):
+    """Return the company name spelled by the slug of a LinkedIn company URL, or '' for other URLs"""
+    if "linkedin.com/company/" not in str(url):
+        return ''
+    company_slug = url.split("linkedin.com/company/")[1].split("/")[0].split("?")[0]
+    return company_slug.replace("-", " ").title()
+
+
+def parse_size_range(text):
+    """Return the (low, high) employee range in a size like '11-50 employees' or '10,001+', high None if open"""
+    match = SIZE_PATTERN.search(str(text or ''))
+    if not match:
+        return None
+    if match.group(3):
+        return int(match.group(3).replace(',', '')), None
+    return int(match.group(1).replace(',', '')), int(match.group(2).replace(',', ''))
+
+
+def industry_terms(text):
+    """Return the word stems of an industry, so 'Finance' matches 'Financial Services'"""
+    return {word[:6] for word in re.findall(r'[a-z]+', str(text).lower()) if len(word) > 3 and word != 'services'}
+
+
+def ranges_overlap(first, second):
+    """Return True if two (low, high) employee ranges share a value, high None meaning open"""
+    return (second[1] is None or first[0] <= second[1]) and (first[1] is None or second[0] <= first[1])
+
+
+def extract_snippet_profile(result):
+    """Return the company fields a search result states, keyed like the scraped data"""
+    profile = {}
+    title = TITLE_SUFFIX_PATTERN.sub('', str(result.get("title") or '')).strip()
+    if title and not title.lower().startswith(('jobs at', 'posts')):
+        profile["company_name"] = title
+
+    about_parts = []
+    for part in result_parts(result):
+        labels = list(LABEL_PATTERN.finditer(part))
+        # Text before the first label is free text, the rest are "Label: value" pairs
+        free_text = part[:labels[0].start()] if labels else part
+        for i, label in enumerate(labels):
+            end = labels[i + 1].start() if i + 1 < len(labels) else len(part)
+            value = SEPARATOR_PATTERN.split(part[label.end():end].strip())[0].strip(' .,')
+            field = SNIPPET_LABELS[label.group(1).lower()]
+            if field and value and field not in profile:
+                profile[field] = value
+        for segment in SEPARATOR_PATTERN.split(free_text):
+            segment = segment.strip()
+            if segment and not BOILERPLATE_PATTERN.search(segment):
+                about_parts.append(segment)
+
+    if "Company size" not in profile:
+        match = EMPLOYEES_PATTERN.search(" ".join(result_parts(result)))
+        if match:
+            profile["Company size"] = f"{match.group(1)} employees"
+    if about_parts:
+        about = max(about_parts, key=len)
+        if len(about) >= MIN_ABOUT_CHARS:
+            profile["About"] = about
+    return profile
+
+
+class SnippetFilter:
+    """Scores search candidates against the target profile and keeps complete snippets for the scrape stage"""
+
+    def __init__(self, search_params, min_score=DEFAULT_MIN_SCORE):
+        self.min_score = min_score
+        self.industry_terms = set()
+        for industry in search_params.get("industries", []):
+            self.industry_terms |= industry_terms(industry)
+        self.size_ranges = [
+            size_range for size_range in map(parse_size_range, search_params.get("company_sizes", [])) if size_range
+        ]
+        # URL -> lead data of candidates whose snippet holds every scraped field
+        self._complete = {}
+        self._lock = threading.Lock()
+
+    def score(self, profile, text):
+        """Return the evidence that a candidate fits the target profile, with the reasons against it"""
+        score = 0
+        reasons = []
+        size_range = parse_size_range(profile.get("Company size"))
+        if size_range and self.size_ranges:
+            if any(ranges_overlap(size_range, target_range) for target_range in self.size_ranges):
+                score += SIZE_MATCH_SCORE
+            else:
+                score += SIZE_MISMATCH_SCORE
+                reasons.append(f"size {profile['Company size']}")
+        industry = profile.get("Industry")
+        if industry and self.industry_terms:
+            if industry_terms(industry) & self.industry_terms:
+                score += INDUSTRY_MATCH_SCORE
+            else:
+                score += INDUSTRY_MISMATCH_SCORE
+                reasons.append(f"industry {industry}")
+        headquarters = profile.get("Headquarters")
+        if headquarters and "singapore" not in headquarters.lower():
+            score += FOREIGN_HEADQUARTERS_SCORE
+            reasons.append(f"headquarters {headquarters}")
+        elif "singapore" in text:
+            score += SINGAPORE_SCORE
+        return score, reasons
+
+    def admit(self, url, result):
+        """Return False if a candidate is off target; remember its data if the snippet is complete"""
+        profile = extract_snippet_profile(result)
+        text = " ".join([str(result.get("title") or '')] + result_parts(result)).lower()
+        score, reasons = self.score(profile, text)
+        if score < self.min_score:
+            logger.info(f"Skipping off-target company {url} before scraping ({', '.join(reasons)})")
+            record_snippet_decision('off_target')
+            return False
+        if not profile.get("company_name"):
+            # "Jobs at" and "Posts" results do not name the company in their title
+            profile["company_name"] = company_name_from_url(url)
+        if profile["company_name"] and all(profile.get(field) for field in SCRAPE_FIELDS):
+            with self._lock:
+                self._complete[url] = profile
+        return True
+
+    def take(self, url):
+        """Return the lead data of a candidate whose snippet replaces its scrape, or None"""
+        with self._lock:
+            profile = self._complete.pop(url, None)
+        if profile is None:
+            return None
+        record_snippet_decision('complete')
+        return dict(profile, source_url=url)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP Transport
+Pooled httpx clients for the external APIs. Each API host gets one client
+per process, shared by every job and stage, with keep-alive connections,
+HTTP/2 when the h2 package is installed, a connection pool sized to the
+calls scheduler.py lets run at once, and separate connect and read
+timeouts. Concurrent calls therefore reuse open connections instead of each
+paying for a new TCP and TLS handshake.
+
+The JigsawStack SDK opens a new connection for every request, so search and
+ai_scrape are sent by a small client of the same shape built on this
+transport instead.
+
+httpx, openai and supabase take most of a second to import, so they are
+imported when the first client that needs them is built, and LazyClient
+defers building each client until a stage first uses it. A job that never
+searches or scrapes never loads the JigsawStack client.
+"""
+
+import importlib.util
+import threading
+import time
+import logging
+
+from scheduler import get_provider_concurrency
+
+logger = logging.getLogger('lead_generation')
+
+# Seconds allowed to open a connection, including the TLS handshake
+DEFAULT_CONNECT_TIMEOUT = 5.0
+# Seconds allowed between bytes of a response, per API; ai_scrape renders whole pages
+DEFAULT_READ_TIMEOUTS = {
+    'jigsawstack': 90.0,
+    'openai': 60.0,
+    'supabase': 30.0
+}
+# Seconds an idle connection is kept open for the next call
+KEEPALIVE_EXPIRY = 60.0
+# Connections to Supabase, whose calls are not limited by the scheduler
+# (store workers, progress updates and dedup pages of every running job)
+SUPABASE_MAX_CONNECTIONS = 10
+JIGSAWSTACK_API_URL = 'https://api.jigsawstack.com/v1'
+
+_connect_timeout = DEFAULT_CONNECT_TIMEOUT
+_read_timeouts = dict(DEFAULT_READ_TIMEOUTS)
+# Every pooled client this process has opened, closed together on shutdown
+_clients = []
+_clients_lock = threading.Lock()
+
+
+def http2_available():
+    """Return True if httpx can speak HTTP/2, which needs the h2 package"""
+    return importlib.util.find_spec('h2') is not None
+
+
+def configure_transport(connect_timeout=None, read_timeouts=None):
+    """Apply the connect timeout and 'api=seconds' read timeout overrides"""
+    global _connect_timeout
+    if connect_timeout is not None:
+        if connect_timeout <= 0:
+            raise ValueError(f"Connect timeout must be positive, got {connect_timeout}")
+        _connect_timeout = float(connect_timeout)
+    for override in read_timeouts or []:
+        api, _, value = override.partition('=')
+        if not value or api.strip() not in DEFAULT_READ_TIMEOUTS:
+            raise ValueError(
+                f"Invalid read timeout '{override}', expected api=seconds "
+                f"with api one of {', '.join(sorted(DEFAULT_READ_TIMEOUTS))}"
+            )
+        _read_timeouts[api.strip()] = float(value)
+    logger.info(
+        f"HTTP transport: connect timeout {_connect_timeout}s, read timeouts {_read_timeouts}, "
+        f"HTTP/2 {'enabled' if http2_available() else 'unavailable (install h2)'}"
+    )
+
+
+def get_timeout(api):
+    """Return the httpx timeout for calls to an API"""
+    import httpx
+    return httpx.Timeout(_read_timeouts[api], connect=_connect_timeout)
+
+
+def get_limits(max_connections):
+    """Return pool limits that keep every connection of the pool alive between calls"""
+    import httpx
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=KEEPALIVE_EXPIRY
+    )
+
+
+def _register(client):
+    with _clients_lock:
+        _clients.append(client)
+    return client
+
+
+def build_http_client(api, max_connections, **kwargs):
+    """Build a pooled keep-alive client for one API host"""
+    import httpx
+    logger.info(f"Connection pool for {api}: {max_connections} connections")
+    return _register(httpx.Client(
+        http2=http2_available(),
+        limits=get_limits(max_connections),
+        timeout=get_timeout(api),
+        **kwargs
+    ))
+
+
+def close_http_clients():
+    """Close the connections of every pooled client"""
+    with _clients_lock:
+        clients = list(_clients)
+        _clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception as e:
+            logger.warning(f"Error closing HTTP client: {str(e)}")
+
+
+class LazyClient:
+    """Stand-in for an API client that builds the client the first time one of its attributes is used"""
+
+    def __init__(self, name, factory):
+        self._name = name
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def initialized(self):
+        return self._client is not None
+
+    def get(self):
+        """Return the client, building it on the first call"""
+        client = self._client
+        if client is None:
+            with self._lock:
+                if self._client is None:
+                    started = time.monotonic()
+                    self._client = self._factory()
+                    logger.info(f"{self._name} client initialized in {time.monotonic() - started:.2f}s")
+                client = self._client
+        return client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+class JigsawStackHTTPError(Exception):
+    """Error response from the JigsawStack API, carrying its status code and headers"""
+
+    def __init__(self, response):
+        try:
+            message = response.json().get('message')
+        except ValueError:
+            message = None
+        super().__init__(message or f"JigsawStack API returned HTTP {response.status_code}")
+        self.status_code = response.status_code
+        self.response = response
+
+
+class PooledJigsawStackWeb:
+    """The web.search and web.ai_scrape calls of the JigsawStack SDK over a shared pool"""
+
+    def __init__(self, http_client):
+        self.http_client = http_client
+
+    def _post(self, path, body):
+        response = self.http_client.post(path, json=body)
+        if response.status_code != 200:
+            raise JigsawStackHTTPError(response)
+        # Like the SDK, return the response and let the caller parse it
+        return response
+
+    def search(self, params):
+        # Same request body and defaults as the SDK
+        return self._post('/web/search', {
+            'byo_urls': params.get('byo_urls', []),
+            'query': params['query'],
+            'ai_overview': params.get('ai_overview', 'True'),
+            'safe_search': params.get('safe_search', 'moderate'),
+            'spell_check': params.get('spell_check', 'True')
+        })
+
+    def ai_scrape(self, params):
+        return self._post('/ai/scrape', dict(params))
+
+
+class PooledJigsawStack:
+    """Stand-in for jigsawstack.JigsawStack covering the calls the lead generator makes"""
+
+    def __init__(self, api_key, api_url=JIGSAWSTACK_API_URL, max_connections=None):
+        if max_connections is None:
+            # Search and scrape calls share the API host
+            max_connections = get_provider_concurrency('jigsawstack_search') + get_provider_concurrency('jigsawstack_scrape')
+        self.web = PooledJigsawStackWeb(build_http_client(
+            'jigsawstack', max_connections,
+            base_url=api_url,
+            headers={'Content-Type': 'application/json', 'Accept': 'application/json', 'x-api-key': api_key}
+        ))
+
+
+def create_openai_client(api_key, max_connections=None):
+    """Create an OpenAI client on a pooled keep-alive connection"""
+    import openai
+
+    if max_connections is None:
+        max_connections = get_provider_concurrency('openai_chat')
+    return openai.Client(
+        api_key=api_key,
+        timeout=get_timeout('openai'),
+        # rate_limited_call retries failed calls, with the shared backoff and circuit breaker
+        max_retries=0,
+        http_client=build_http_client('openai', max_connections)
+    )
+
+
+_supabase_client_class = None
+
+
+def pooled_supabase_client_class():
+    """Return a Supabase client class whose table calls use the shared pool, importing supabase on first use"""
+    global _supabase_client_class
+    if _supabase_client_class is not None:
+        return _supabase_client_class
+
+    from postgrest import SyncPostgrestClient
+    from postgrest.utils import SyncClient as PostgrestSession
+    from supabase import Client as SupabaseClient
+
+    class PooledPostgrestClient(SyncPostgrestClient):
+        """PostgREST client whose session uses the shared pool limits and timeouts"""
+
+        def create_session(self, base_url, headers, timeout, verify=True, proxy=None):
+            logger.info(f"Connection pool for supabase: {SUPABASE_MAX_CONNECTIONS} connections")
+            return _register(PostgrestSession(
+                base_url=base_url,
+                headers=headers,
+                timeout=timeout,
+                verify=verify,
+                proxy=proxy,
+                follow_redirects=True,
+                http2=http2_available(),
+                limits=get_limits(SUPABASE_MAX_CONNECTIONS)
+            ))
+
+    class PooledSupabaseClient(SupabaseClient):
+        """Supabase client whose table calls go through PooledPostgrestClient"""
+
+        @staticmethod
+        def _init_postgrest_client(rest_url, headers, schema, timeout=None, verify=True, proxy=None):
+            return PooledPostgrestClient(
+                rest_url, headers=headers, schema=schema, timeout=timeout or get_timeout('supabase'),
+                verify=verify, proxy=proxy
+            )
+
+    _supabase_client_class = PooledSupabaseClient
+    return _supabase_client_class
+
+
+def create_supabase_client(supabase_url, supabase_key):
+    """Create a Supabase client whose PostgREST calls use a pooled keep-alive connection"""
+    from supabase.lib.client_options import ClientOptions
+
+    return pooled_supabase_client_class().create(
+        supabase_url, supabase_key, ClientOptions(postgrest_client_timeout=get_timeout('supabase'))
+    )
@@ -40,3 +40,35 @@ CREATE INDEX IF NOT EXISTS idx_leads_company_name ON leads(company_name);
 CREATE INDEX IF NOT EXISTS idx_leads_status ON leads(status);
 CREATE INDEX IF NOT EXISTS idx_leads_ai_readiness ON leads(ai_readiness);
 CREATE INDEX IF NOT EXISTS idx_leads_is_sme ON leads(is_sme);
+
+-- 5. Ensure source_url is unique so leads can be upserted in batches
+--    This fails while leads share a source_url; merge them first with
+--    supabase/migrations/20250323010000_unique_lead_source_url.sql
+CREATE UNIQUE INDEX IF NOT EXISTS idx_leads_source_url ON leads(source_url);
+
+-- 6. Store job parameters and results so queued jobs can be run by the worker
+ALTER TABLE lead_generation_jobs
+  ADD COLUMN IF NOT EXISTS params jsonb DEFAULT '{}'::jsonb,
+  ADD COLUMN IF NOT EXISTS result jsonb;
+
+-- 7. Store running progress counters so leads can be followed while a job runs
+ALTER TABLE lead_generation_jobs
+  ADD COLUMN IF NOT EXISTS progress jsonb DEFAULT '{}'::jsonb;
+
+-- 8. Remember the search yield of each query so later jobs reuse the productive ones
+CREATE TABLE IF NOT EXISTS search_query_stats (
+  query_key text PRIMARY KEY,
+  query text NOT NULL,
+  searches integer DEFAULT 0,
+  urls_found integer DEFAULT 0,
+  new_companies integer DEFAULT 0,
+  leads_stored integer DEFAULT 0,
+  dry_streak integer DEFAULT 0,
+  retired boolean DEFAULT false,
+  last_searched_at timestamptz DEFAULT now(),
+  updated_at timestamptz DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_search_query_stats_last_searched_at ON search_query_stats(last_searched_at);
+
+-- 9. Let the lead profile refresh read only recently updated leads
+CREATE INDEX IF NOT EXISTS idx_leads_updated_at ON leads(updated_at);
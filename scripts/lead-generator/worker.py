@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Resident Job Worker
+Keeps one lead generator process running so the API clients, their HTTP
+connection pools, the content cache and the rate limiters stay warm between
+jobs. Jobs are taken from queued rows in the lead_generation_jobs table or
+from JSON lines on stdin, and several jobs run concurrently. Interactive jobs
+(analyze-only runs and small lead counts) have job slots of their own and are
+started before batch jobs, so they never wait behind a long generation run.
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import signal
+import sys
+import threading
+import time
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE, job_priority
+
+logger = logging.getLogger('lead_generation')
+
+# Number of batch jobs processed at the same time
+DEFAULT_MAX_JOBS = 3
+# Extra job slots reserved for interactive jobs
+DEFAULT_INTERACTIVE_JOBS = 2
+# Seconds between checks for queued jobs in the jobs table
+DEFAULT_POLL_INTERVAL = 0.5
+# Oldest queued jobs looked at per poll, so interactive jobs behind a backlog of batch jobs are seen
+QUEUE_WINDOW = 50
+# Job parameters that may be set per job; anything else comes from the worker's own arguments
+JOB_PARAMS = (
+    'count', 'target_profile', 'analyze_only', 'serial', 'allow_duplicates', 'classify_batch_size', 'urls_per_query',
+    'resume'
+)
+
+
+def build_job_args(base_args, params):
+    """Combine the worker's arguments with the parameters of a single job"""
+    job_args = argparse.Namespace(**vars(base_args))
+    for name in JOB_PARAMS:
+        if params.get(name) is not None:
+            setattr(job_args, name, params[name])
+    # The target profile is passed around as a JSON string, as on the command line
+    if not isinstance(job_args.target_profile, str):
+        job_args.target_profile = json.dumps(job_args.target_profile)
+    job_args.count = int(job_args.count)
+    job_args.analyze_only = bool(job_args.analyze_only)
+    return job_args
+
+
+class JobWorker:
+    """Runs queued lead generation jobs on a pool of threads"""
+
+    def __init__(self, run_job, supabase_client, base_args, max_jobs=DEFAULT_MAX_JOBS,
+                 poll_interval=DEFAULT_POLL_INTERVAL, interactive_jobs=DEFAULT_INTERACTIVE_JOBS):
+        # run_job(job_id, job_args) runs one job, records its status and returns True on success
+        self.run_job = run_job
+        self.supabase_client = supabase_client
+        self.base_args = base_args
+        self.max_jobs = max(1, max_jobs)
+        self.interactive_jobs = max(0, interactive_jobs)
+        self.poll_interval = poll_interval
+        self.completed = 0
+        self.failed = 0
+        # Job slots per priority class and how many of them are in use
+        self._slots = {PRIORITY_INTERACTIVE: self.interactive_jobs, PRIORITY_BATCH: self.max_jobs}
+        self._running = {PRIORITY_INTERACTIVE: 0, PRIORITY_BATCH: 0}
+        # Jobs waiting for a slot, as a heap of (priority, sequence, job_id, job_args)
+        self._pending = []
+        self._sequence = itertools.count()
+        self._input_done = False
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_jobs + self.interactive_jobs, thread_name_prefix='job'
+        )
+
+    def stop(self, *_):
+        """Stop taking new jobs; running jobs are allowed to finish"""
+        if not self._stop.is_set():
+            logger.info("Worker stopping, waiting for running jobs to finish...")
+        self._stop.set()
+        with self._changed:
+            self._changed.notify_all()
+
+    def run(self, source='table'):
+        """Process jobs from the given source until stopped or the source is exhausted"""
+        signal.signal(signal.SIGTERM, self.stop)
+        logger.info(
+            f"Worker started, taking jobs from {source} with up to {self.max_jobs} concurrent jobs "
+            f"and {self.interactive_jobs} more for interactive jobs"
+        )
+        try:
+            if source == 'stdin':
+                self._run_stdin()
+            else:
+                self._run_table()
+        except KeyboardInterrupt:
+            self.stop()
+        finally:
+            self._executor.shutdown(wait=True)
+            logger.info(f"Worker stopped after {self.completed} completed and {self.failed} failed jobs")
+
+    def _take_slot(self, priority):
+        """Take a free slot for a job of the given priority, returning its class or None (lock held)"""
+        # Interactive jobs have slots of their own, and may also use a free batch slot
+        classes = (PRIORITY_INTERACTIVE, PRIORITY_BATCH) if priority == PRIORITY_INTERACTIVE else (PRIORITY_BATCH,)
+        for slot_class in classes:
+            if self._running[slot_class] < self._slots[slot_class]:
+                self._running[slot_class] += 1
+                return slot_class
+        return None
+
+    def _release_slot(self, slot_class):
+        with self._changed:
+            self._running[slot_class] -= 1
+            self._changed.notify_all()
+
+    def _parse_job(self, job_id, params):
+        """Return the job's arguments and priority, raising ValueError if its parameters are invalid"""
+        try:
+            job_args = build_job_args(self.base_args, params)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Invalid parameters for job {job_id}: {str(e)}")
+            raise ValueError(f"Invalid job parameters: {str(e)}") from e
+        return job_args, job_priority(job_args.analyze_only, job_args.count)
+
+    def submit(self, job_id, params):
+        """Queue a job; it starts as soon as a slot of its priority class is free"""
+        try:
+            job_args, priority = self._parse_job(job_id, params)
+        except ValueError:
+            return False
+        with self._changed:
+            heapq.heappush(self._pending, (priority, next(self._sequence), job_id, job_args))
+            self._changed.notify_all()
+        return True
+
+    def _dispatch(self):
+        """Start every pending job that can get a slot, highest priority first"""
+        with self._changed:
+            waiting = []
+            while self._pending:
+                priority, sequence, job_id, job_args = heapq.heappop(self._pending)
+                slot_class = self._take_slot(priority)
+                if slot_class is None:
+                    waiting.append((priority, sequence, job_id, job_args))
+                    continue
+                self._executor.submit(self._run, job_id, job_args, slot_class)
+            for job in waiting:
+                heapq.heappush(self._pending, job)
+
+    def _run(self, job_id, job_args, slot_class):
+        started = time.time()
+        try:
+            success = self.run_job(job_id, job_args)
+        except Exception as e:
+            logger.error(f"Unhandled error in job {job_id}: {str(e)}", exc_info=True)
+            success = False
+        finally:
+            self._release_slot(slot_class)
+        with self._lock:
+            if success:
+                self.completed += 1
+            else:
+                self.failed += 1
+        logger.info(f"Job {job_id} {'completed' if success else 'failed'} in {time.time() - started:.2f}s")
+
+    def _run_stdin(self):
+        """Read one JSON job per line from stdin and start them by priority"""
+        reader = threading.Thread(target=self._read_stdin, name='job-reader', daemon=True)
+        reader.start()
+        while not self._stop.is_set():
+            self._dispatch()
+            with self._changed:
+                if self._input_done and not self._pending:
+                    break
+                self._changed.wait(self.poll_interval)
+        if self._pending:
+            logger.warning(f"Worker stopped with {len(self._pending)} jobs not started")
+
+    def _read_stdin(self):
+        for line in sys.stdin:
+            if self._stop.is_set():
+                break
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                params = json.loads(line)
+            except json.JSONDecodeError:
+                logger.error(f"Ignoring invalid job line: {line}")
+                continue
+            if not isinstance(params, dict):
+                logger.error(f"Ignoring job line that is not a JSON object: {line}")
+                continue
+            self.submit(params.get('job_id') or str(uuid.uuid4()), params)
+        with self._changed:
+            self._input_done = True
+            self._changed.notify_all()
+
+    def _run_table(self):
+        """Poll the jobs table for queued jobs and claim those a slot is free for, interactive jobs first"""
+        while not self._stop.is_set():
+            claimed = False
+            jobs = []
+            for job in self._fetch_queued_jobs():
+                try:
+                    job_args, priority = self._parse_job(job['job_id'], job.get('params') or {})
+                except ValueError as e:
+                    # Fail invalid jobs so they leave the queue with the reason they cannot run
+                    self._reject(job['job_id'], str(e))
+                    continue
+                jobs.append((priority, job['job_id'], job_args))
+            # sorted() is stable, so jobs of the same priority keep their queue order
+            for priority, job_id, job_args in sorted(jobs, key=lambda job: job[0]):
+                if self._stop.is_set():
+                    break
+                with self._changed:
+                    slot_class = self._take_slot(priority)
+                if slot_class is None:
+                    continue
+                if not self._claim(job_id):
+                    self._release_slot(slot_class)
+                    continue
+                claimed = True
+                self._executor.submit(self._run, job_id, job_args, slot_class)
+            if not claimed:
+                self._stop.wait(self.poll_interval)
+
+    def _fetch_queued_jobs(self):
+        try:
+            response = self.supabase_client.table('lead_generation_jobs') \
+                .select('job_id, params') \
+                .eq('status', 'queued') \
+                .order('created_at') \
+                .limit(QUEUE_WINDOW) \
+                .execute()
+            return response.data or []
+        except Exception as e:
+            logger.error(f"Error fetching queued jobs: {str(e)}")
+            return []
+
+    def _claim(self, job_id):
+        """Move a job from queued to claimed, returning False if another worker got it first"""
+        return self._leave_queue(job_id, 'claimed', 'Lead generation job claimed by worker')
+
+    def _reject(self, job_id, message):
+        """Move a job that cannot run from queued to error, recording why"""
+        return self._leave_queue(job_id, 'error', message)
+
+    def _leave_queue(self, job_id, status, message):
+        """Move a job from queued to status, returning False if another worker got it first"""
+        try:
+            response = self.supabase_client.table('lead_generation_jobs') \
+                .update({
+                    'status': status,
+                    'message': message,
+                    'updated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ')
+                }) \
+                .eq('job_id', job_id) \
+                .eq('status', 'queued') \
+                .execute()
+            return bool(response.data)
+        except Exception as e:
+            logger.error(f"Error moving job {job_id} to {status}: {str(e)}")
+            return False
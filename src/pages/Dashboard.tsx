@@ -31,6 +31,13 @@ type DashboardStats = {
 
 type TimeFilter = '7d' | '30d' | '90d' | 'all';
 
+type JobProgress = {
+  found: number;
+  scraped: number;
+  enriched: number;
+  stored: number;
+};
+
 function Dashboard() {
   const navigate = useNavigate();
   const [stats, setStats] = useState<DashboardStats>({
@@ -50,6 +57,7 @@ function Dashboard() {
   const [generatingLeads, setGeneratingLeads] = useState(false);
   const [jobId, setJobId] = useState<string | null>(null);
   const [jobStatus, setJobStatus] = useState<string | null>(null);
+  const [jobProgress, setJobProgress] = useState<JobProgress | null>(null);
 
   useEffect(() => {
     fetchStats();
@@ -59,6 +67,7 @@ function Dashboard() {
     try {
       setGeneratingLeads(true);
       setJobStatus('starting');
+      setJobProgress(null);
       
       const apiUrl = 'https://lead-generator-api-m68v.onrender.com';
       
@@ -75,7 +84,7 @@ function Dashboard() {
       if (data.success) {
         setJobId(data.jobId);
         setJobStatus('processing');
-        pollJobStatus(data.jobId);
+        pollJobStatus(data.jobId, 0);
       } else {
         setJobStatus('error');
         console.error('Failed to start lead generation:', data.message);
@@ -86,7 +95,7 @@ function Dashboard() {
     }
   }
   
-  async function pollJobStatus(id: string) {
+  async function pollJobStatus(id: string, storedBefore: number) {
     try {
       const apiUrl = 'https://lead-generator-api-m68v.onrender.com';
       
@@ -95,8 +104,18 @@ function Dashboard() {
       
       setJobStatus(data.status);
       
-      if (data.status === 'processing') {
-        setTimeout(() => pollJobStatus(id), 5000);
+      // Leads are stored in batches while the job runs, so show them as they arrive
+      const stored = data.progress?.stored || 0;
+      if (data.progress) {
+        setJobProgress(data.progress);
+      }
+      const running = ['queued', 'claimed', 'created', 'processing'].includes(data.status);
+      if (running && stored > storedBefore) {
+        fetchStats(false);
+      }
+      
+      if (running) {
+        setTimeout(() => pollJobStatus(id, Math.max(stored, storedBefore)), 5000);
       } else if (data.status === 'complete') {
         setGeneratingLeads(false);
         fetchStats();
@@ -110,9 +129,11 @@ function Dashboard() {
     }
   }
 
-  async function fetchStats() {
+  async function fetchStats(showLoading = true) {
     try {
-      setLoading(true);
+      if (showLoading) {
+        setLoading(true);
+      }
       setError(null);
       const now = new Date();
       const startDate = new Date();
@@ -418,6 +439,11 @@ function Dashboard() {
           {jobStatus === 'error' ? 'Error generating leads. Please try again.' :
            jobStatus === 'processing' ? 'Generating leads. This may take a few minutes...' :
            'Starting lead generation...'}
+          {jobStatus !== 'error' && jobProgress && (
+            <span className="ml-2">
+              {jobProgress.found} found, {jobProgress.scraped} scraped, {jobProgress.enriched} enriched, {jobProgress.stored} stored
+            </span>
+          )}
         </div>
       )}
 
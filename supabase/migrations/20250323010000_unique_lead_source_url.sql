@@ -0,0 +1,106 @@
+/*
+  # Unique Lead Source URL
+
+  1. Changes
+    - Back up every lead that shares its source_url with another lead to leads_duplicate_backup
+    - Merge each group of duplicates into its most recently updated lead, which keeps the most
+      advanced status of the group, the notes of every lead and the earliest created_at
+    - Move the lead_score_logs of the merged leads to the lead they were merged into
+    - Delete the merged leads
+    - Add a unique constraint on source_url
+
+  2. Purpose
+    - The lead generator stores leads with multi-row upserts keyed on source_url,
+      which requires a unique constraint on that column
+
+  3. Data loss
+    - Apart from status, notes, created_at and score logs, the fields of a merged lead
+      are only kept in leads_duplicate_backup, with merged_into set to the lead it was merged into
+*/
+
+-- Each lead of a duplicated source_url with the lead it is merged into, the most recently updated one
+CREATE TEMP TABLE lead_duplicates AS
+SELECT
+  id,
+  FIRST_VALUE(id) OVER (
+    PARTITION BY source_url
+    ORDER BY
+      updated_at DESC NULLS LAST,
+      id DESC
+  ) AS keep_id
+FROM leads
+WHERE source_url IN (
+  SELECT source_url
+  FROM leads
+  WHERE source_url IS NOT NULL
+  GROUP BY source_url
+  HAVING COUNT(*) > 1
+);
+
+-- Back up every lead of a duplicate group before anything changes
+CREATE TABLE IF NOT EXISTS leads_duplicate_backup AS
+SELECT * FROM leads WITH NO DATA;
+
+ALTER TABLE leads_duplicate_backup
+  ADD COLUMN IF NOT EXISTS merged_into uuid,
+  ADD COLUMN IF NOT EXISTS backed_up_at timestamptz DEFAULT now();
+
+-- Only the service role reads the backup
+ALTER TABLE leads_duplicate_backup ENABLE ROW LEVEL SECURITY;
+
+INSERT INTO leads_duplicate_backup
+SELECT leads.*, lead_duplicates.keep_id, now()
+FROM leads
+JOIN lead_duplicates ON lead_duplicates.id = leads.id;
+
+-- Merged values of each group, computed before the merged leads are deleted
+CREATE TEMP TABLE lead_merges AS
+SELECT
+  lead_duplicates.keep_id,
+  (ARRAY_AGG(
+    leads.status
+    ORDER BY
+      CASE LOWER(leads.status)
+        WHEN 'closed' THEN 5
+        WHEN 'proposal' THEN 4
+        WHEN 'qualified' THEN 3
+        WHEN 'contacted' THEN 2
+        ELSE 1
+      END DESC,
+      leads.updated_at DESC NULLS LAST
+  ))[1] AS status,
+  STRING_AGG(DISTINCT NULLIF(TRIM(leads.notes), ''), E'\n\n') AS notes,
+  MIN(leads.created_at) AS created_at
+FROM lead_duplicates
+JOIN leads ON leads.id = lead_duplicates.id
+GROUP BY lead_duplicates.keep_id;
+
+-- Keep the score history of the merged leads
+UPDATE lead_score_logs
+SET lead_id = lead_duplicates.keep_id
+FROM lead_duplicates
+WHERE lead_score_logs.lead_id = lead_duplicates.id
+  AND lead_duplicates.id <> lead_duplicates.keep_id;
+
+DELETE FROM leads
+WHERE id IN (
+  SELECT id
+  FROM lead_duplicates
+  WHERE id <> keep_id
+);
+
+UPDATE leads
+SET
+  status = lead_merges.status,
+  notes = lead_merges.notes,
+  created_at = lead_merges.created_at
+FROM lead_merges
+WHERE leads.id = lead_merges.keep_id;
+
+DROP TABLE lead_merges;
+DROP TABLE lead_duplicates;
+
+-- Add unique constraint used as the upsert conflict target
+ALTER TABLE leads
+  ADD CONSTRAINT unique_lead_source_url
+  UNIQUE (source_url);
@@ -0,0 +1,15 @@
+/*
+  # Lead Generation Job Parameters and Results
+
+  1. Changes
+    - Add `params` (jsonb) to `lead_generation_jobs` for the parameters of queued jobs
+    - Add `result` (jsonb) to `lead_generation_jobs` for the search parameters and stage summary of finished jobs
+
+  2. Purpose
+    - The resident lead generator worker claims jobs with status `queued` and reads
+      their parameters from the job row instead of the command line
+*/
+
+ALTER TABLE lead_generation_jobs
+  ADD COLUMN IF NOT EXISTS params jsonb DEFAULT '{}'::jsonb,
+  ADD COLUMN IF NOT EXISTS result jsonb;
@@ -0,0 +1,14 @@
+/*
+  # Lead Generation Job Progress
+
+  1. Changes
+    - Add `progress` (jsonb) to `lead_generation_jobs` with the running `found`, `scraped`,
+      `enriched` and `stored` counters of a job
+
+  2. Purpose
+    - Leads are stored in small batches while a job runs; the dashboard reads these
+      counters to show how far a job is before it has finished
+*/
+
+ALTER TABLE lead_generation_jobs
+  ADD COLUMN IF NOT EXISTS progress jsonb DEFAULT '{}'::jsonb;
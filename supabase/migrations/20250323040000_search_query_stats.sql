@@ -0,0 +1,31 @@
+/*
+  # Search Query Stats
+
+  1. New Tables
+    - `search_query_stats`, one row per normalized search query
+      - `query_key` (text, primary key), the lowercased query with collapsed whitespace
+      - `query` (text), the query as it was last searched
+      - `searches`, `urls_found`, `new_companies`, `leads_stored` (integer) counters summed over jobs
+      - `dry_streak` (integer), searches in a row that found no new company
+      - `retired` (boolean), set once a query stopped finding new companies
+      - `last_searched_at`, `updated_at` (timestamptz)
+
+  2. Purpose
+    - The lead generator reuses the queries that found the most new companies per search,
+      retires exhausted ones and only asks the LLM for new variations
+*/
+
+CREATE TABLE IF NOT EXISTS search_query_stats (
+  query_key text PRIMARY KEY,
+  query text NOT NULL,
+  searches integer DEFAULT 0,
+  urls_found integer DEFAULT 0,
+  new_companies integer DEFAULT 0,
+  leads_stored integer DEFAULT 0,
+  dry_streak integer DEFAULT 0,
+  retired boolean DEFAULT false,
+  last_searched_at timestamptz DEFAULT now(),
+  updated_at timestamptz DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_search_query_stats_last_searched_at ON search_query_stats(last_searched_at);
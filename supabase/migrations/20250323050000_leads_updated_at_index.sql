@@ -0,0 +1,12 @@
+/*
+  # Leads Updated At Index
+
+  1. Changes
+    - Add an index on `leads.updated_at`
+
+  2. Purpose
+    - The lead generator refreshes its aggregate lead profile by reading only the leads
+      updated since its last refresh
+*/
+
+CREATE INDEX IF NOT EXISTS idx_leads_updated_at ON leads(updated_at);